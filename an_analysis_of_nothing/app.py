@@ -2,15 +2,21 @@
 Code that manages the theme of the website,
 page navigation sidebar, and pages.
 """
+import importlib
 import os
 
 import streamlit as st
 from streamlit_option_menu import option_menu
 
-from app_pages import write_home_page
-from app_pages import write_recommender_page
-from app_pages import write_about_page
-from app_pages import write_episode_query
+from app_pages import load_session
+
+# Page modules, imported only when their menu entry is selected
+PAGES = {
+    "Home": "app_pages.write_home_page",
+    "Episode Recommender": "app_pages.write_recommender_page",
+    "Query Episodes": "app_pages.write_episode_query",
+    "About Us": "app_pages.write_about_page",
+}
 
 # Set current working directory to .
 cwd = os.getcwd()
@@ -48,7 +54,7 @@ st.image('./static/images/analysis_of_nothing.png')
 with st.sidebar:
     selected = option_menu(
         menu_title="Main Menu",
-        options=["Home", "Episode Recommender", "Query Episodes", "About Us"],
+        options=list(PAGES),
         icons=["house", "tv", 'search', 'people'],
         menu_icon="cast",
         default_index=0,
@@ -57,15 +63,8 @@ with st.sidebar:
         }
     )
 
-# Run specific webpage scripts when selected
-if selected == "Home":
-    write_home_page.main()
-
-if selected == "Episode Recommender":
-    write_recommender_page.main()
-
-if selected == "Query Episodes":
-    write_episode_query.main()
+# Point the session at the current data version before any page runs
+load_session.load_session_state()
 
-if selected == "About Us":
-    write_about_page.main()
+# Run specific webpage script when selected
+importlib.import_module(PAGES[selected]).main()
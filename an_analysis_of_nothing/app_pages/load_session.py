@@ -0,0 +1,40 @@
+"""
+Code that points each browser session at the current data and at the
+process-wide recommender, query corpus and BM25 index. Called by the
+main app.py script on every rerun, before the selected page.
+"""
+
+import streamlit as st
+from utils import data_constants, resources, shared_data
+
+
+def load_session_state():
+    """
+    Point the session at the current data, recommender, query corpus
+    and, unless searches are semantic only, BM25 index. Runs on every
+    rerun before the selected page so a new data version is picked up
+    by whichever page is open; the data, model, recommender, corpus and
+    index are only loaded once per version per process and shared by
+    every session.
+    :param: None
+
+    :return: None
+    """
+    try:
+        dataset = shared_data.refresh_session(st.session_state)
+    except FileNotFoundError:
+        st.error("There was an issue loading data")
+        return
+
+    try:
+        # Refer to the shared resources once per version
+        if "recommender" not in st.session_state:
+            st.session_state.recommender = resources.get_recommender(dataset)
+        if 'query' not in st.session_state:
+            st.session_state.query = resources.get_query_corpus(
+                dataset, data_constants.EMBEDDING_STORAGE)
+        if data_constants.SEARCH_MODE != 'semantic' and \
+                'lexical' not in st.session_state:
+            st.session_state.lexical = resources.get_lexical_index(dataset)
+    except ValueError:
+        st.error("Failed to instantiate class")
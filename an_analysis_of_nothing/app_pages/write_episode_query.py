@@ -7,7 +7,7 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 import plotly.express as px
-from utils import episode_query
+from utils import episode_query, result_cache
 
 
 def main():
@@ -94,14 +94,17 @@ def main():
             Select an episode to learn more.</h6>""",
             unsafe_allow_html=True)
 
-        # Filter data according to user input
-        filtered_df, search_results = episode_query.filter_search_results(
-                                                        search_string,
-                                                        season_choice,
-                                                        rating_choice,
-                                                        char_choice,
-                                                        df_imdb,
-                                                        df_script)
+        # Filter data according to user input, reusing stored results
+        version = st.session_state.get('data_version')
+        filtered_df, search_results = \
+            result_cache.get_result_cache().get_or_compute(
+                result_cache.search_key(search_string, season_choice,
+                                        rating_choice, char_choice,
+                                        version),
+                version,
+                lambda: episode_query.filter_search_results(
+                    search_string, season_choice, rating_choice,
+                    char_choice, df_imdb, df_script))
         # Display table
         col2_1, col2_2, col2_3 = st.columns([.25, 3.5, .25])
         with col2_2:
@@ -150,10 +153,7 @@ def main():
             selected['Count'] = 1
             selected['Argmax'] = selected.apply(episode_query.extract_argmax,
                                                 axis=1)
-            grouped_df = selected[['Happy', 'Angry',
-                                   'Surprise', 'Sad',
-                                   'Fear', 'SEID']].groupby('SEID').sum()
-            grouped_df = grouped_df.reset_index()
+            grouped_df = episode_query.sum_emotions(selected)
 
             # Melt the DataFrame to create a long format
             melted_df = grouped_df.melt(
@@ -7,9 +7,10 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import numpy as np
-from utils import data_manager, recommender, episode_query
+from utils import data_manager
 
-# pylint: disable-msg=too-many-statements
+
+# pylint: disable-msg=too-many-statements, too-many-locals
 def main():
     """
     Executes the Streamlit formatted HTML
@@ -35,28 +36,9 @@ def main():
     with left_1 and right_1:
         pass
 
-    try:
-        # Load dataframes into session state once
-        # pylint: disable-msg=line-too-long
-        if ("df_imdb" not in st.session_state) or ("df_dialog" not in st.session_state):
-            # pylint: disable-msg=line-too-long
-            st.session_state.df_imdb, st.session_state.df_dialog = data_manager.load_data()
-    except FileNotFoundError:
-        st.error("There was an issue loading data")
-
     dialog_df = pd.DataFrame(st.session_state.df_dialog)
     imdb_df = pd.DataFrame(st.session_state.df_imdb)
 
-    try:
-        # Load recommender and query into session state once
-        if "recommender" not in st.session_state:
-            st.session_state.recommender = recommender.Recommender(
-                imdb_df, dialog_df)
-        if 'query' not in st.session_state:
-            st.session_state.query = episode_query.load_corpus(dialog_df)
-    except ValueError:
-        st.error("Failed to instantiate class")
-
     st.markdown("""<h6 style='text-align: center; color: white;'><br>
                 Select Season(s)</h6>""",
                 unsafe_allow_html=True)
@@ -73,18 +55,22 @@ def main():
                 Lines Spoken by Character and Season</h4>""",
                 unsafe_allow_html=True)
 
-    # Calculate lines spoken by character and season
-    selected_seasons = np.in1d(dialog_df["Season"], seasons)
-    season_df = dialog_df[selected_seasons]
-
+    # Calculate lines spoken by character and season, counting only
+    # lines spoken alone (not joint lines such as "JERRY & GEORGE")
     main_four = ["JERRY", "GEORGE", "ELAINE", "KRAMER"]
-    characters = np.in1d(season_df["Character"], main_four )
-    character_df = season_df[characters]
+    counts, characters, all_seasons = data_manager.count_matrix(
+        dialog_df, main_four, by="Season", exact=True)
+    counts_df = pd.DataFrame(counts, index=characters, columns=all_seasons)
+    character_df = counts_df.loc[:, counts_df.columns.isin(seasons)].melt(
+        ignore_index=False, var_name="Season", value_name="count"
+    ).rename_axis("Character").reset_index()
+    character_df["Season"] = character_df["Season"].astype(str)
 
     # Display as histogram
-    histogram = px.histogram(
+    histogram = px.bar(
         data_frame = character_df,
         x = "Character",
+        y = "count",
         template="presentation",
         color = "Season"
     )
@@ -1,6 +1,7 @@
 """
     Module for mock function calls.
 """
+import threading
 import pandas as pd
 from utils import data_constants
 
@@ -555,3 +556,49 @@ def mocked_read_csv_query(*args):
     if args[0] == data_constants.SCRIPTS_LINK:
         return mock_script_data
     return mock_imdb_data
+
+
+def call_concurrently(function, num_threads=8):
+    """
+        Call function from several threads at once, e.g. to check
+        concurrent first callers share a single load.
+        :return: list of the results, in the order the calls returned.
+    """
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(function()))
+               for _ in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class FakeEncoder:  # pylint: disable=too-few-public-methods
+    """
+    Encoder mocking SentenceTransformer: sentences are embedded by a
+    given function, and the sentences of every call are recorded.
+    Calls wait for release to be set.
+    """
+
+    def __init__(self, embed):
+        """
+        :param embed: function from a sentence (or list of sentences)
+            to its embedding (or one row per sentence).
+        """
+        self.embed = embed
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def encode(self, sentences, convert_to_tensor=False, **_):
+        """
+        Return the embeddings of sentences, as a tensor if asked.
+        """
+        self.release.wait()
+        self.batches.append(sentences)
+        embeddings = self.embed(sentences)
+        if convert_to_tensor:
+            import torch  # pylint:disable=import-outside-toplevel
+            return torch.as_tensor(embeddings)
+        return embeddings
@@ -0,0 +1,86 @@
+"""
+    Module for testing the micro-batching encoder front-end.
+"""
+import unittest
+import numpy as np
+from utils.batch_encoder import BatchEncoder
+from . import mock_functions
+
+
+def embed_lengths(sentences):
+    """
+    Embed each sentence as its length; a batch with 'fail' raises.
+    """
+    if 'fail' in sentences:
+        raise RuntimeError("model failed")
+    return np.array([[len(sentence), 1.0] for sentence in sentences],
+                    dtype=np.float32)
+
+
+class TestBatchEncoder(unittest.TestCase):
+    """
+    Test class for the BatchEncoder class
+    """
+
+    def setUp(self):
+        self.model = mock_functions.FakeEncoder(embed_lengths)
+        self.encoder = BatchEncoder(self.model, max_batch=4, max_wait=0.01)
+
+    def tearDown(self):
+        self.model.release.set()
+        self.encoder.close(timeout=5)
+
+    def test_smoke(self):
+        """
+        Test a single query is encoded like the model would.
+        """
+        self.assertEqual(self.encoder.encode('soup', True).tolist(),
+                         [4.0, 1.0])
+        self.assertEqual(self.encoder.encode('soup').tolist(), [4.0, 1.0])
+        stats = self.encoder.stats
+        self.assertEqual(stats['queries'], 2)
+        self.assertEqual(stats['batches'], 2)
+        self.assertGreater(stats['queries_per_second'], 0)
+
+    def test_batching(self):
+        """
+        Test queries queued while the model is busy share batches of at
+        most max_batch, and each gets its own row.
+        """
+        self.model.release.clear()
+        first = self.encoder.submit('a')
+        futures = [self.encoder.submit('x' * length)
+                   for length in range(1, 7)]
+        self.model.release.set()
+        self.assertEqual(first.result(5).tolist(), [1.0, 1.0])
+        self.assertEqual([future.result(5)[0].item() for future in futures],
+                         list(range(1, 7)))
+        self.assertLessEqual(max(map(len, self.model.batches)), 4)
+        self.assertLess(len(self.model.batches), 7)
+        stats = self.encoder.stats
+        self.assertEqual(stats['queries'], 7)
+        self.assertEqual(stats['max_batch_size'], 4)
+        self.assertGreater(stats['mean_batch_size'], 1)
+        self.assertGreater(stats['max_queue_seconds'], 0)
+
+    def test_errors(self):
+        """
+        Test model errors reach the caller and invalid inputs.
+        """
+        with self.assertRaises(RuntimeError):
+            self.encoder.encode('fail', timeout=5)
+        self.assertEqual(self.encoder.encode('ok', timeout=5)[0], 2)
+        with self.assertRaises(TypeError):
+            self.encoder.submit(['soup'])
+        with self.assertRaises(ValueError):
+            BatchEncoder(self.model, max_batch=0)
+        with self.assertRaises(ValueError):
+            BatchEncoder(self.model, max_wait=-1)
+
+    def test_close(self):
+        """
+        Test closing stops the thread and a later query restarts it.
+        """
+        self.encoder.encode('a')
+        self.encoder.close(timeout=5)
+        self.assertEqual(self.encoder.encode('ab', timeout=5)[0], 2)
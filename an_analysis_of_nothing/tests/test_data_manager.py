@@ -1,10 +1,15 @@
 """
     Module for testing the data manager.
 """
+import json
+import os
+import tempfile
 import unittest
 from collections import OrderedDict
 from unittest.mock import patch
+import numpy as np
 import pandas as pd
+from scipy import sparse
 import torch
 from utils import data_manager
 from . import mock_functions
@@ -46,6 +51,84 @@ class TestDataManager(unittest.TestCase):
         self.assertIsInstance(imdb['Summaries'].iloc[0], list)
         self.assertIsInstance(imdb['keyWords'].iloc[0], list)
 
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv)
+    def test_load_data_bundle(self, _):
+        """
+        Test loading data from the Parquet bundle matches the CSV path.
+        """
+        imdb, script = data_manager.load_data()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            meta_path = os.path.join(tmp_dir, 'metadata.parquet')
+            script_path = os.path.join(tmp_dir, 'scripts.parquet')
+            imdb.to_parquet(meta_path, index=False)
+            script.to_parquet(script_path, index=False)
+            with patch.multiple(data_manager.data_constants,
+                                EPISODE_BUNDLE=meta_path,
+                                SCRIPTS_BUNDLE=script_path):
+                b_imdb, b_script = data_manager.load_data(use_bundle=True)
+
+        self.assertIsInstance(b_imdb.keyWords.iloc[0], list)
+        self.assertIsInstance(b_imdb.Summaries.iloc[0], list)
+        self.assertEqual(b_imdb.keyWords.tolist(), imdb.keyWords.tolist())
+        pd.testing.assert_frame_equal(b_script, script)
+
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv)
+    def test_load_data_bundle_fallback(self, _):
+        """
+        Test that a missing bundle falls back to the CSV files.
+        """
+        with patch.object(data_manager.data_constants, 'EPISODE_BUNDLE',
+                          './does/not/exist.parquet'):
+            imdb, script = data_manager.load_data(use_bundle=True)
+        self.assertEqual(len(imdb), 2)
+        self.assertEqual(len(script), 5)
+        self.assertIsInstance(imdb.keyWords.iloc[0], list)
+
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv)
+    def test_compact_frames(self, _):
+        """
+        Test the compact schema keeps values but shrinks dtypes.
+        """
+        imdb, script = data_manager.load_data()
+        c_imdb, c_script = data_manager.load_data(compact=True)
+        self.assertEqual(c_script.Character.dtype, 'category')
+        self.assertEqual(c_script.SEID.dtype, 'category')
+        self.assertEqual(c_script.Happy.dtype, np.float32)
+        self.assertEqual(c_script.Season.dtype, np.int8)
+        self.assertEqual(c_imdb.Director.dtype, 'category')
+        self.assertEqual(c_script.SEID.tolist(), script.SEID.tolist())
+        self.assertTrue(np.allclose(c_script.Sad, script.Sad))
+        self.assertEqual(c_imdb.keyWords.tolist(), imdb.keyWords.tolist())
+        self.assertEqual(data_manager.get_line_counts(c_script),
+                         data_manager.get_line_counts(script))
+
+        _, f16_script = data_manager.compact_frames(imdb, script,
+                                                    float_dtype='float16')
+        self.assertEqual(f16_script.Fear.dtype, np.float16)
+        with self.assertRaises(ValueError):
+            data_manager.compact_frames(imdb, script, float_dtype='int8')
+
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv_large)
+    def test_memory_report(self, _):
+        """
+        Test the memory report lists every column plus a total.
+        """
+        imdb, script = data_manager.load_data()
+        c_imdb, c_script = data_manager.compact_frames(imdb, script)
+        report = data_manager.memory_report(script, c_script)
+        self.assertEqual(report.index.tolist(),
+                         script.columns.tolist() + ['Total'])
+        self.assertLess(report.loc['Total', 'bytes_after'],
+                        report.loc['Total', 'bytes_before'])
+        self.assertGreater(report.loc['Character', 'saved'], 0.5)
+        self.assertEqual(report.loc['numWords', 'dtype_after'], 'int8')
+        report = data_manager.memory_report(imdb, c_imdb)
+        self.assertIn('Total', report.index)
+
     @patch('utils.data_manager.pd.read_csv',
            side_effect=mock_functions.mocked_read_csv)
     def test_line_counts(self, _):
@@ -61,6 +144,28 @@ class TestDataManager(unittest.TestCase):
         self.assertEqual(counts['JERRY'], 3)
         self.assertEqual(counts['GEORGE'], 2)
 
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_character_read_csv)
+    def test_speaker_table(self, _):
+        """
+        Test the exploded speakers table splits joint lines and is cached.
+        """
+        _, script = data_manager.load_data()
+        table = data_manager.get_speaker_table(script)
+        self.assertEqual(table.line.tolist(), [0, 1, 2, 3, 3, 4, 5])
+        self.assertEqual(table.speaker.tolist(),
+                         ['JERRY', 'JERRY', 'GEORGE', 'JERRY', 'GEORGE',
+                          'GEORGE', 'PETER'])
+        self.assertEqual(table.speaker.cat.categories.tolist(),
+                         ['JERRY', 'GEORGE', 'PETER'])
+        self.assertIs(data_manager.get_speaker_table(script), table)
+        self.assertIsNot(data_manager.get_speaker_table(script.copy()),
+                         table)
+
+        counts = data_manager.get_line_counts(script)
+        self.assertEqual(list(counts.items()),
+                         [('JERRY', 3), ('GEORGE', 3), ('PETER', 1)])
+
     @patch('utils.data_manager.pd.read_csv',
            side_effect=mock_functions.mocked_read_csv)
     def test_get_line_counts_per_episode(self, _):
@@ -91,6 +196,72 @@ class TestDataManager(unittest.TestCase):
         self.assertEqual(counts['GEORGE'].tolist(), [2, 1])
         self.assertEqual(counts['KRAMER'].tolist(), [0, 0])
 
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_character_read_csv)
+    def test_count_matrix(self, _):
+        """
+        Test count matrix for every character, grouped by SEID & Season.
+        """
+        _, script = data_manager.load_data()
+        counts, rows, cols = data_manager.count_matrix(script)
+        self.assertEqual(rows.tolist(), ['JERRY', 'GEORGE', 'PETER'])
+        self.assertEqual(cols.tolist(), ['S01E01', 'S01E02'])
+        self.assertEqual(counts.tolist(), [[3, 0], [2, 1], [0, 1]])
+
+        counts, rows, cols = data_manager.count_matrix(
+            script, ['PETER', 'JABRONI'], by='Season', sparse=True)
+        self.assertTrue(sparse.isspmatrix_csr(counts))
+        self.assertEqual(rows.tolist(), ['PETER', 'JABRONI'])
+        self.assertEqual(cols.tolist(), [1])
+        self.assertEqual(counts.toarray().tolist(), [[1], [0]])
+
+    def test_count_matrix_scene(self):
+        """
+        Test count matrix grouped by scenes, which start at SETTING lines.
+        """
+        script = pd.DataFrame({
+            'Character': ['SETTING', 'JERRY', 'GEORGE & JERRY', 'SETTING',
+                          'KRAMER', 'ELAINE'],
+            'SEID': ['S01E01'] * 5 + ['S01E02']})
+        counts, rows, cols = data_manager.count_matrix(
+            script, ['JERRY', 'KRAMER', 'ELAINE'], by='Scene')
+        self.assertEqual(cols.tolist(), [('S01E01', 1), ('S01E01', 2),
+                                         ('S01E02', 0)])
+        self.assertEqual(rows.tolist(), ['JERRY', 'KRAMER', 'ELAINE'])
+        self.assertEqual(counts.tolist(), [[2, 0, 0], [0, 1, 0], [0, 0, 1]])
+
+    def test_count_matrix_exact(self):
+        """
+        Test exact counts leave joint lines out.
+        """
+        script = pd.DataFrame({
+            'Character': ['JERRY', 'GEORGE & JERRY', None, 'GEORGE',
+                          'JERRY'],
+            'Season': [1, 1, 1, 2, 2]})
+        counts, rows, cols = data_manager.count_matrix(
+            script, ['JERRY', 'GEORGE'], by='Season', exact=True)
+        self.assertEqual(rows.tolist(), ['JERRY', 'GEORGE'])
+        self.assertEqual(cols.tolist(), [1, 2])
+        self.assertEqual(counts.tolist(), [[1, 1], [0, 1]])
+        counts, rows, _ = data_manager.count_matrix(
+            iter([script[:3], script[3:]]), by='Season', exact=True)
+        self.assertEqual(rows.tolist(), ['JERRY', 'GEORGE & JERRY',
+                                         'GEORGE'])
+        self.assertEqual(counts.tolist(), [[1, 1], [1, 0], [0, 1]])
+
+    def test_count_matrix_large(self):
+        """
+        Test more speakers x groups than small categorical codes hold.
+        """
+        script = pd.DataFrame({
+            'Character': [f"C{i % 300}" for i in range(3000)],
+            'SEID': [f"S{i // 10:03d}" for i in range(3000)]})
+        counts, rows, cols = data_manager.count_matrix(script)
+        self.assertEqual(counts.shape, (300, 300))
+        self.assertEqual(int(counts.sum()), 3000)
+        self.assertEqual(counts[rows.get_loc('C299'),
+                                cols.get_loc('S299')], 1)
+
     @patch('utils.data_manager.pd.read_csv',
            side_effect=mock_functions.mocked_character_read_csv)
     def test_line_counts_specific(self, _):
@@ -153,6 +324,173 @@ class TestQueryTensor(unittest.TestCase):
         tensor = data_manager.get_episode_query_tensors()
         self.assertIsInstance(tensor, torch.Tensor)
 
+    def test_embedding_store(self):
+        """
+        Test the store is memory-mapped and exposed without a copy.
+        """
+        embeddings = np.random.rand(20, 8).astype(np.float32)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store_path = os.path.join(tmp_dir, 'dialogue_embeddings.npy')
+            np.save(store_path, embeddings)
+            store = data_manager.load_embedding_store(store_path)
+            self.assertIsInstance(store, np.memmap)
+            self.assertFalse(store.flags.writeable)
+
+            with patch.object(data_manager.data_constants,
+                              'EMBEDDING_STORE', store_path), \
+                    patch.object(data_manager, 'load_embedding_store',
+                                 return_value=store):
+                tensor = data_manager.get_episode_query_tensors()
+            self.assertEqual(tuple(tensor.shape), (20, 8))
+            self.assertTrue(np.allclose(tensor.numpy(), embeddings))
+            self.assertTrue(np.shares_memory(tensor.numpy(), store))
+            del store, tensor
+
+    def test_embedding_store_dtype(self):
+        """
+        Test that a store with the wrong dtype is rejected.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store_path = os.path.join(tmp_dir, 'dialogue_embeddings.npy')
+            np.save(store_path, np.zeros((3, 4)))
+            with self.assertRaises(ValueError):
+                data_manager.load_embedding_store(store_path)
+
+
+class TestStreaming(unittest.TestCase):
+    """
+    Test class for streaming scripts in SEID-aligned chunks
+    """
+
+    def setUp(self):
+        self.script = pd.DataFrame({
+            'Character': ['JERRY', 'GEORGE & JERRY', 'KRAMER', 'JERRY',
+                          'ELAINE', 'NEWMAN', 'ELAINE & KRAMER'],
+            'Dialogue': ['a', 'b', 'c', 'd', 'e', 'f', 'g'],
+            'SEID': ['S01E01'] * 3 + ['S01E02'] * 2 + ['S02E01'] * 2,
+            'Season': [1] * 5 + [2] * 2})
+
+    def chunks(self, size):
+        """
+        Split the test scripts every size lines, ignoring episodes.
+        """
+        return (self.script.iloc[i:i + size]
+                for i in range(0, len(self.script), size))
+
+    def test_align_chunks(self):
+        """
+        Test every episode lands in exactly one chunk.
+        """
+        for size in [1, 2, 4, 10]:
+            chunks = list(data_manager.align_chunks(self.chunks(size)))
+            seids = [chunk.SEID.unique().tolist() for chunk in chunks]
+            flat = [seid for group in seids for seid in group]
+            self.assertEqual(flat, ['S01E01', 'S01E02', 'S02E01'])
+            self.assertTrue(pd.concat(chunks).equals(self.script))
+
+    def test_stream_counts(self):
+        """
+        Test the count helpers reduce a stream to the in-memory result.
+        """
+        stream = data_manager.align_chunks(self.chunks(2))
+        self.assertEqual(data_manager.get_line_counts(stream),
+                         data_manager.get_line_counts(self.script))
+        stream = data_manager.align_chunks(self.chunks(2))
+        counts = data_manager.get_line_counts_per_episode(stream)
+        self.assertEqual(counts['JERRY'].tolist(), [2, 1, 0])
+        self.assertEqual(counts['KRAMER'].tolist(), [1, 0, 1])
+        # Unaligned chunks are summed per group
+        counts, rows, cols = data_manager.count_matrix(self.chunks(3),
+                                                       by='Season')
+        full = data_manager.count_matrix(self.script, by='Season')
+        self.assertEqual(counts.tolist(), full[0].tolist())
+        self.assertEqual(rows.tolist(), full[1].tolist())
+        self.assertEqual(cols.tolist(), [1, 2])
+
+    def test_iter_scripts(self):
+        """
+        Test streaming the scripts from the CSV file and the bundle.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, 'scripts.csv')
+            parquet_path = os.path.join(tmp_dir, 'scripts.parquet')
+            self.script.to_csv(csv_path, index=False)
+            with patch.object(data_manager.data_constants, 'SCRIPTS_LINK',
+                              csv_path), \
+                    patch.object(data_manager.data_constants,
+                                 'SCRIPTS_BUNDLE', parquet_path):
+                chunks = list(data_manager.iter_scripts(chunksize=2))
+                self.assertEqual([len(chunk) for chunk in chunks],
+                                 [3, 2, 2])
+                self.script.to_parquet(parquet_path, index=False)
+                counts = data_manager.get_line_counts(
+                    data_manager.iter_scripts(chunksize=4))
+            self.assertEqual(counts,
+                             data_manager.get_line_counts(self.script))
+
+    def test_iter_scripts_errors(self):
+        """
+        Test invalid chunk sizes.
+        """
+        with self.assertRaises(TypeError):
+            data_manager.iter_scripts(chunksize='10')
+        with self.assertRaises(ValueError):
+            data_manager.iter_scripts(chunksize=0)
+        with self.assertRaises(TypeError):
+            data_manager.count_matrix([self.script])
+
+
+class TestManifest(unittest.TestCase):
+    """
+    Test class for reading the data manifest
+    """
+
+    def test_data_version(self):
+        """
+        Test the version is read and refreshed when the manifest changes.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'manifest.json')
+            self.assertIsNone(data_manager.read_manifest(path))
+            self.assertIsNone(data_manager.get_data_version(path, []))
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump({'version': 'aaaa', 'artifacts': {}}, file)
+            self.assertEqual(data_manager.get_data_version(path), 'aaaa')
+            self.assertEqual(data_manager.read_manifest(path)['artifacts'],
+                             {})
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump({'version': 'bbbbbb', 'artifacts': {}}, file)
+            self.assertEqual(data_manager.get_data_version(path), 'bbbbbb')
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump({'artifacts': {}}, file)
+            with self.assertRaises(ValueError):
+                data_manager.read_manifest(path)
+
+    def test_files_version(self):
+        """
+        Test the data is versioned by its files without a manifest.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            manifest = os.path.join(tmp_dir, 'manifest.json')
+            files = [os.path.join(tmp_dir, name)
+                     for name in ('scripts.csv', 'missing.csv')]
+            self.assertIsNone(data_manager.get_data_version(manifest, files))
+            with open(files[0], 'w', encoding='utf-8') as file:
+                file.write('Character,Dialogue\n')
+            version = data_manager.get_data_version(manifest, files)
+            self.assertTrue(version.startswith('files-'))
+            self.assertEqual(data_manager.get_data_version(manifest, files),
+                             version)
+            with open(files[0], 'a', encoding='utf-8') as file:
+                file.write('JERRY,Hello\n')
+            self.assertNotEqual(
+                data_manager.get_data_version(manifest, files), version)
+            # A manifest takes precedence
+            with open(manifest, 'w', encoding='utf-8') as file:
+                json.dump({'version': 'aaaa', 'artifacts': {}}, file)
+            self.assertEqual(data_manager.get_data_version(manifest, files),
+                             'aaaa')
+
 
 class TestDataManagerErrors(unittest.TestCase):
     """
@@ -185,6 +523,19 @@ class TestDataManagerErrors(unittest.TestCase):
         """
         with self.assertRaises(TypeError):
             data_manager.get_line_counts(['one', 'two', 'three'])
+        with self.assertRaises(TypeError):
+            data_manager.get_speaker_table(['one', 'two', 'three'])
+
+    def test_load_data(self):
+        """
+        Test invalid bundle and compact flags.
+        """
+        with self.assertRaises(TypeError):
+            data_manager.load_data(use_bundle='yes')
+        with self.assertRaises(TypeError):
+            data_manager.load_data(compact='yes')
+        with self.assertRaises(TypeError):
+            data_manager.memory_report('before', pd.DataFrame())
 
     @patch('utils.data_manager.pd.read_csv',
            side_effect=mock_functions.mocked_read_csv)
@@ -199,3 +550,8 @@ class TestDataManagerErrors(unittest.TestCase):
 
         with self.assertRaises(TypeError):
             data_manager.get_line_counts_per_episode('script', ['kramer'])
+
+        with self.assertRaises(TypeError):
+            data_manager.count_matrix(script, 'kramer')
+        with self.assertRaises(ValueError):
+            data_manager.count_matrix(script, by='Director')
@@ -0,0 +1,121 @@
+"""
+    Module for testing the dialogue store.
+"""
+import pickle
+import unittest
+from unittest.mock import patch
+import numpy as np
+from utils import data_manager
+from utils.dialogue_store import DialogueStore
+from . import mock_functions
+
+
+class TestDialogueStore(unittest.TestCase):
+    """
+    Test class for the DialogueStore class
+    """
+
+    def setUp(self):
+        self.lines = ['Hello, Newman.', '', 'Café ☕ — serenity now!',
+                      'No soup for you!', 'Yada yada yada.']
+        self.seids = ['S01E02', 'S01E02', 'S09E03', 'S01E01', 'S09E03']
+        self.store = DialogueStore(self.lines, self.seids)
+
+    def test_smoke(self):
+        """
+        Test every line round-trips through the buffer.
+        """
+        self.assertEqual(len(self.store), 5)
+        self.assertEqual(self.store.take(range(5)).tolist(), self.lines)
+        self.assertEqual(self.store[2], self.lines[2])
+        self.assertEqual(self.store[-1], self.lines[-1])
+        self.assertEqual(self.store[1:3].tolist(), self.lines[1:3])
+        self.assertEqual(self.store.buffer.dtype, np.uint8)
+        self.assertEqual(self.store.offsets.dtype, np.int64)
+
+    def test_take(self):
+        """
+        Test gathering lines by an index array, with repeats.
+        """
+        lines = self.store.take(np.array([3, 0, 3, 1]))
+        self.assertEqual(lines.tolist(), ['No soup for you!',
+                                          'Hello, Newman.',
+                                          'No soup for you!', ''])
+        self.assertEqual(len(self.store.take([])), 0)
+        with self.assertRaises(IndexError):
+            self.store.take([5])
+
+    def test_lines_for_seid(self):
+        """
+        Test fetching all lines of an episode in script order.
+        """
+        self.assertEqual(self.store.lines_for_seid('S09E03').tolist(),
+                         [self.lines[2], self.lines[4]])
+        self.assertEqual(self.store.rows_for_seid('S01E02').tolist(), [0, 1])
+        self.assertEqual(self.store.rows_for_seids(['S09E03', 'S01E01',
+                                                    'S10E01']).tolist(),
+                         [2, 3, 4])
+        self.assertEqual(len(self.store.rows_for_seids([])), 0)
+        self.assertEqual(len(self.store.lines_for_seid('S10E01')), 0)
+        self.assertEqual(self.store.seid_labels[self.store.seid_codes]
+                         .tolist(), self.seids)
+
+    def test_episode_scores(self):
+        """
+        Test line scores reduce to the max or top-n mean per episode.
+        """
+        scores = np.array([0.1, 0.5, 0.2, 0.9, 0.4])
+        seids, best = self.store.episode_scores(scores)
+        self.assertEqual(seids.tolist(), ['S01E01', 'S01E02', 'S09E03'])
+        self.assertTrue(np.allclose(best, [0.9, 0.5, 0.4]))
+        _, mean = self.store.episode_scores(scores, top_n=2)
+        self.assertTrue(np.allclose(mean, [0.9, 0.3, 0.3]))
+        seids, best = self.store.episode_scores(scores[[0, 2, 4]],
+                                                rows=np.array([0, 2, 4]))
+        self.assertEqual(seids.tolist(), ['S01E02', 'S09E03'])
+        self.assertTrue(np.allclose(best, [0.1, 0.4]))
+        self.assertEqual(len(self.store.episode_scores(
+            [], rows=np.array([], dtype=np.int64))[0]), 0)
+        with self.assertRaises(ValueError):
+            self.store.episode_scores(scores, top_n=0)
+        with self.assertRaises(ValueError):
+            self.store.episode_scores(scores[:2])
+
+    def test_pickle(self):
+        """
+        Test the store survives a pickle round trip.
+        """
+        store = pickle.loads(pickle.dumps(self.store))
+        self.assertEqual(store.take(range(5)).tolist(), self.lines)
+        self.assertEqual(store.lines_for_seid('S01E01').tolist(),
+                         ['No soup for you!'])
+
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv)
+    def test_from_scripts(self, _):
+        """
+        Test building a store aligned with the scripts DataFrame.
+        """
+        _, script = data_manager.load_data()
+        store = DialogueStore.from_scripts(script)
+        self.assertEqual(len(store), len(script))
+        self.assertEqual(store.take(range(len(script))).tolist(),
+                         script.Dialogue.tolist())
+        self.assertEqual(len(store.lines_for_seid('S01E01')), 4)
+
+
+class TestDialogueStoreErrors(unittest.TestCase):
+    """
+    Test class for DialogueStore error handling
+    """
+
+    def test_errors(self):
+        """
+        Test invalid inputs.
+        """
+        with self.assertRaises(ValueError):
+            DialogueStore(['bad\x00line'])
+        with self.assertRaises(ValueError):
+            DialogueStore(['one', 'two'], ['S01E01'])
+        with self.assertRaises(TypeError):
+            DialogueStore.from_scripts(['one', 'two'])
@@ -0,0 +1,93 @@
+"""
+    Module for testing the encoder backends.
+"""
+import unittest
+from unittest.mock import patch
+import numpy as np
+import torch
+from utils import encoder_backends
+
+
+class FakeModel(torch.nn.Module):
+    """
+    Model mocking SentenceTransformer: embeds a string through two
+    linear layers from its character counts.
+    """
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.layers = torch.nn.Sequential(
+            torch.nn.Linear(26, 64), torch.nn.ReLU(), torch.nn.Linear(64, 16))
+
+    def forward(self, counts):
+        """
+        Embed character counts.
+        """
+        return self.layers(counts)
+
+    def encode(self, sentences, batch_size=32):
+        """
+        Return one row per sentence.
+        """
+        del batch_size
+        counts = torch.tensor([[sentence.count(chr(97 + i))
+                                for i in range(26)]
+                               for sentence in sentences],
+                              dtype=torch.float32)
+        with torch.no_grad():
+            return self(counts).numpy()
+
+
+class TestEncoderBackends(unittest.TestCase):
+    """
+    Test class for the encoder backends
+    """
+
+    def setUp(self):
+        self.sentences = ['no soup for you', 'kramer falls over',
+                          'serenity now', 'yada yada yada']
+
+    def test_quantize(self):
+        """
+        Test linear layers are quantised and agree with the float model.
+        """
+        model = encoder_backends.quantize_encoder(FakeModel())
+        self.assertIsInstance(model.layers[0],
+                              torch.ao.nn.quantized.dynamic.Linear)
+        agreement = encoder_backends.encoder_agreement(
+            FakeModel(), model, self.sentences)
+        self.assertEqual(agreement['sentences'], 4)
+        self.assertGreater(agreement['min'], 0.99)
+        self.assertLessEqual(agreement['mean'], 1 + 1e-6)
+        self.assertLessEqual(agreement['min'], agreement['p1'])
+
+    def test_agreement(self):
+        """
+        Test disagreeing encoders are reported as such.
+        """
+        other = FakeModel()
+        with torch.no_grad():
+            other.layers[2].weight.neg_()
+            other.layers[2].bias.neg_()
+        agreement = encoder_backends.encoder_agreement(
+            FakeModel(), other, self.sentences)
+        self.assertTrue(np.isclose(agreement['mean'], -1, atol=1e-5))
+        with self.assertRaises(ValueError):
+            encoder_backends.encoder_agreement(FakeModel(), other, [])
+
+    @patch('sentence_transformers.SentenceTransformer')
+    def test_load(self, transformer):
+        """
+        Test each backend loads the model, quantising it for int8.
+        """
+        transformer.return_value = FakeModel()
+        model = encoder_backends.load_encoder('all-MiniLM-L6-v2', 'int8')
+        transformer.assert_called_once_with('all-MiniLM-L6-v2', device='cpu')
+        self.assertIsInstance(model.layers[2],
+                              torch.ao.nn.quantized.dynamic.Linear)
+        transformer.return_value = FakeModel()
+        model = encoder_backends.load_encoder('all-MiniLM-L6-v2')
+        self.assertIsInstance(model.layers[2], torch.nn.Linear)
+        with self.assertRaises(ValueError):
+            encoder_backends.load_encoder('all-MiniLM-L6-v2', 'int4')
@@ -4,6 +4,12 @@ Specifically, the tests will extract:
     * Filter Search Results
     * Load Corpus
     * Query Episodes
+    * Query Lexical
+    * Search Quotes
+    * Search Lines
+    * Score Lines
+    * Get Ranked Episodes
+    * Get Hit Episodes
     * Get Selected Row
     * Get Characters
     * Get Seasons
@@ -11,14 +17,19 @@ Specifically, the tests will extract:
     * Get Script from Episode
     * Extract Emotions
     * Extract Argument Max
+    * Sum Emotions
 """
 
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 import pandas as pd
 import numpy as np
 import torch
 from utils import data_manager, episode_query
+from utils.dialogue_store import DialogueStore
+from utils.lexical_index import BM25Index
+from utils.search_index import EpisodeIndex
+from utils.vector_search import BinaryEmbeddings, QuantizedEmbeddings
 from . import mock_functions
 
 
@@ -253,6 +264,31 @@ class TestExtractArgmax(unittest.TestCase):
         self.assertEqual(emotion, 'No Emotion')
 
 
+class TestSumEmotions(unittest.TestCase):
+    """
+    Test class for the sum_emotions() method
+    """
+
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv_query)
+    def test_smoke(self, _):
+        """
+        Test one episode gives one row, also on the compact frames
+        where SEID is categorical.
+        """
+        for compact in [False, True]:
+            imdb, script = data_manager.load_data(compact=compact)
+            selected = episode_query.get_script_from_ep(
+                imdb, script, "Good News, Bad News")
+            totals = episode_query.sum_emotions(selected)
+            self.assertEqual(totals.SEID.astype(str).tolist(), ['S01E01'])
+            self.assertAlmostEqual(
+                totals.Happy.item(),
+                script.Happy[script.SEID == 'S01E01'].sum(), places=3)
+        with self.assertRaises(TypeError):
+            episode_query.sum_emotions(None)
+
+
 class TestGetCharacters(unittest.TestCase):
     """
     Test class for the get_characters() method
@@ -272,6 +308,17 @@ class TestGetCharacters(unittest.TestCase):
         self.assertIn('S01E02', eps.SEID.tolist())
         self.assertEqual(len(eps.SEID.tolist()), 2)
 
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv_query)
+    def test_compact(self, _):
+        """
+        Tests the compact frames, where SEID is categorical.
+        """
+        imdb, script = data_manager.load_data(compact=True)
+        eps = episode_query.get_characters(imdb, script, ['JERRY'])
+        self.assertEqual(eps.SEID.astype(str).tolist(),
+                         ['S01E01', 'S01E02'])
+
     @patch('utils.data_manager.pd.read_csv',
            side_effect=mock_functions.mocked_read_csv_query)
     def test_multiple_characters(self, _):
@@ -316,6 +363,217 @@ class TestLoadCorpus(unittest.TestCase):
         self.assertIsInstance(c_emb, torch.Tensor)
 
 
+class TestSearchQuotes(unittest.TestCase):
+    """
+    Test class for the search_quotes() method
+    """
+
+    @patch('utils.episode_query.find_quotes')
+    def test_smoke(self, find_quotes):
+        """
+        Test the filters are passed to the database, empty ones as None.
+        """
+        result = episode_query.search_quotes('serenity now', [9], (8, 9),
+                                             [], limit=10)
+        self.assertIs(result, find_quotes.return_value)
+        find_quotes.assert_called_once_with('serenity now', [9], (8, 9),
+                                            None, 10)
+
+    def test_errors(self):
+        """
+        Test invalid inputs.
+        """
+        with self.assertRaises(TypeError):
+            episode_query.search_quotes(5)
+        with self.assertRaises(TypeError):
+            episode_query.search_quotes('soup', season_choice=1)
+        with self.assertRaises(TypeError):
+            episode_query.search_quotes('soup', rating_choice=8)
+        with self.assertRaises(TypeError):
+            episode_query.search_quotes('soup', char_choice='JERRY')
+
+
+class TestGetHitEpisodes(unittest.TestCase):
+    """
+    Test class for the get_hit_episodes() method
+    """
+
+    def setUp(self):
+        seids = ['S01E01'] * 3 + ['S01E02'] * 2 + ['S02E01'] * 2 + \
+            ['S02E02'] * 3
+        self.corpus = DialogueStore([str(i) for i in range(10)], seids)
+        self.imdb = pd.DataFrame({
+            'SEID': ['S02E02', 'S01E01', 'S01E02', 'S02E01'],
+            'Title': ['The D', 'The A', 'The B', 'The C'],
+            'Season': [2, 1, 1, 2]})
+
+    def test_smoke(self):
+        """
+        Test the first distinct episodes among the hits are returned.
+        """
+        hits = np.array([4, 3, 0, 9, 5, 6])
+        result = episode_query.get_hit_episodes(self.imdb, self.corpus,
+                                                hits, num_episodes=2)
+        # df_imdb order, not hit order
+        self.assertEqual(result.Title.tolist(), ['The A', 'The B'])
+        result = episode_query.get_hit_episodes(self.imdb, self.corpus, hits)
+        self.assertEqual(len(result), 4)
+
+    def test_filtered(self):
+        """
+        Test hits from episodes outside df_imdb are skipped.
+        """
+        filtered = self.imdb[self.imdb.Season == 2]
+        result = episode_query.get_hit_episodes(
+            filtered, self.corpus, np.array([0, 1, 8, 3]), num_episodes=5)
+        self.assertEqual(result.Title.tolist(), ['The D'])
+        self.assertTrue(episode_query.get_hit_episodes(
+            filtered.iloc[:0], self.corpus, np.array([8])).empty)
+
+    def test_errors(self):
+        """
+        Test invalid inputs.
+        """
+        with self.assertRaises(TypeError):
+            episode_query.get_hit_episodes('imdb', self.corpus, [0])
+        with self.assertRaises(TypeError):
+            episode_query.get_hit_episodes(self.imdb, ['line'], [0])
+
+
+class TestQueryEpisodes(unittest.TestCase):
+    """
+    Test class for the query_episodes() and search_lines() methods
+    """
+
+    def setUp(self):
+        seids = ['S01E01'] * 3 + ['S01E02'] * 2 + ['S02E01'] * 2 + \
+            ['S02E02'] * 3
+        self.corpus = DialogueStore([str(i) for i in range(10)], seids)
+        self.imdb = pd.DataFrame({
+            'SEID': ['S02E02', 'S01E01', 'S01E02', 'S02E01'],
+            'Title': ['The D', 'The A', 'The B', 'The C'],
+            'Season': [2, 1, 1, 2]})
+        # Similarity to the query falls with the row number
+        angles = np.linspace(0, 1.5, 10)
+        self.embeddings = torch.tensor(
+            np.stack([np.cos(angles), np.sin(angles)], axis=1),
+            dtype=torch.float32)
+        self.vector = torch.tensor([1.0, 0.0])
+        self.embedder = mock_functions.FakeEncoder(lambda _: self.vector)
+
+    def test_search_lines(self):
+        """
+        Test only the given rows are scored, best first.
+        """
+        rows = np.array([2, 5, 8, 9])
+        for embeddings in (self.embeddings, QuantizedEmbeddings.quantize(
+                self.embeddings.numpy(), 'int8'),
+                BinaryEmbeddings.from_embeddings(self.embeddings.numpy())):
+            self.assertEqual(episode_query.search_lines(
+                embeddings, self.vector, 3).tolist(), [0, 1, 2])
+            self.assertEqual(episode_query.search_lines(
+                embeddings, self.vector, 500, rows).tolist(),
+                rows.tolist())
+
+    def test_filtered(self):
+        """
+        Test filtered searches are filled from the eligible episodes.
+        """
+        filtered = self.imdb[self.imdb.Season == 2]
+        for embeddings in (self.embeddings, QuantizedEmbeddings.quantize(
+                self.embeddings.numpy(), 'float16'), EpisodeIndex.build(
+                    self.embeddings.numpy(), self.corpus.seid_codes)):
+            session = MagicMock()
+            session.query = (self.corpus, embeddings, self.embedder)
+            with patch('streamlit.session_state', session):
+                result = episode_query.query_episodes(
+                    filtered, pd.DataFrame(), 'query', num_episodes=2)
+                self.assertEqual(result.Title.tolist(), ['The D', 'The C'])
+                result = episode_query.query_episodes(
+                    self.imdb, pd.DataFrame(), 'query', num_episodes=1)
+                self.assertEqual(result.Title.tolist(), ['The A'])
+
+    def test_episode_scoring(self):
+        """
+        Test episodes are ranked by their best or top-n mean line score.
+        """
+        # One close line in S02E02 beats three fairly close S01E01 lines
+        self.embeddings[9] = torch.tensor([1.0, 0.0])
+        session = MagicMock()
+        session.query = (self.corpus, self.embeddings, self.embedder)
+        with patch('streamlit.session_state', session):
+            result = episode_query.query_episodes(
+                self.imdb, pd.DataFrame(), 'query', num_episodes=2, top_n=1)
+            self.assertEqual(result.Title.tolist(), ['The D', 'The A'])
+            result = episode_query.query_episodes(
+                self.imdb, pd.DataFrame(), 'query', num_episodes=1, top_n=3)
+            self.assertEqual(result.Title.tolist(), ['The A'])
+            result = episode_query.query_episodes(
+                self.imdb[self.imdb.Season == 2], pd.DataFrame(), 'query',
+                num_episodes=5, top_n=2)
+            self.assertEqual(result.Title.tolist(), ['The D', 'The C'])
+
+    def test_lexical(self):
+        """
+        Test lexical searches skip the encoder and hybrid ones fuse.
+        """
+        lines = ['soup', 'hello', 'hi', 'no', 'soup soup', 'x', 'y', 'z',
+                 "Bania's", 'w']
+        corpus = DialogueStore(
+            lines, self.corpus.seid_labels[self.corpus.seid_codes])
+        session = MagicMock()
+        session.query = (corpus, self.embeddings, MagicMock())
+        session.lexical = BM25Index.build(lines)
+        with patch('streamlit.session_state', session):
+            result = episode_query.query_episodes(
+                self.imdb, pd.DataFrame(), 'Bania', mode='lexical')
+            self.assertEqual(result.Title.tolist(), ['The D'])
+            result = episode_query.query_episodes(
+                self.imdb, pd.DataFrame(), 'soup', top_n=1, mode='lexical')
+            self.assertEqual(result.Title.tolist(), ['The A', 'The B'])
+            self.assertTrue(episode_query.query_episodes(
+                self.imdb[self.imdb.Season == 2], pd.DataFrame(), 'soup',
+                mode='lexical').empty)
+            session.query[2].encode.assert_not_called()
+            # Equal semantic scores: the lexical match decides
+            session.query = (corpus, self.embeddings,
+                             mock_functions.FakeEncoder(
+                                 lambda _: torch.zeros(2)))
+            result = episode_query.query_episodes(
+                self.imdb, pd.DataFrame(), 'bania', num_episodes=1,
+                mode='hybrid')
+            self.assertEqual(result.Title.tolist(), ['The D'])
+            with self.assertRaises(ValueError):
+                episode_query.query_episodes(
+                    self.imdb, pd.DataFrame(), 'soup', mode='fuzzy')
+
+    def test_score_lines(self):
+        """
+        Test compact and full corpora give the same cosine scores.
+        """
+        rows = np.array([1, 4, 7])
+        full = episode_query.score_lines(self.embeddings,
+                                         self.vector * 2, rows)
+        compact = episode_query.score_lines(
+            QuantizedEmbeddings.quantize(self.embeddings.numpy(), 'int8'),
+            self.vector * 2, rows)
+        self.assertTrue(np.allclose(full, np.cos(np.linspace(0, 1.5, 10))
+                                    [rows], atol=1e-6))
+        self.assertTrue(np.allclose(compact, full, atol=1e-2))
+
+    def test_get_ranked_episodes(self):
+        """
+        Test the best scoring episodes in df_imdb are returned.
+        """
+        seids = np.array(['S01E01', 'S01E02', 'S02E01', 'S03E01'])
+        scores = np.array([0.2, 0.9, 0.5, 1.0])
+        result = episode_query.get_ranked_episodes(self.imdb, seids, scores,
+                                                   num_episodes=2)
+        self.assertEqual(result.Title.tolist(), ['The B', 'The C'])
+        with self.assertRaises(TypeError):
+            episode_query.get_ranked_episodes('imdb', seids, scores)
+
+
 class TestFilterSearchResults(unittest.TestCase):
     """
     Test class for the filter_search_results() method
@@ -547,6 +805,8 @@ class TestError(unittest.TestCase):
         """
         with self.assertRaises(TypeError):
             episode_query.load_corpus('script')
+        with self.assertRaises(ValueError):
+            episode_query.load_corpus(pd.DataFrame(), storage='int4')
 
     @patch('utils.data_manager.pd.read_csv',
            side_effect=mock_functions.mocked_read_csv_large)
@@ -0,0 +1,70 @@
+"""
+    Module for testing that importing the app's modules stays fast.
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules imported on every app start and every test collection
+STARTUP_MODULES = ['utils.batch_encoder', 'utils.data_manager',
+                   'utils.dialogue_store', 'utils.episode_query',
+                   'utils.lexical_index',
+                   'utils.recommender', 'utils.query_cache',
+                   'utils.resources', 'utils.result_cache',
+                   'utils.scripts_db',
+                   'utils.search_index', 'utils.shared_data',
+                   'utils.vector_search', 'app_pages.load_session']
+# Only loaded by the functions that need them
+HEAVY_MODULES = ['torch', 'sentence_transformers', 'sklearn', 'st_aggrid',
+                 'scipy', 'plotly.express']
+# Cumulative import time budget in microseconds; importing torch alone
+# costs more than this.
+IMPORT_BUDGET_US = 3_000_000
+
+
+def import_times(modules):
+    """
+    Import modules in a fresh interpreter with -X importtime.
+    :param modules: list of module names.
+    :return: dict of every imported module -> cumulative microseconds,
+        and the total for the whole import statement.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         'import ' + ', '.join(modules)],
+        cwd=APP_DIR, capture_output=True, text=True, check=True)
+    times, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+        # Unindented names were imported directly by the statement
+        if not name[1:].startswith(' '):
+            total += int(cumulative)
+    return times, total
+
+
+class TestImportTime(unittest.TestCase):
+    """
+    Test class for app start-up import cost
+    """
+
+    def test_no_heavy_imports(self):
+        """
+        Test the ML and UI stacks are not imported at start-up.
+        """
+        times, _ = import_times(STARTUP_MODULES)
+        self.assertTrue(all(module in times for module in STARTUP_MODULES))
+        loaded = [module for module in HEAVY_MODULES if module in times]
+        self.assertEqual(loaded, [])
+
+    def test_import_budget(self):
+        """
+        Test the start-up modules import within the time budget.
+        """
+        _, total = import_times(STARTUP_MODULES)
+        self.assertGreater(total, 0)
+        self.assertLess(total, IMPORT_BUDGET_US)
@@ -0,0 +1,127 @@
+"""
+    Module for testing the BM25 inverted index.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from utils import lexical_index
+from utils.dialogue_store import DialogueStore
+from utils.lexical_index import BM25Index, fuse_scores, tokenize
+
+LINES = ['Serenity now! Serenity now!', "Where's Bania?",
+         'Bania, the comedian.', 'No soup for you.',
+         'I want soup, serenity and insanity.', "Don't you know?"]
+
+
+class TestTokenize(unittest.TestCase):
+    """
+    Test class for the tokenize function
+    """
+
+    def test_smoke(self):
+        """
+        Test terms are lower case words without possessives.
+        """
+        self.assertEqual(tokenize("Bania's   SOUP, now!"),
+                         ['bania', 'soup', 'now'])
+        self.assertEqual(tokenize("Don’t"), tokenize('dont'))
+        self.assertEqual(tokenize('...'), [])
+        with self.assertRaises(TypeError):
+            tokenize(None)
+
+
+class TestBM25Index(unittest.TestCase):
+    """
+    Test class for the BM25Index class
+    """
+
+    def setUp(self):
+        self.index = BM25Index.build(LINES)
+
+    def test_smoke(self):
+        """
+        Test posting lists hold the lines and frequencies of a term.
+        """
+        self.assertEqual(len(self.index), len(LINES))
+        lines, counts = self.index.postings('serenity')
+        self.assertEqual(lines.tolist(), [0, 4])
+        self.assertEqual(counts.tolist(), [2, 1])
+        self.assertEqual(len(self.index.postings('festivus')[0]), 0)
+        self.assertGreater(self.index.nbytes, 0)
+
+    def test_scores(self):
+        """
+        Test BM25 scores against a direct computation.
+        """
+        lengths = np.array([len(tokenize(line)) for line in LINES])
+        norms = 1.2 * (1 - 0.75 + 0.75 * lengths / lengths.mean())
+        idf = np.log(1 + (6 - 2 + 0.5) / (2 + 0.5))
+        expected = np.zeros(6)
+        for line, count in [(0, 2), (4, 1)]:
+            expected[line] = idf * count * 2.2 / (count + norms[line])
+        scores = self.index.scores('SERENITY serenity')
+        self.assertTrue(np.allclose(scores, expected))
+        self.assertTrue(np.allclose(self.index.scores('serenity', [1, 4]),
+                                    expected[[1, 4]]))
+        self.assertFalse(self.index.scores('festivus').any())
+
+    def test_search(self):
+        """
+        Test the matching lines come best first, within rows if given.
+        """
+        _, lines = self.index.search('bania soup')
+        self.assertEqual(sorted(lines.tolist()), [1, 2, 3, 4])
+        scores, lines = self.index.search('serenity now', k=1)
+        self.assertEqual(lines.tolist(), [0])
+        self.assertEqual(len(scores), 1)
+        _, lines = self.index.search('serenity now', rows=np.array([3, 4]))
+        self.assertEqual(lines.tolist(), [4])
+        self.assertEqual(len(self.index.search('festivus')[1]), 0)
+
+    def test_save_load(self):
+        """
+        Test the index round trips and rejects other dialogue.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'bm25.npz')
+            self.index.save(path)
+            loaded = BM25Index.load(len(LINES), path)
+            self.assertTrue(np.array_equal(loaded.scores('soup bania'),
+                                           self.index.scores('soup bania')))
+            self.assertEqual(loaded.params, self.index.params)
+            with self.assertRaises(ValueError):
+                BM25Index.load(3, path)
+            with mock.patch.object(BM25Index, 'PATH', path):
+                store = DialogueStore(LINES[:3])
+                self.assertEqual(
+                    len(lexical_index.load_lexical_index(store)), 3)
+
+
+class TestFuseScores(unittest.TestCase):
+    """
+    Test class for the fuse_scores function
+    """
+
+    def test_smoke(self):
+        """
+        Test both scores are scaled to [0, 1] and weighted.
+        """
+        fused = fuse_scores([0.2, 0.4, 0.6], [0, 10, 5], weight=0.5)
+        self.assertTrue(np.allclose(fused, [0, 0.75, 0.75]))
+        self.assertTrue(np.allclose(fuse_scores([0.2, 0.4], [3, 1], 0),
+                                    [0, 1]))
+        # No lexical match keeps the semantic ranking
+        self.assertTrue(np.allclose(fuse_scores([0.2, 0.4], [0, 0]),
+                                    [0, 0.7]))
+        self.assertEqual(len(fuse_scores([], [])), 0)
+
+    def test_errors(self):
+        """
+        Test invalid inputs.
+        """
+        with self.assertRaises(ValueError):
+            fuse_scores([0.1, 0.2], [1])
+        with self.assertRaises(ValueError):
+            fuse_scores([0.1], [1], weight=2)
@@ -0,0 +1,105 @@
+"""
+    Module for testing the process-wide query embedding cache.
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+from utils import query_cache
+from utils.query_cache import QueryCache
+
+
+class TestQueryCache(unittest.TestCase):
+    """
+    Test class for the QueryCache class
+    """
+
+    def test_smoke(self):
+        """
+        Test values round trip and lookups are counted.
+        """
+        cache = QueryCache(max_size=2)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats, {'hits': 1, 'misses': 1,
+                                       'hit_rate': 0.5, 'size': 1})
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats['hits'], 0)
+
+    def test_lru(self):
+        """
+        Test the least recently used entry is evicted first.
+        """
+        cache = QueryCache(max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('utils.query_cache.time.monotonic')
+    def test_ttl(self, monotonic):
+        """
+        Test entries expire after ttl seconds.
+        """
+        monotonic.return_value = 100.0
+        cache = QueryCache(ttl=10)
+        cache.put('a', 1)
+        monotonic.return_value = 109.0
+        self.assertEqual(cache.get('a'), 1)
+        monotonic.return_value = 110.0
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_get_or_compute(self):
+        """
+        Test values are computed once per key.
+        """
+        cache = QueryCache()
+        compute = MagicMock(return_value=[1.0])
+        self.assertEqual(cache.get_or_compute('a', compute), [1.0])
+        self.assertEqual(cache.get_or_compute('a', compute), [1.0])
+        compute.assert_called_once()
+
+    def test_errors(self):
+        """
+        Test invalid inputs.
+        """
+        with self.assertRaises(ValueError):
+            QueryCache(max_size=0)
+        with self.assertRaises(ValueError):
+            QueryCache(ttl=0)
+        with self.assertRaises(TypeError):
+            query_cache.normalize_query(None)
+
+
+class TestEncodeQuery(unittest.TestCase):
+    """
+    Test class for the encode_query() method
+    """
+
+    def setUp(self):
+        query_cache.get_query_cache().clear()
+
+    def tearDown(self):
+        query_cache.get_query_cache().clear()
+
+    def test_smoke(self):
+        """
+        Test repeated and re-spaced queries are encoded once per model.
+        """
+        embedder = MagicMock()
+        embedder.encode.return_value = 'vector'
+        self.assertEqual(query_cache.encode_query(embedder, 'No soup'),
+                         'vector')
+        self.assertEqual(query_cache.encode_query(embedder, ' no  SOUP '),
+                         'vector')
+        embedder.encode.assert_called_once_with('no soup',
+                                                convert_to_tensor=True)
+        other = MagicMock()
+        query_cache.encode_query(other, 'no soup')
+        other.encode.assert_called_once()
+        self.assertEqual(query_cache.get_query_cache().stats['hits'], 1)
@@ -4,10 +4,20 @@
 
 import unittest
 from unittest.mock import patch
+import numpy as np
 from utils.recommender import Recommender, data_manager
 from . import mock_functions
 
 
+def embed_randomly(sentences):
+    """
+    Embed each sentence as a random unit vector.
+    """
+    vectors = np.random.default_rng(len(sentences)).normal(
+        size=(len(sentences), 8))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
 class TestDataRecommender(unittest.TestCase):
     """
     Test class for the util module recommender.py
@@ -28,6 +38,19 @@ class TestDataRecommender(unittest.TestCase):
         self.assertEqual(recommender.weights, [1, 1, 0.8, 0.5, 0.2, 0.2, 0.4])
         self.assertIsNotNone(recommender.vector_list)
 
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv_duplicate)
+    def test_shared_model(self, _):
+        """
+        Tests a given model is used instead of loading one.
+        """
+        imdb, script = data_manager.load_data()
+        model = mock_functions.FakeEncoder(embed_randomly)
+        recommender = Recommender(meta=imdb, scripts=script, model=model)
+        self.assertIs(recommender.model, model)
+        self.assertEqual(len(model.batches), 3)
+        self.assertEqual(recommender.vector_list[0].shape[1], 8)
+
     @patch('utils.data_manager.pd.read_csv',
            side_effect=mock_functions.mocked_read_csv_duplicate)
     def test_finder(self, _):
@@ -0,0 +1,131 @@
+"""
+    Module for testing the process-wide resource cache.
+"""
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from utils import resources
+from utils.resources import ResourceCache
+from . import mock_functions
+
+
+class TestResourceCache(unittest.TestCase):
+    """
+    Test class for the ResourceCache class
+    """
+
+    def setUp(self):
+        self.cache = ResourceCache()
+
+    def test_smoke(self):
+        """
+        Test a resource is loaded once and its loads are timed.
+        """
+        loader = MagicMock(return_value='model')
+        self.assertEqual(self.cache.get('encoder', loader), 'model')
+        self.assertEqual(self.cache.get('encoder', loader), 'model')
+        loader.assert_called_once()
+        stats = self.cache.stats['encoder']
+        self.assertEqual((stats['loads'], stats['hits']), (1, 1))
+        self.assertGreaterEqual(stats['load_seconds'], 0)
+        self.cache.clear()
+        self.assertEqual(self.cache.stats, {})
+
+    def test_concurrent(self):
+        """
+        Test concurrent first callers wait for a single load.
+        """
+        calls = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.05)
+            return object()
+
+        results = mock_functions.call_concurrently(
+            lambda: self.cache.get('corpus', load))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_version(self):
+        """
+        Test a new data version loads again and replaces the old one.
+        """
+        old = self.cache.get('query', object, 'v1')
+        self.assertIs(self.cache.get('query', object, 'v1'), old)
+        new = self.cache.get('query', object, 'v2')
+        self.assertIsNot(new, old)
+        # pylint: disable=protected-access
+        self.assertEqual(list(self.cache._resources), [('query', 'v2')])
+
+    def test_errors(self):
+        """
+        Test a failed load is retried by the next caller.
+        """
+        with self.assertRaises(OSError):
+            self.cache.get('encoder', MagicMock(side_effect=OSError))
+        self.assertEqual(self.cache.get('encoder', lambda: 'model'), 'model')
+
+
+class TestSharedResources(unittest.TestCase):
+    """
+    Test class for the process-wide resource getters
+    """
+
+    def setUp(self):
+        resources.get_resources().clear()
+        self.dataset = SimpleNamespace(meta='meta', scripts='scripts',
+                                       version='v1')
+
+    def tearDown(self):
+        resources.get_resources().clear()
+
+    @patch('sentence_transformers.SentenceTransformer')
+    @patch('utils.resources.Recommender')
+    def test_recommender(self, recommender, transformer):
+        """
+        Test sessions share one recommender built with the shared model.
+        """
+        first = resources.get_recommender(self.dataset)
+        self.assertIs(resources.get_recommender(self.dataset), first)
+        recommender.assert_called_once_with(
+            'meta', 'scripts', model=transformer.return_value)
+        self.assertIs(resources.get_encoder(), transformer.return_value)
+        transformer.assert_called_once()
+
+    @patch('utils.episode_query.load_corpus')
+    def test_query_corpus(self, load_corpus):
+        """
+        Test the query corpus is loaded once per storage and version.
+        """
+        resources.get_query_corpus(self.dataset, 'int8')
+        resources.get_query_corpus(self.dataset, 'int8')
+        load_corpus.assert_called_once_with('scripts', self.dataset, 'int8',
+                                            'all-MiniLM-L6-v2')
+        self.dataset.version = 'v2'
+        resources.get_query_corpus(self.dataset, 'int8')
+        self.assertEqual(load_corpus.call_count, 2)
+
+    @patch('utils.resources.load_encoder')
+    def test_backends(self, load_encoder):
+        """
+        Test each encoder backend is loaded once and kept apart.
+        """
+        load_encoder.side_effect = lambda name, backend: (name, backend)
+        self.assertEqual(resources.get_encoder(backend='int8'),
+                         ('all-MiniLM-L6-v2', 'int8'))
+        self.assertEqual(resources.get_encoder(backend='float32'),
+                         ('all-MiniLM-L6-v2', 'float32'))
+        resources.get_encoder(backend='int8')
+        self.assertEqual(load_encoder.call_count, 2)
+
+    @patch('utils.resources.load_lexical_index')
+    def test_lexical_index(self, load_lexical_index):
+        """
+        Test the BM25 index is loaded once per version from the dialogue.
+        """
+        self.dataset.dialogue = 'dialogue'
+        first = resources.get_lexical_index(self.dataset)
+        self.assertIs(resources.get_lexical_index(self.dataset), first)
+        load_lexical_index.assert_called_once_with('dialogue')
@@ -0,0 +1,106 @@
+"""
+    Module for testing the persistent search result cache.
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import pandas as pd
+from utils import result_cache
+from utils.result_cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+    """
+    Test class for the ResultCache class
+    """
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'cache',
+                                 'results.sqlite')
+        self.cache = ResultCache(self.path, max_entries=3)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_smoke(self):
+        """
+        Test frames round trip and lookups are counted.
+        """
+        frame = pd.DataFrame({'Title': ['The Soup'], 'Season': [6]})
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.put('a', 'v1', (frame, frame.iloc[:0]))
+        filtered, results = self.cache.get('a')
+        pd.testing.assert_frame_equal(filtered, frame)
+        self.assertTrue(results.empty)
+        self.assertEqual(self.cache.stats, {'hits': 1, 'misses': 1,
+                                            'hit_rate': 0.5, 'size': 1})
+
+    def test_shared(self):
+        """
+        Test another process's cache over the same file sees entries.
+        """
+        self.cache.put('a', 'v1', [1])
+        self.assertEqual(ResultCache(self.path).get('a'), [1])
+
+    def test_version(self):
+        """
+        Test storing a new data version drops the old entries.
+        """
+        self.cache.put('a', 'v1', [1])
+        self.cache.put('b', 'v1', [2])
+        ResultCache(self.path).put('c', 'v2', [3])
+        self.assertEqual(len(self.cache), 1)
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_eviction(self):
+        """
+        Test the oldest entries are evicted beyond max_entries.
+        """
+        for key in 'abcd':
+            self.cache.put(key, 'v1', key)
+        self.assertEqual(len(self.cache), 3)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('d'), 'd')
+
+    def test_get_or_compute(self):
+        """
+        Test values are computed once per key, and never cached without
+        a data version.
+        """
+        compute = MagicMock(return_value=[1])
+        self.assertEqual(self.cache.get_or_compute('a', 'v1', compute), [1])
+        self.assertEqual(self.cache.get_or_compute('a', 'v1', compute), [1])
+        compute.assert_called_once()
+        self.cache.get_or_compute(None, None, compute)
+        self.assertEqual(compute.call_count, 2)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats['hits'], 0)
+
+    def test_search_key(self):
+        """
+        Test equivalent searches share a key and others do not.
+        """
+        key = result_cache.search_key('No  Soup', [2, 1], (7, 9.5),
+                                      ['JERRY', 'ELAINE'], 'v1')
+        self.assertEqual(key, result_cache.search_key(
+            'no soup', [1, 2], [7.0, 9.5], ['ELAINE', 'JERRY'], 'v1'))
+        self.assertNotEqual(key, result_cache.search_key(
+            'no soup', [1, 2], [7.0, 9.5], ['ELAINE', 'JERRY'], 'v2'))
+        self.assertNotEqual(
+            result_cache.search_key('soup', None, None, None, 'v1'),
+            result_cache.search_key('soup', [], None, None, 'v1'))
+        self.assertEqual(json.loads(key)[:2], ['no soup', [1, 2]])
+        self.assertIsNone(result_cache.search_key('soup', None, None, None,
+                                                  None))
+
+    def test_errors(self):
+        """
+        Test invalid inputs.
+        """
+        with self.assertRaises(ValueError):
+            ResultCache(self.path, max_entries=0)
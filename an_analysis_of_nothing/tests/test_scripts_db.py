@@ -0,0 +1,102 @@
+"""
+    Module for testing the SQLite scripts database and quote search.
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+import pandas as pd
+from utils import scripts_db
+
+
+def make_frames():
+    """
+    Small metadata and scripts frames like the cleaned data.
+    """
+    meta = pd.DataFrame({
+        'SEID': ['S05E01', 'S09E03'], 'Season': [5, 9],
+        'Title': ['The Mango', 'The Serenity Now'],
+        'averageRating': [8.5, 8.9],
+        'keyWords': [['fruit'], ['anger', 'computer']],
+        'Summaries': [['Jerry buys mangos.'], ['Frank yells.']]})
+    scripts = pd.DataFrame({
+        'Character': ['JERRY', 'FRANK', 'LLOYD', 'FRANK', 'GEORGE'],
+        'Dialogue': ["Where's Bania?", 'Serenity now!',
+                     'Serenity is nice, now go.', 'SERENITY NOW! Insanity!',
+                     'Serenity now, huh?'],
+        'SEID': ['S05E01', 'S09E03', 'S09E03', 'S09E03', 'S05E01'],
+        'Season': [5, 9, 9, 9, 5]})
+    scripts['Character'] = scripts.Character.astype('category')
+    return meta, scripts
+
+
+class TestScriptsDB(unittest.TestCase):
+    """
+    Test class for writing and searching the scripts database
+    """
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'scripts.sqlite')
+        scripts_db.write_scripts_db(*make_frames(), path=self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_smoke(self):
+        """
+        Test both tables and the dialogue index are written.
+        """
+        with closing(sqlite3.connect(self.path)) as connection:
+            self.assertEqual(connection.execute(
+                'SELECT COUNT(*) FROM scripts').fetchone()[0], 5)
+            self.assertEqual(connection.execute(
+                'SELECT keyWords FROM metadata WHERE SEID = ?',
+                ('S09E03',)).fetchone()[0], '["anger", "computer"]')
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_phrase(self):
+        """
+        Test only lines with the words in order match, best first.
+        """
+        quotes = scripts_db.find_quotes('serenity now', path=self.path)
+        self.assertEqual(sorted(quotes.line.tolist()), [1, 3, 4])
+        self.assertEqual(quotes.columns.tolist(),
+                         ['line', 'SEID', 'Title', 'Season', 'Character',
+                          'Dialogue'])
+        self.assertEqual(quotes.Title[quotes.line == 1].item(),
+                         'The Serenity Now')
+        self.assertEqual(scripts_db.find_quotes(
+            "where's bania", path=self.path).line.tolist(), [0])
+        self.assertEqual(len(scripts_db.find_quotes(
+            'serenity now', limit=1, path=self.path)), 1)
+        # FTS5 syntax is taken literally
+        self.assertTrue(scripts_db.find_quotes(
+            'now" OR "bania', path=self.path).empty)
+
+    def test_filters(self):
+        """
+        Test season, rating and character filters.
+        """
+        def lines(**filters):
+            return sorted(scripts_db.find_quotes(
+                'serenity now', path=self.path, **filters).line.tolist())
+        self.assertEqual(lines(seasons=[5]), [4])
+        self.assertEqual(lines(characters=['FRANK']), [1, 3])
+        self.assertEqual(lines(ratings=(8.0, 8.6)), [4])
+        self.assertEqual(lines(seasons=[9], characters=['GEORGE']), [])
+
+    def test_errors(self):
+        """
+        Test invalid inputs and a missing database.
+        """
+        with self.assertRaises(ValueError):
+            scripts_db.find_quotes('?!', path=self.path)
+        with self.assertRaises(TypeError):
+            scripts_db.phrase_query(None)
+        with self.assertRaises(FileNotFoundError):
+            scripts_db.find_quotes('soup', path=self.path + '.missing')
+        with self.assertRaises(TypeError):
+            scripts_db.write_scripts_db('meta', pd.DataFrame(), self.path)
@@ -0,0 +1,172 @@
+"""
+    Module for testing the inverted-file and episode centroid indexes.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+from utils import search_index
+from utils.search_index import EpisodeIndex, IVFIndex
+from .test_vector_search import make_embeddings
+
+
+class TestIVFIndex(unittest.TestCase):
+    """
+    Test class for the IVFIndex class
+    """
+
+    def setUp(self):
+        self.full = make_embeddings()
+        self.query = self.full[7] + 0.01
+        self.index = IVFIndex.build(self.full, num_lists=20)
+
+    def test_smoke(self):
+        """
+        Test every line lands in exactly one inverted list.
+        """
+        self.assertEqual(len(self.index), len(self.full))
+        self.assertEqual(sorted(self.index.rows.tolist()),
+                         list(range(len(self.full))))
+        self.assertEqual(self.index.offsets[-1], len(self.full))
+        self.assertTrue(np.allclose(
+            np.linalg.norm(self.index.centroids, axis=1), 1))
+
+    def test_search(self):
+        """
+        Test probing every list is exact and fewer lists scan less.
+        """
+        scores = self.full @ self.query / np.linalg.norm(self.query)
+        expected = np.argsort(-scores, kind='stable')[:50]
+        _, indices = self.index.search(self.query, k=50, nprobe=20)
+        self.assertEqual(indices.tolist(), expected.tolist())
+        self.assertLess(len(self.index.probe(self.query, 2)),
+                        len(self.full))
+        _, indices = self.index.search(self.query, k=50, nprobe=4)
+        self.assertGreaterEqual(len(set(indices) & set(expected)), 45)
+
+    def test_search_rows(self):
+        """
+        Test searching within rows probes more lists to fill k.
+        """
+        rows = np.arange(0, len(self.full), 30)
+        _, indices = self.index.search(self.query, k=100, nprobe=1,
+                                       rows=rows)
+        self.assertEqual(len(indices), 100)
+        self.assertTrue(np.isin(indices, rows).all())
+
+    def test_save_load(self):
+        """
+        Test the index round trips and rejects other embeddings.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'ivf.npz')
+            self.index.save(path)
+            loaded = IVFIndex.load(self.full, path)
+            self.assertEqual(loaded.search(self.query, 20)[1].tolist(),
+                             self.index.search(self.query, 20)[1].tolist())
+            with self.assertRaises(ValueError):
+                IVFIndex.load(self.full[:10], path)
+            # Same shape, other embeddings
+            with self.assertRaises(ValueError):
+                IVFIndex.load(make_embeddings(seed=1), path)
+
+
+class TestEpisodeIndex(unittest.TestCase):
+    """
+    Test class for the EpisodeIndex class
+    """
+
+    def setUp(self):
+        self.full = make_embeddings()
+        # 30 episodes of uneven length, lines interleaved like a corpus
+        self.seids = np.random.default_rng(0).integers(0, 30, len(self.full))
+        self.query = self.full[7] + 0.01
+        self.index = EpisodeIndex.build(self.full, self.seids, segments=3)
+
+    def test_smoke(self):
+        """
+        Test every list is one run of one episode's lines.
+        """
+        self.assertEqual(len(self.index.centroids), 90)
+        self.assertEqual(self.index.num_probes, 30)
+        self.assertEqual(sorted(self.index.rows.tolist()),
+                         list(range(len(self.full))))
+        lengths = np.diff(self.index.offsets)
+        self.assertTrue((self.seids[self.index.rows] ==
+                         np.repeat(self.index.episodes, lengths)).all())
+        first = self.index.rows[self.index.offsets[0]:
+                                self.index.offsets[1]]
+        self.assertTrue(np.allclose(
+            self.index.centroids[0],
+            self.full[first].mean(axis=0) /
+            np.linalg.norm(self.full[first].mean(axis=0)), atol=1e-6))
+
+    def test_top_episodes(self):
+        """
+        Test episodes are ranked by their best centroid.
+        """
+        query = self.query / np.linalg.norm(self.query)
+        scores, episodes = self.index.top_episodes(query, 5)
+        best = np.full(30, -np.inf)
+        np.maximum.at(best, self.index.episodes,
+                      self.index.centroids @ query)
+        expected = np.argsort(-best, kind='stable')[:5]
+        self.assertEqual(episodes.tolist(), expected.tolist())
+        self.assertTrue(np.allclose(scores, best[expected], atol=1e-6))
+
+    def test_search(self):
+        """
+        Test only lines of the nprobe best episodes are returned, exactly
+        ranked among them.
+        """
+        _, episodes = self.index.top_episodes(self.query, 4)
+        scores, indices = self.index.search(self.query, k=50, nprobe=4)
+        self.assertTrue(np.isin(self.seids[indices], episodes).all())
+        candidates = np.flatnonzero(np.isin(self.seids, episodes))
+        exact = self.full[candidates] @ self.query / \
+            np.linalg.norm(self.query)
+        self.assertAlmostEqual(scores[0], exact.max(), places=5)
+        _, indices = self.index.search(self.query, k=50,
+                                       nprobe=self.index.num_probes)
+        expected = np.argsort(-(self.full @ self.query), kind='stable')
+        self.assertEqual(set(indices), set(expected[:50]))
+
+    def test_search_rows(self):
+        """
+        Test episodes without eligible lines are never probed.
+        """
+        rows = np.flatnonzero(self.seids < 3)
+        _, episodes = self.index.top_episodes(self.query, 10, rows)
+        self.assertEqual(sorted(episodes.tolist()), [0, 1, 2])
+        _, indices = self.index.search(self.query, k=20, nprobe=2,
+                                       rows=rows)
+        self.assertEqual(len(indices), 20)
+        self.assertTrue(np.isin(indices, rows).all())
+
+    def test_save_load(self):
+        """
+        Test the index round trips and rejects other episodes.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'episodes.npz')
+            self.index.save(path)
+            loaded = EpisodeIndex.load(self.full, self.seids, path)
+            self.assertEqual(loaded.search(self.query, 20)[1].tolist(),
+                             self.index.search(self.query, 20)[1].tolist())
+            with self.assertRaises(ValueError):
+                EpisodeIndex.load(self.full, (self.seids + 1) % 30, path)
+            with self.assertRaises(ValueError):
+                EpisodeIndex.load(make_embeddings(seed=1), self.seids, path)
+
+    def test_errors(self):
+        """
+        Test invalid inputs.
+        """
+        with self.assertRaises(ValueError):
+            EpisodeIndex.build(self.full, self.seids[:10])
+        with self.assertRaises(ValueError):
+            EpisodeIndex.build(self.full, self.seids, segments=0)
+        with self.assertRaises(ValueError):
+            search_index.load_search_index('int4', self.full)
+        with self.assertRaises(ValueError):
+            search_index.load_search_index('episodes', self.full)
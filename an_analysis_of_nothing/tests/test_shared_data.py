@@ -0,0 +1,176 @@
+"""
+    Module for testing the process-wide shared dataset.
+"""
+import unittest
+import uuid
+from unittest.mock import patch
+import numpy as np
+import torch
+from utils import data_manager, shared_data
+from . import mock_functions
+
+
+class TestSharedDataset(unittest.TestCase):
+    """
+    Test class for the SharedDataset class
+    """
+
+    def setUp(self):
+        shared_data.SharedDataset.clear_instance()
+
+    def tearDown(self):
+        shared_data.SharedDataset.clear_instance()
+
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv)
+    def test_smoke(self, _):
+        """
+        Test the dataset wraps the frames and embeddings without copies.
+        """
+        imdb, script = data_manager.load_data()
+        embeddings = np.random.rand(len(script), 4).astype(np.float32)
+        dataset = shared_data.SharedDataset(imdb, script, embeddings)
+        self.assertIs(dataset.scripts, script)
+        self.assertIsInstance(dataset.embeddings_tensor, torch.Tensor)
+        self.assertTrue(np.shares_memory(dataset.embeddings_tensor.numpy(),
+                                         embeddings))
+        self.assertEqual(dataset.dialogue[0], script.Dialogue[0])
+        self.assertGreater(dataset.nbytes, embeddings.nbytes)
+
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv)
+    def test_load(self, _):
+        """
+        Test the frames keep their plain dtypes unless compact is asked.
+        """
+        _, script = data_manager.load_data()
+        embeddings = np.zeros((len(script), 4), dtype=np.float32)
+        with patch.object(shared_data, '_load_embeddings',
+                          return_value=(None, embeddings)):
+            dataset = shared_data.SharedDataset.load()
+            self.assertEqual(dataset.scripts.SEID.dtype, object)
+            dataset = shared_data.SharedDataset.load(compact=True)
+            self.assertEqual(dataset.scripts.SEID.dtype, 'category')
+
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv)
+    def test_get_dataset(self, _):
+        """
+        Test concurrent sessions share a single load.
+        """
+        imdb, script = data_manager.load_data()
+        embeddings = np.zeros((len(script), 4), dtype=np.float32)
+        calls = []
+
+        def fake_load(share_name=None):
+            calls.append(share_name)
+            return shared_data.SharedDataset(imdb, script, embeddings)
+
+        with patch.object(shared_data.SharedDataset, 'load',
+                          side_effect=fake_load), \
+                patch.object(data_manager, 'get_data_version',
+                             return_value=None):
+            results = mock_functions.call_concurrently(
+                shared_data.get_dataset)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv)
+    def test_hot_reload(self, _):
+        """
+        Test a new data version is swapped in without dropping sessions.
+        """
+        imdb, script = data_manager.load_data()
+        embeddings = np.zeros((len(script), 4), dtype=np.float32)
+        versions = ['v1']
+
+        def fake_load(*_):
+            return shared_data.SharedDataset(imdb, script, embeddings,
+                                             versions[-1])
+
+        session = {}
+        with patch.object(shared_data.SharedDataset, 'load',
+                          side_effect=fake_load), \
+                patch.object(data_manager, 'get_data_version',
+                             side_effect=lambda: versions[-1]):
+            old = shared_data.refresh_session(session)
+            session['query'] = 'old corpus'
+            self.assertIs(shared_data.refresh_session(session), old)
+            self.assertIn('query', session)
+
+            versions.append('v2')
+            new = shared_data.get_dataset()
+            self.assertIsNot(new, old)
+            self.assertEqual((old.version, new.version), ('v1', 'v2'))
+            self.assertIs(shared_data.refresh_session(session), new)
+            self.assertEqual(session['data_version'], 'v2')
+            self.assertNotIn('query', session)
+            # The old dataset stays intact for sessions still using it
+            self.assertIs(old.scripts, script)
+
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv)
+    def test_failed_reload(self, _):
+        """
+        Test the old version keeps serving if the new one fails to load.
+        """
+        imdb, script = data_manager.load_data()
+        embeddings = np.zeros((len(script), 4), dtype=np.float32)
+        old = shared_data.SharedDataset(imdb, script, embeddings, 'v1')
+        with patch.object(shared_data.SharedDataset, 'load',
+                          side_effect=[old, FileNotFoundError('gone')]) \
+                as load, \
+                patch.object(data_manager, 'get_data_version',
+                             return_value='v1'):
+            self.assertIs(shared_data.get_dataset(), old)
+            data_manager.get_data_version.return_value = 'v2'
+            with self.assertWarns(UserWarning):
+                self.assertIs(shared_data.get_dataset(), old)
+            self.assertIs(shared_data.get_dataset(), old)
+            self.assertEqual(load.call_count, 2)
+
+    def test_shared_memory(self):
+        """
+        Test embeddings published to shared memory can be attached.
+        """
+        name = f"aon_test_{uuid.uuid4().hex[:8]}"
+        embeddings = np.random.rand(6, 3).astype(np.float32)
+        # pylint:disable=protected-access
+        shm, published = shared_data._publish_embeddings(name, embeddings)
+        try:
+            other, attached = shared_data._attach_embeddings(name)
+            self.assertTrue(np.array_equal(attached, embeddings))
+            self.assertFalse(attached.flags.writeable)
+            _, again = shared_data._publish_embeddings(name, embeddings)
+            self.assertEqual(again.shape, (6, 3))
+            self.assertTrue(np.array_equal(published, embeddings))
+            del attached, again
+            other.close()
+        finally:
+            del published
+            shm.unlink()
+        with self.assertRaises(FileNotFoundError):
+            shared_data._attach_embeddings(name)
+
+
+class TestSharedDatasetErrors(unittest.TestCase):
+    """
+    Test class for SharedDataset error handling
+    """
+
+    @patch('utils.data_manager.pd.read_csv',
+           side_effect=mock_functions.mocked_read_csv)
+    def test_errors(self, _):
+        """
+        Test invalid inputs.
+        """
+        imdb, script = data_manager.load_data()
+        with self.assertRaises(ValueError):
+            shared_data.SharedDataset(imdb, script,
+                                      np.zeros((2, 4), dtype=np.float32))
+        with self.assertRaises(TypeError):
+            shared_data.SharedDataset(imdb, script, [[0.0]])
+        with self.assertRaises(TypeError):
+            shared_data.SharedDataset('imdb', script,
+                                      np.zeros((5, 4), dtype=np.float32))
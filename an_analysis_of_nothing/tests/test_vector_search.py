@@ -0,0 +1,328 @@
+"""
+    Module for testing compact embedding search.
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from utils import data_constants, vector_search
+from utils.vector_search import BinaryEmbeddings, QuantizedEmbeddings, \
+    ReducedEmbeddings
+
+
+def make_embeddings(num_lines=3000, dim=32, seed=0):
+    """
+    Clustered unit-norm embeddings, like sentence embeddings.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(40, dim))
+    embeddings = centers[rng.integers(0, 40, num_lines)] + \
+        rng.normal(size=(num_lines, dim))
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings.astype(np.float32)
+
+
+class TestQuantizedEmbeddings(unittest.TestCase):
+    """
+    Test class for the QuantizedEmbeddings class
+    """
+
+    def setUp(self):
+        self.full = make_embeddings()
+        self.query = self.full[7] + 0.01
+        self.other = make_embeddings(seed=1)
+
+    def exact_top(self, k):
+        """
+        Exact top k line indices by cosine similarity.
+        """
+        scores = self.full @ self.query / np.linalg.norm(self.query)
+        return np.argsort(-scores, kind='stable')[:k]
+
+    def test_smoke(self):
+        """
+        Test both storage dtypes shrink the matrix.
+        """
+        for dtype, ratio in [('float16', 2), ('int8', 4)]:
+            quantized = QuantizedEmbeddings.quantize(self.full, dtype)
+            self.assertEqual(quantized.codes.dtype, np.dtype(dtype))
+            self.assertEqual(len(quantized), len(self.full))
+            self.assertLessEqual(quantized.nbytes,
+                                 self.full.nbytes / ratio + 1024)
+
+    def test_search(self):
+        """
+        Test re-ranked results match exact search, scores included.
+        """
+        for dtype in vector_search.STORAGE_DTYPES:
+            quantized = QuantizedEmbeddings.quantize(self.full, dtype)
+            scores, indices = quantized.search(self.query, k=50,
+                                               candidates=300)
+            self.assertEqual(indices.tolist(), self.exact_top(50).tolist())
+            exact = self.full[indices] @ self.query / \
+                np.linalg.norm(self.query)
+            self.assertTrue(np.allclose(scores, exact, atol=1e-5))
+            self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_search_rows(self):
+        """
+        Test searching within a subset of rows matches exact search there.
+        """
+        rows = np.arange(3, len(self.full), 7)
+        scores = self.full[rows] @ self.query
+        expected = rows[np.argsort(-scores, kind='stable')[:20]]
+        for dtype in vector_search.STORAGE_DTYPES:
+            quantized = QuantizedEmbeddings.quantize(self.full, dtype)
+            _, indices = quantized.search(self.query, k=20, rows=rows)
+            self.assertEqual(indices.tolist(), expected.tolist())
+            _, indices = quantized.search(self.query, k=50, rows=rows[:10])
+            self.assertEqual(sorted(indices.tolist()), rows[:10].tolist())
+
+    def test_int8_scores(self):
+        """
+        Test int8 approximate scores are close to the exact dot products.
+        """
+        quantized = QuantizedEmbeddings.quantize(self.full, 'int8')
+        approx = quantized.approximate_scores(self.query)
+        self.assertLess(np.abs(approx - self.full @ self.query).max(), 0.05)
+        no_rerank = QuantizedEmbeddings(quantized.codes, quantized.scale)
+        _, indices = no_rerank.search(self.query, k=10)
+        self.assertEqual(len(indices), 10)
+
+    def test_scores(self):
+        """
+        Test the best candidates get exact cosine scores, the rest
+        approximate ones.
+        """
+        quantized = QuantizedEmbeddings.quantize(self.full, 'int8')
+        rows = np.arange(0, len(self.full), 2)
+        exact = self.full[rows] @ self.query / (
+            np.linalg.norm(self.full[rows], axis=1) *
+            np.linalg.norm(self.query))
+        scores = quantized.scores(self.query, rows, candidates=10)
+        best = np.argsort(-scores, kind='stable')[:10]
+        self.assertTrue(np.allclose(scores[best], exact[best], atol=1e-6))
+        self.assertEqual(set(best.tolist()),
+                         set(np.argsort(-exact)[:10].tolist()))
+        self.assertLess(np.abs(scores - exact).max(), 0.05)
+        no_rerank = QuantizedEmbeddings(quantized.codes, quantized.scale)
+        self.assertTrue(np.array_equal(
+            no_rerank.scores(self.query * 2),
+            quantized.approximate_scores(self.query) /
+            np.linalg.norm(self.query)))
+
+    def test_save_load(self):
+        """
+        Test stores round trip through .npy files, memory-mapped.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for dtype in vector_search.STORAGE_DTYPES:
+                path = os.path.join(tmp_dir, f"store_{dtype}.npy")
+                QuantizedEmbeddings.quantize(self.full, dtype).save(path)
+                loaded = QuantizedEmbeddings.load(dtype, self.full, path)
+                self.assertIsInstance(loaded.codes, np.memmap)
+                self.assertEqual(loaded.search(self.query, k=20)[1]
+                                 .tolist(), self.exact_top(20).tolist())
+                del loaded
+                # Same shape, other embeddings
+                with self.assertRaises(ValueError):
+                    QuantizedEmbeddings.load(dtype, self.other, path)
+                with patch.object(data_constants, 'QUANTIZED_STORE',
+                                  os.path.join(tmp_dir,
+                                               'store_{dtype}.npy')):
+                    rebuilt = vector_search.load_quantized(dtype, self.other)
+                self.assertIs(rebuilt.full, self.other)
+                self.assertNotIsInstance(rebuilt.codes, np.memmap)
+
+    def test_recall_report(self):
+        """
+        Test the recall report covers every k and re-ranking helps.
+        """
+        quantized = QuantizedEmbeddings.quantize(self.full, 'int8')
+        queries = self.full[:5] + 0.01
+        report = vector_search.recall_report(quantized, queries,
+                                             k_values=(10, 100),
+                                             candidates=400)
+        self.assertEqual(report.index.tolist(), [10, 100])
+        self.assertTrue((report.recall_reranked >=
+                         report.recall_compact).all())
+        self.assertTrue((report.recall_reranked == 1).all())
+        self.assertEqual(report.compact_bytes.iloc[0], quantized.nbytes)
+
+
+class TestBinaryEmbeddings(unittest.TestCase):
+    """
+    Test class for the BinaryEmbeddings class
+    """
+
+    def setUp(self):
+        self.full = make_embeddings()
+        self.query = self.full[7] + 0.01
+        self.hashed = BinaryEmbeddings.from_embeddings(self.full)
+
+    def test_smoke(self):
+        """
+        Test the hash packs one bit per dimension into 64-bit words.
+        """
+        self.assertEqual(self.hashed.bits.shape, (len(self.full), 8))
+        self.assertEqual(self.hashed.bits.dtype, np.uint8)
+        self.assertLess(self.hashed.nbytes, self.full.nbytes / 15)
+        signs = self.full > self.hashed.center
+        self.assertTrue(np.array_equal(
+            np.unpackbits(self.hashed.bits, axis=1)[:, :32], signs))
+
+    def test_hamming(self):
+        """
+        Test popcount distances match counting differing signs.
+        """
+        signs = self.full > self.hashed.center
+        expected = (signs != (self.query > self.hashed.center)).sum(axis=1)
+        self.assertEqual(self.hashed.hamming(self.query).tolist(),
+                         expected.tolist())
+        rows = np.array([3, 10, 400])
+        self.assertEqual(self.hashed.hamming(self.query, rows).tolist(),
+                         expected[rows].tolist())
+
+    def test_search(self):
+        """
+        Test re-ranking a wide shortlist recovers the exact results.
+        """
+        scores = self.full @ self.query / np.linalg.norm(self.query)
+        expected = np.argsort(-scores, kind='stable')[:20]
+        found_scores, indices = self.hashed.search(self.query, k=20,
+                                                   candidates=1500)
+        self.assertEqual(indices.tolist(), expected.tolist())
+        self.assertTrue(np.allclose(found_scores, scores[expected],
+                                    atol=1e-5))
+        rows = np.arange(0, len(self.full), 3)
+        _, indices = self.hashed.search(self.query, k=20, rows=rows)
+        self.assertTrue(np.isin(indices, rows).all())
+
+    def test_save_load(self):
+        """
+        Test the hash round trips through .npy files, memory-mapped.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'store_binary.npy')
+            self.hashed.save(path)
+            loaded = BinaryEmbeddings.load(self.full, path)
+            self.assertIsInstance(loaded.bits, np.memmap)
+            self.assertEqual(loaded.search(self.query, k=20)[1].tolist(),
+                             self.hashed.search(self.query, k=20)[1]
+                             .tolist())
+            with self.assertRaises(ValueError):
+                BinaryEmbeddings.load(self.full[:10], path)
+            with self.assertRaises(ValueError):
+                BinaryEmbeddings.load(make_embeddings(seed=1), path)
+            del loaded
+
+
+class TestReducedEmbeddings(unittest.TestCase):
+    """
+    Test class for the ReducedEmbeddings class
+    """
+
+    def setUp(self):
+        self.full = make_embeddings()
+        self.query = self.full[7] + 0.01
+
+    def test_smoke(self):
+        """
+        Test the projection is orthonormal and keeps the most variance.
+        """
+        reduced = ReducedEmbeddings.fit(self.full, dims=8)
+        self.assertEqual(reduced.reduced.shape, (len(self.full), 8))
+        self.assertTrue(np.allclose(reduced.components @
+                                    reduced.components.T, np.eye(8),
+                                    atol=1e-5))
+        variance = reduced.reduced.var(axis=0)
+        self.assertTrue(np.all(np.diff(variance) <= 1e-6))
+        self.assertLess(reduced.nbytes, self.full.nbytes / 3)
+
+    def test_scores(self):
+        """
+        Test keeping every dimension reproduces the exact dot products.
+        """
+        reduced = ReducedEmbeddings.fit(self.full, dims=32)
+        self.assertTrue(np.allclose(reduced.approximate_scores(self.query),
+                                    self.full @ self.query, atol=1e-4))
+        rows = np.array([1, 50, 900])
+        self.assertTrue(np.allclose(
+            reduced.approximate_scores(self.query, rows),
+            self.full[rows] @ self.query, atol=1e-4))
+
+    def test_search(self):
+        """
+        Test re-ranking in the full space recovers the exact results.
+        """
+        scores = self.full @ self.query / np.linalg.norm(self.query)
+        expected = np.argsort(-scores, kind='stable')[:20]
+        reduced = ReducedEmbeddings.fit(self.full, dims=16)
+        _, indices = reduced.search(self.query, k=20, candidates=300)
+        self.assertEqual(indices.tolist(), expected.tolist())
+        report = vector_search.recall_report(reduced, self.full[:3] + 0.01,
+                                             k_values=(10,))
+        self.assertEqual(report.recall_reranked.iloc[0], 1)
+
+    def test_save_load(self):
+        """
+        Test the reduced matrix and projection round trip.
+        """
+        reduced = ReducedEmbeddings.fit(self.full, dims=8)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'store_pca8.npy')
+            reduced.save(path)
+            loaded = ReducedEmbeddings.load(8, self.full, path)
+            self.assertIsInstance(loaded.reduced, np.memmap)
+            self.assertTrue(np.allclose(loaded.approximate_scores(
+                self.query), reduced.approximate_scores(self.query)))
+            with self.assertRaises(ValueError):
+                ReducedEmbeddings.load(8, self.full[:10], path)
+            with self.assertRaises(ValueError):
+                ReducedEmbeddings.load(8, make_embeddings(seed=1), path)
+            del loaded
+        with self.assertRaises(ValueError):
+            ReducedEmbeddings.fit(self.full, dims=33)
+
+
+class TestQuantizedEmbeddingsErrors(unittest.TestCase):
+    """
+    Test class for QuantizedEmbeddings error handling
+    """
+
+    def test_errors(self):
+        """
+        Test invalid inputs.
+        """
+        full = make_embeddings(10, 4)
+        with self.assertRaises(ValueError):
+            QuantizedEmbeddings.quantize(full, 'int4')
+        with self.assertRaises(TypeError):
+            QuantizedEmbeddings([[1, 2]])
+        with self.assertRaises(ValueError):
+            QuantizedEmbeddings(full.astype(np.int8))
+        with self.assertRaises(ValueError):
+            QuantizedEmbeddings(full.astype(np.float16), full=full[:5])
+        with self.assertRaises(ValueError):
+            BinaryEmbeddings(np.zeros((2, 7), dtype=np.uint8), np.zeros(4))
+        with self.assertRaises(ValueError):
+            vector_search.recall_report(
+                QuantizedEmbeddings(full.astype(np.float16)), full)
+
+    def test_abstract(self):
+        """
+        Test a compact copy without approximate scores cannot be made.
+        """
+        # pylint: disable=protected-access,abstract-class-instantiated
+        # pylint: disable=abstract-method
+        class Unscored(vector_search._CompactEmbeddings):
+            """
+            Compact copy missing approximate_scores.
+            """
+
+            def __len__(self):
+                return 0
+
+        with self.assertRaises(TypeError):
+            Unscored()
@@ -0,0 +1,207 @@
+"""
+Micro-batching front-end for the sentence encoder: queries from every
+session are queued, and a background thread encodes whatever arrived
+within a few milliseconds as one batch.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+import numpy as np
+
+from . import data_constants
+from .resources import get_encoder, get_resources
+
+# Queued in place of a query to stop the worker thread
+_STOP = object()
+
+
+class BatchEncoder:
+    """
+    Class to share one SentenceTransformer between concurrent callers.
+    submit queues a query and returns a Future; a daemon thread takes
+    the first waiting query, collects more for up to max_wait seconds
+    (or until max_batch are waiting), encodes them in one forward pass
+    and resolves every Future with its row. encode blocks on the
+    Future, so a BatchEncoder can stand in for the model wherever a
+    single query is encoded.
+    """
+
+    def __init__(self, model, max_batch: int = data_constants.ENCODER_BATCH,
+                 max_wait: float = data_constants.ENCODER_WAIT) -> None:
+        """
+        Wrap a model; the worker thread starts on the first query.
+
+        :param model: SentenceTransformer, or any object whose encode
+            takes a list of strings and convert_to_tensor.
+        :param max_batch: most queries encoded in one pass.
+        :param max_wait: seconds to wait for more queries after the
+            first one of a batch arrives.
+        :raise ValueError: if max_batch < 1 or max_wait < 0.
+
+        :return: None
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        if max_wait < 0:
+            raise ValueError("max_wait must not be negative")
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metrics = dict.fromkeys(
+            ('batches', 'queries', 'queue_seconds', 'max_queue_seconds',
+             'encode_seconds', 'max_batch_size'), 0)
+
+    def submit(self, query: str) -> Future:
+        """
+        Queue a query for the next batch.
+
+        :param query: search string.
+        :return: Future resolving to the query's embedding tensor.
+        """
+        if not isinstance(query, str):
+            raise TypeError("query must be a string")
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='batch-encoder', daemon=True)
+                self._thread.start()
+            self._queue.put((query, future, time.perf_counter()))
+        return future
+
+    def encode(self, query: str, convert_to_tensor: bool = False,
+               timeout: Optional[float] = None):
+        """
+        Encode one query through the shared batches, like
+        SentenceTransformer.encode does for a single string.
+
+        :param query: search string.
+        :param convert_to_tensor: return a tensor instead of a NumPy
+            array.
+        :param timeout: seconds to wait for the result, or None.
+        :raise TimeoutError: if the result does not arrive in time.
+        :return: (dim,) embedding tensor or array.
+        """
+        embedding = self.submit(query).result(timeout)
+        return embedding if convert_to_tensor else embedding.numpy()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the worker thread once the queries already queued have
+        been encoded. A later submit starts a new thread.
+
+        :param timeout: seconds to wait for the thread to finish.
+        :return: None
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(_STOP)
+        if thread is not None:
+            thread.join(timeout)
+
+    @property
+    def stats(self) -> dict:
+        """
+        Batches run, queries encoded, mean and max batch size, mean and
+        max seconds queries waited before their batch started, and
+        queries encoded per second of encoding.
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        batches, queries = metrics['batches'], metrics['queries']
+        return {'batches': batches, 'queries': queries,
+                'mean_batch_size': queries / batches if batches else 0.0,
+                'max_batch_size': metrics['max_batch_size'],
+                'mean_queue_seconds': metrics['queue_seconds'] / queries
+                if queries else 0.0,
+                'max_queue_seconds': metrics['max_queue_seconds'],
+                'queries_per_second': queries / metrics['encode_seconds']
+                if metrics['encode_seconds'] else 0.0}
+
+    def _run(self) -> None:
+        """
+        Private method for the worker thread: collect and encode
+        batches until stopped.
+        """
+        while True:
+            batch = self._collect()
+            stop = batch and batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                self._encode(batch)
+            if stop:
+                return
+
+    def _collect(self) -> list:
+        """
+        Private method to wait for a query, then take more until
+        max_wait has passed or max_batch are collected.
+
+        :return: list of (query, future, enqueued time), possibly ending
+            with _STOP.
+        """
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch and batch[-1] is not _STOP:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=max(remaining, 0))
+                             if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _encode(self, batch: list) -> None:
+        """
+        Private method to encode a batch and resolve its futures.
+
+        :param batch: list of (query, future, enqueued time).
+        :return: None
+        """
+        start = time.perf_counter()
+        waits = np.array([start - enqueued for _, _, enqueued in batch])
+        try:
+            embeddings = self.model.encode([query for query, _, _ in batch],
+                                           convert_to_tensor=True)
+        # Every caller gets the model's error, whatever it is
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            for _, future, _ in batch:
+                future.set_exception(err)
+            return
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._metrics['batches'] += 1
+            self._metrics['queries'] += len(batch)
+            self._metrics['queue_seconds'] += float(waits.sum())
+            self._metrics['max_queue_seconds'] = max(
+                self._metrics['max_queue_seconds'], float(waits.max()))
+            self._metrics['encode_seconds'] += elapsed
+            self._metrics['max_batch_size'] = max(
+                self._metrics['max_batch_size'], len(batch))
+        for row, (_, future, _) in enumerate(batch):
+            future.set_result(embeddings[row])
+
+
+def get_batch_encoder(model_name: str = data_constants.ENCODER_MODEL,
+                      backend: Optional[str] = None) -> BatchEncoder:
+    """
+    Get the process-wide BatchEncoder for a model, around the shared
+    encoder, so every session shares one model and one queue.
+
+    :param model_name: SentenceTransformer model name.
+    :param backend: encoder backend, or None for
+        data_constants.ENCODER_BACKEND.
+    :return: BatchEncoder
+    """
+    backend = backend or data_constants.ENCODER_BACKEND
+    return get_resources().get(
+        ('batch_encoder', model_name, backend),
+        lambda: BatchEncoder(get_encoder(model_name, backend)))
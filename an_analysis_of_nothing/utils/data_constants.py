@@ -14,3 +14,71 @@ SCRIPTS_LINK = './static/data/scripts.csv'
 # EPISODE_LINK = 'https://drive.google.com/file/d/1VA6wa3lc9LnmJSe8I8EtP82Ooc4SQfwz/view?usp=sharing'
 # EPISODE_LINK = GDRIVE_BASE + EPISODE_LINK.split('/')[-2]
 EPISODE_LINK = './static/data/metadata.csv'
+# Columnar binary bundle written by ../scripts/build_data_bundle.py
+SCRIPTS_BUNDLE = './static/data/scripts.parquet'
+EPISODE_BUNDLE = './static/data/metadata.parquet'
+# Optional SQLite copy of both with an FTS5 index over the dialogue
+# (../scripts/get_final_data.py --sqlite), for quote searches
+SCRIPTS_DB = './static/data/scripts.sqlite'
+# Metadata columns stored as lists of strings
+LIST_COLUMNS = ['keyWords', 'Summaries']
+# Contiguous float32 dialogue embeddings (replaces dialogue_tensors shards)
+EMBEDDING_STORE = './static/data/dialogue_embeddings.npy'
+# Compact copies of the store; int8 has a per-dimension scale, binary
+# (the sign hash) its center and pca64 / pca128 their projection alongside
+QUANTIZED_STORE = './static/data/dialogue_embeddings_{dtype}.npy'
+# Inverted-file (k-means) index over the store, for approximate search
+IVF_INDEX = './static/data/dialogue_ivf.npz'
+# Inverted lists scanned per query; more is slower but finds more
+IVF_NPROBE = 64
+# Per-episode centroids, for searching only the closest episodes' lines
+EPISODE_INDEX = './static/data/dialogue_episodes.npz'
+# Episodes whose lines are scored per query (twice the episodes shown)
+EPISODE_NPROBE = 10
+# Centroids per episode, each over a contiguous run of its lines
+EPISODE_SEGMENTS = 4
+# Embeddings queries are scored against: 'float32', 'float16', 'int8',
+# 'binary' (sign hash), 'pca64' / 'pca128' (PCA-reduced), 'ivf'
+# (inverted-file index over the store) or 'episodes' (episode centroids)
+EMBEDDING_STORAGE = 'float32'
+# BM25 inverted index over the dialogue, its term frequency saturation
+# and line length normalisation
+LEXICAL_INDEX = './static/data/dialogue_bm25.npz'
+BM25_K1 = 1.2
+BM25_B = 0.75
+# How episode querying scores lines: 'semantic' (embeddings), 'lexical'
+# (BM25, skips the encoder) or 'hybrid' (both, fused per episode with
+# HYBRID_WEIGHT the share of the lexical score)
+SEARCH_MODE = 'semantic'
+HYBRID_WEIGHT = 0.3
+# Query embeddings cached per process (LRU), and seconds each stays
+# valid (None: until evicted)
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_TTL = None
+# Sentence encoder for queries, shared by all sessions: queries arriving
+# within ENCODER_WAIT seconds are encoded together, up to ENCODER_BATCH
+ENCODER_MODEL = 'all-MiniLM-L6-v2'
+ENCODER_BATCH = 32
+ENCODER_WAIT = 0.005
+# Encoder backend: 'float32', or 'int8' (linear layers dynamically
+# quantised, faster on CPU; benchmark_tools.encoder_quantization in
+# ../scripts checks its agreement with float32 and its speed)
+ENCODER_BACKEND = 'float32'
+# Filtered search results shared by all worker processes, and the most
+# entries kept; entries of older data versions are dropped
+RESULT_CACHE = './static/cache/search_results.sqlite'
+RESULT_CACHE_SIZE = 10000
+# Content hashes of the data artifacts and the combined data version
+DATA_MANIFEST = './static/data/manifest.json'
+# Without a manifest, the data version comes from the modification
+# times and sizes of these files, so the result cache and hot reload
+# also work on the plain CSV files
+DATA_FILES = [EPISODE_BUNDLE, SCRIPTS_BUNDLE, EPISODE_LINK, SCRIPTS_LINK,
+              EMBEDDING_STORE]
+# Whether the app loads the compact schema below. Pages must then
+# group categorical columns with observed=True
+COMPACT_FRAMES = False
+# Compact schema: repeated strings stored as categoricals
+EMOTION_COLUMNS = ['Happy', 'Angry', 'Surprise', 'Sad', 'Fear']
+SCRIPTS_CATEGORIES = ['Character', 'SEID']
+EPISODE_CATEGORIES = ['Writers', 'Director']
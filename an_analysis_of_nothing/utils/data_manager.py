@@ -1,91 +1,614 @@
 """
 Contains functions that count/modify original data.
 """
+import hashlib
+import json
+import os
+import warnings
+import weakref
 from collections import OrderedDict
-from typing import Tuple, List, Optional
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING, Tuple, List, Optional, Union
 import numpy as np
 import pandas as pd
-import torch
 
 from . import data_constants
 
+# torch and scipy are imported by the functions that need them, so
+# importing this module (and the app) stays fast.
+if TYPE_CHECKING:
+    import torch
+    from scipy.sparse import csr_matrix
 
-def load_data() -> Tuple[pd.DataFrame, pd.DataFrame]:
+# id(scripts) -> (weakref to scripts, number of rows, speaker table)
+_SPEAKER_TABLES = {}
+# count_matrix grouping for scenes within an episode
+SCENE = 'Scene'
+# Default number of script lines read per streamed chunk
+CHUNKSIZE = 50000
+# A whole DataFrame or a stream of SEID-aligned chunks of one
+Scripts = Union[pd.DataFrame, Iterator]
+# manifest path -> ((mtime_ns, size) of the file, data version)
+_MANIFEST_VERSIONS = {}
+
+
+def load_data(use_bundle: bool = False,
+              compact: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Load cleaned scripts and metadata from Google Drive.
 
+    :param use_bundle: read the typed Parquet bundle if it exists,
+        falling back to the CSV files when it is missing or
+        pyarrow is not installed.
+    :param compact: convert both frames to the compact schema
+        (see compact_frames).
     :return: 2 Dataframes (1 Metadata, 1 scripts).
     """
-    meta = pd.read_csv(data_constants.EPISODE_LINK)
+    if not isinstance(use_bundle, bool):
+        raise TypeError("use_bundle must be a boolean")
+    if not isinstance(compact, bool):
+        raise TypeError("compact must be a boolean")
+    meta, scripts = None, None
+    if use_bundle:
+        try:
+            meta, scripts = load_data_bundle()
+        except (FileNotFoundError, ImportError):
+            pass
+
+    if meta is None:
+        meta = pd.read_csv(data_constants.EPISODE_LINK)
+
+        meta.keyWords = meta.keyWords.apply(eval)
+        meta.Summaries = meta.Summaries.apply(eval)
+
+        scripts = pd.read_csv(data_constants.SCRIPTS_LINK)
+    if compact:
+        meta, scripts = compact_frames(meta, scripts)
+    return meta, scripts
+
+
+def load_data_bundle() -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Load cleaned scripts and metadata from the columnar Parquet bundle.
+    List columns are stored natively, so no string parsing is needed.
+
+    :raise FileNotFoundError: if the bundle has not been built.
+    :raise ImportError: if no Parquet engine is installed.
+    :return: 2 Dataframes (1 Metadata, 1 scripts).
+    """
+    meta = pd.read_parquet(data_constants.EPISODE_BUNDLE)
+    # Parquet list columns come back as arrays; match the CSV path.
+    for col in data_constants.LIST_COLUMNS:
+        meta[col] = meta[col].apply(list)
+
+    scripts = pd.read_parquet(data_constants.SCRIPTS_BUNDLE)
+    return meta, scripts
+
+
+def align_chunks(chunks: Iterable) -> Iterator:
+    """
+    Re-chunk a stream of scripts DataFrames so no episode is split
+    across chunks: the trailing episode of each chunk is held back and
+    prepended to the next one. Lines of an episode must be contiguous,
+    as they are in the cleaned scripts.
+
+    :param chunks: iterable of scripts DataFrames with a 'SEID' column.
+    :return: iterator of DataFrames, each holding whole episodes.
+    """
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk])
+        if chunk.empty:
+            carry = chunk
+            continue
+        seids = chunk.SEID.to_numpy()
+        # start of the trailing run of the last SEID
+        changes = np.flatnonzero(seids[1:] != seids[:-1])
+        split = changes[-1] + 1 if len(changes) else 0
+        carry = chunk.iloc[split:]
+        if split:
+            yield chunk.iloc[:split]
+    if carry is not None and not carry.empty:
+        yield carry
+
+
+def iter_scripts(chunksize: int = CHUNKSIZE,
+                 use_bundle: bool = True) -> Iterator:
+    """
+    Stream the cleaned scripts in SEID-aligned chunks, so at most one
+    chunk plus one episode is in memory at a time.
+
+    :param chunksize: number of lines read per step; chunks can be
+        larger by up to one episode.
+    :param use_bundle: read the Parquet bundle if it exists, falling
+        back to the CSV file when it is missing or pyarrow is not
+        installed.
+    :raise TypeError: if chunksize is not an integer.
+    :raise ValueError: if chunksize is not positive.
+    :return: iterator of scripts DataFrames holding whole episodes.
+    """
+    if not isinstance(chunksize, int):
+        raise TypeError("chunksize must be an integer")
+    if chunksize <= 0:
+        raise ValueError("chunksize must be positive")
+    chunks = None
+    if use_bundle:
+        try:
+            # pylint:disable=import-outside-toplevel
+            from pyarrow import parquet
+            batches = parquet.ParquetFile(
+                data_constants.SCRIPTS_BUNDLE).iter_batches(chunksize)
+            chunks = (batch.to_pandas() for batch in batches)
+        except (FileNotFoundError, ImportError):
+            pass
+    if chunks is None:
+        chunks = pd.read_csv(data_constants.SCRIPTS_LINK,
+                             chunksize=chunksize)
+    return align_chunks(chunks)
+
+
+def read_manifest(path: Optional[str] = None) -> Optional[dict]:
+    """
+    Read the data manifest written alongside the bundle. It holds the
+    SHA-256 of every data artifact and a combined 'version' hash.
+
+    :param path: path to the manifest, defaults to
+        data_constants.DATA_MANIFEST.
+    :raise ValueError: if the manifest has no version.
+    :return: manifest dict, or None if no manifest has been written.
+    """
+    if path is None:
+        path = data_constants.DATA_MANIFEST
+    try:
+        with open(path, encoding='utf-8') as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        return None
+    if not isinstance(manifest, dict) or 'version' not in manifest:
+        raise ValueError(f"{path} is not a data manifest")
+    return manifest
+
+
+def get_data_version(path: Optional[str] = None,
+                     files: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Get the content hash of the data currently on disk. The manifest
+    is only re-read when its modification time or size changes, so
+    this is cheap enough to call on every rerun. Without a manifest
+    (e.g. the plain CSV files), the version is derived from the
+    modification times and sizes of the data files instead.
 
-    meta.keyWords = meta.keyWords.apply(eval)
-    meta.Summaries = meta.Summaries.apply(eval)
+    :param path: path to the manifest, defaults to
+        data_constants.DATA_MANIFEST.
+    :param files: data files versioned without a manifest, defaults to
+        data_constants.DATA_FILES.
+    :return: version string, or None if there is neither a manifest
+        nor any of the data files.
+    """
+    if path is None:
+        path = data_constants.DATA_MANIFEST
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return _files_version(files)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _MANIFEST_VERSIONS.get(path)
+    if cached is None or cached[0] != key:
+        manifest = read_manifest(path)
+        if manifest is None:
+            return None
+        cached = (key, str(manifest['version']))
+        _MANIFEST_VERSIONS[path] = cached
+    return cached[1]
+
+
+def _files_version(files: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Private function to version the data files by their modification
+    times and sizes. Rewriting a file changes the version even if its
+    content is the same, which only costs a reload.
+
+    :param files: paths, defaults to data_constants.DATA_FILES.
+    :return: 'files-' and a hash, or None if none of the files exist.
+    """
+    if files is None:
+        files = data_constants.DATA_FILES
+    stamps = []
+    for file in files:
+        try:
+            stat = os.stat(file)
+        except FileNotFoundError:
+            continue
+        stamps.append(f"{file}:{stat.st_mtime_ns}:{stat.st_size}")
+    if not stamps:
+        return None
+    return 'files-' + hashlib.sha256('\n'.join(stamps).encode()
+                                     ).hexdigest()[:16]
 
-    scripts = pd.read_csv(data_constants.SCRIPTS_LINK)
+
+def _compact_frame(frame: pd.DataFrame, categories: List[str],
+                   float_dtype: str,
+                   float_columns: List[str]) -> pd.DataFrame:
+    """
+    Private function to downcast the columns of a single DataFrame.
+
+    :param frame: DataFrame to compact (not modified).
+    :param categories: string columns to store as categoricals.
+    :param float_dtype: dtype for float_columns.
+    :param float_columns: float columns to cast to float_dtype.
+    :return: compacted copy of frame.
+    """
+    frame = frame.copy()
+    for col in frame.columns:
+        if col in categories:
+            frame[col] = frame[col].astype('category')
+        elif col in float_columns:
+            frame[col] = frame[col].astype(float_dtype)
+        elif pd.api.types.is_integer_dtype(frame[col]):
+            frame[col] = pd.to_numeric(frame[col], downcast='integer')
+    return frame
+
+
+def compact_frames(meta: pd.DataFrame, scripts: pd.DataFrame,
+                   float_dtype: str = 'float32'
+                   ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Convert metadata and scripts to a compact schema: repeated strings
+    become categoricals, emotions become float_dtype and integer columns
+    (counts, season & episode numbers) use the smallest int that fits.
+
+    :param meta: metadata DataFrame.
+    :param scripts: scripts DataFrame.
+    :param float_dtype: 'float32' or 'float16' for the emotion columns.
+    :raise ValueError: if float_dtype is not float32 or float16.
+    :return: 2 compacted Dataframes (1 Metadata, 1 scripts).
+    """
+    if not isinstance(meta, pd.DataFrame) or \
+            not isinstance(scripts, pd.DataFrame):
+        raise TypeError("meta and scripts must be pandas DataFrames")
+    if float_dtype not in ('float32', 'float16'):
+        raise ValueError("float_dtype must be 'float32' or 'float16'")
+
+    meta = _compact_frame(meta, data_constants.EPISODE_CATEGORIES,
+                          float_dtype, [])
+    scripts = _compact_frame(scripts, data_constants.SCRIPTS_CATEGORIES,
+                             float_dtype, data_constants.EMOTION_COLUMNS)
     return meta, scripts
 
 
-def get_episode_query_tensors(num_shards: int = 10) -> torch.Tensor:
+def memory_report(before: pd.DataFrame,
+                  after: pd.DataFrame) -> pd.DataFrame:
+    """
+    Report bytes used per column, including Python string objects.
+
+    :param before: original DataFrame.
+    :param after: the same DataFrame after compact_frames.
+    :return: DataFrame indexed by column (plus 'Total') with the
+        before & after dtypes and bytes and the fraction saved.
+    """
+    if not isinstance(before, pd.DataFrame) or \
+            not isinstance(after, pd.DataFrame):
+        raise TypeError("before and after must be pandas DataFrames")
+
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'bytes_before': before.memory_usage(index=False, deep=True),
+        'dtype_after': after.dtypes.astype(str),
+        'bytes_after': after.memory_usage(index=False, deep=True),
+    })
+    report.loc['Total'] = ['', report.bytes_before.sum(),
+                           '', report.bytes_after.sum()]
+    report['saved'] = 1 - report.bytes_after / report.bytes_before
+    return report
+
+
+def load_embedding_store(path: Optional[str] = None) -> np.memmap:
+    """
+    Memory-map the contiguous float32 dialogue embedding store.
+    The pages are read-only and shared with every other process
+    mapping the same file.
+
+    :param path: path to the .npy store, defaults to
+        data_constants.EMBEDDING_STORE.
+    :raise ValueError: if the store is not a 2D float32 matrix.
+    :return: read-only (num_lines, dim) memory-mapped array.
+    """
+    if path is None:
+        path = data_constants.EMBEDDING_STORE
+    store = np.load(path, mmap_mode='r')
+    if store.ndim != 2 or store.dtype != np.float32:
+        raise ValueError("Embedding store must be a 2D float32 matrix")
+    return store
+
+
+def get_episode_query_tensors(num_shards: int = 10) -> 'torch.Tensor':
     """
     Load in pre-computed feature vectors for cosine similarity.
+    Uses the memory-mapped embedding store if it exists (zero-copy),
+    otherwise concatenates the sharded .npy files.
 
     :param num_shards: number of times the raw feature vector
                        was sharded to allow Git tracking.
     """
     if not isinstance(num_shards, int):
         raise TypeError("num_shards must be an integer")
-    all_tensors = []
-    for i in range(num_shards):
-        npy_tensor = np.load(f"./static/data/dialogue_tensors/tensor_{i}.npy")
-        all_tensors.append(npy_tensor)
-    npy_2d = np.concatenate(all_tensors)
-    # pylint:disable=no-member
-    torch_tensor = torch.from_numpy(npy_2d)
+    if os.path.exists(data_constants.EMBEDDING_STORE):
+        npy_2d = load_embedding_store()
+    else:
+        all_tensors = []
+        for i in range(num_shards):
+            npy_tensor = np.load(
+                f"./static/data/dialogue_tensors/tensor_{i}.npy")
+            all_tensors.append(npy_tensor)
+        npy_2d = np.concatenate(all_tensors)
+    import torch  # pylint:disable=import-outside-toplevel
+    with warnings.catch_warnings():
+        # The store is mapped read-only; the tensor is never written to.
+        warnings.filterwarnings('ignore', message='.*not writable.*')
+        # pylint:disable=no-member
+        torch_tensor = torch.from_numpy(npy_2d)
     return torch_tensor
 
 
-def get_line_counts(scripts: pd.DataFrame) -> OrderedDict:
+def _build_speaker_table(characters: pd.Series) -> pd.DataFrame:
+    """
+    Private function to explode the Character column into one row per
+    (line, speaker). Only the unique Character strings are split in
+    Python; every line is then expanded with NumPy gathers.
+
+    :param characters: 'Character' column of the scripts data.
+    :return: DataFrame with int 'line' positions and a categorical
+        'speaker' column (categories in order of first appearance).
+    """
+    char_codes, char_uniques = pd.factorize(characters.astype(str))
+    split = [[name.strip() for name in chars.split(" & ")]
+             for chars in char_uniques]
+    unique_lengths = np.fromiter(map(len, split), dtype=np.int64,
+                                 count=len(split))
+    unique_starts = np.cumsum(unique_lengths) - unique_lengths
+    unique_names = np.array([name for names in split for name in names],
+                            dtype=object)
+
+    lengths = unique_lengths[char_codes]
+    within = np.arange(lengths.sum()) - \
+        np.repeat(np.cumsum(lengths) - lengths, lengths)
+    names = unique_names[np.repeat(unique_starts[char_codes], lengths)
+                         + within]
+    speaker_codes, speakers = pd.factorize(names)
+    return pd.DataFrame({
+        'line': np.repeat(np.arange(len(characters)), lengths),
+        'speaker': pd.Categorical.from_codes(speaker_codes, speakers)
+    })
+
+
+def get_speaker_table(scripts: pd.DataFrame) -> pd.DataFrame:
+    """
+    Get the exploded speakers table, with one row per (line index,
+    speaker) after splitting 'Character' on " & ". The table is built
+    once per scripts DataFrame and cached, so scripts must be treated
+    as read-only.
+
+    :param scripts: Pandas DataFrame containing at least the
+        'Character' column.
+    :return: DataFrame with int 'line' positions into scripts and a
+        categorical 'speaker' column whose codes are the speaker ids.
+    """
+    if not isinstance(scripts, pd.DataFrame):
+        raise TypeError("scripts must be an pd.DataFrame")
+
+    key = id(scripts)
+    cached = _SPEAKER_TABLES.get(key)
+    if cached is not None and cached[0]() is scripts \
+            and cached[1] == len(scripts):
+        return cached[2]
+    table = _build_speaker_table(scripts.Character)
+    # Drop the cache entry as soon as the scripts DataFrame is freed
+    ref = weakref.ref(scripts, lambda _, k=key: _SPEAKER_TABLES.pop(k, None))
+    _SPEAKER_TABLES[key] = (ref, len(scripts), table)
+    return table
+
+
+def get_line_counts(scripts: Scripts) -> OrderedDict:
     """
     Get line counts for each character in the data.
 
     :param scripts: Pandas DataFrame containing at least these columns:
-                 'Character', 'Dialogue', 'SEID' representing the script data.
+                 'Character', 'Dialogue', 'SEID' representing the script data,
+                 or an iterator of such DataFrames (e.g. iter_scripts),
+                 which is reduced one chunk at a time.
     :return: number of lines dialogue for each unique characters
     """
-    if not isinstance(scripts, pd.DataFrame):
-        raise TypeError("scripts must be an pd.DataFrame")
+    if isinstance(scripts, pd.DataFrame):
+        speaker_tables = iter([get_speaker_table(scripts)])
+    elif isinstance(scripts, Iterator):
+        speaker_tables = (_build_speaker_table(chunk.Character)
+                          for chunk in scripts)
+    else:
+        raise TypeError("scripts must be an pd.DataFrame or an iterator")
 
-    # all characters
-    list_chars = scripts.Character.str.split(" & ").to_list()
-    line_counts = {}
-    # count each character's appearance
-    for char_list in list_chars:
-        for char in char_list:
-            line_counts[char.strip()] = line_counts.get(char.strip(), 0) + 1
+    # speakers in order of first appearance -> line count
+    totals = {}
+    for table in speaker_tables:
+        speakers = table.speaker
+        counts = np.bincount(speakers.cat.codes,
+                             minlength=len(speakers.cat.categories))
+        for name, count in zip(speakers.cat.categories, counts.tolist()):
+            totals[name] = totals.get(name, 0) + count
 
-    # rearrange dictionary from highest to lowest
-    sort_items = sorted(line_counts.items(), key=lambda x: x[1], reverse=True)
-    final_counts = OrderedDict(sort_items)
+    # rearrange dictionary from highest to lowest (ties by first line)
+    names = list(totals)
+    counts = np.fromiter(totals.values(), dtype=np.int64, count=len(names))
+    order = np.argsort(-counts, kind='stable')
+    final_counts = OrderedDict((names[i], int(counts[i])) for i in order)
 
     return final_counts
 
 
+def _group_codes(scripts: pd.DataFrame,
+                 by: str) -> Tuple[np.ndarray, pd.Index]:
+    """
+    Private function to assign each line of scripts to a group.
+
+    :param scripts: scripts DataFrame.
+    :param by: a column of scripts, or 'Scene' for scenes within each
+        episode (a new scene starts at every 'SETTING' line).
+    :return: int group id of each line and the sorted group labels.
+    """
+    if by == SCENE:
+        is_setting = scripts.Character.astype(str).eq('SETTING').to_numpy()
+        scene_no = pd.Series(is_setting).groupby(
+            scripts.SEID.astype(str).to_numpy()).cumsum().to_numpy()
+        groups = pd.MultiIndex.from_arrays(
+            [scripts.SEID.astype(str).to_numpy(), scene_no],
+            names=['SEID', SCENE])
+        return groups.factorize(sort=True)
+    if by not in scripts.columns:
+        raise ValueError(f"by must be '{SCENE}' or a column of scripts")
+    return pd.factorize(scripts[by], sort=True)
+
+
+def count_matrix(scripts: Scripts,
+                 characters: Optional[List[str]] = None,
+                 by: str = 'SEID',
+                 sparse: bool = False,
+                 exact: bool = False
+                 ) -> Tuple[Union[np.ndarray, 'csr_matrix'],
+                            pd.Index, pd.Index]:
+    """
+    Count lines per character and group in one vectorised pass over
+    the exploded speakers table.
+
+    :param scripts: Pandas DataFrame containing at least the
+        'Character' and 'SEID' columns, plus the by column, or an
+        iterator of SEID-aligned DataFrames (e.g. iter_scripts) whose
+        counts are reduced one chunk at a time.
+    :param characters: list of characters to count, defaults to every
+        speaker in scripts (in order of first appearance).
+    :param by: 'SEID', 'Season', any other scripts column, or 'Scene'.
+    :param sparse: return a scipy.sparse CSR matrix instead of an array.
+    :param exact: count a line only for its whole 'Character' label,
+        so joint lines such as 'JERRY & GEORGE' count for neither
+        speaker alone.
+    :raise TypeError: if scripts is not a DataFrame or an iterator, or
+        characters is not a list or None.
+    :raise ValueError: if by is not a column of scripts or 'Scene'.
+    :return: (num_characters, num_groups) int matrix of line counts,
+        the character (row) labels and the group (column) labels.
+    """
+    if characters is not None and not isinstance(characters, list):
+        raise TypeError("Input characters must be a list or None")
+    if isinstance(scripts, Iterator):
+        return _reduce_count_matrix(scripts, characters, by, sparse, exact)
+    if not isinstance(scripts, pd.DataFrame):
+        raise TypeError("Input scripts must be a Pandas DataFrame")
+
+    group_ids, groups = _group_codes(scripts, by)
+    if exact:
+        # codes in order of first appearance, -1 for a missing Character
+        speaker_ids, speakers = pd.factorize(scripts.Character.astype(object))
+        lines = np.flatnonzero(speaker_ids >= 0)
+        speaker_ids = speaker_ids[lines]
+    else:
+        table = get_speaker_table(scripts)
+        speaker_ids = table.speaker.cat.codes.to_numpy()
+        speakers = table.speaker.cat.categories
+        lines = table.line.to_numpy()
+    # int64: small categorical codes would overflow in the flat index
+    speaker_ids = speaker_ids.astype(np.int64)
+    if characters is None:
+        rows = pd.Index(speakers)
+        row_ids = speaker_ids
+    else:
+        rows = pd.Index(list(dict.fromkeys(characters)), dtype=object)
+        # position of each speaker in rows, -1 if not counted
+        row_ids = rows.get_indexer(speakers)[speaker_ids]
+    counted = row_ids >= 0
+    row_ids = row_ids[counted]
+    col_ids = group_ids[lines[counted]]
+
+    shape = (len(rows), len(groups))
+    if sparse:
+        # pylint:disable=import-outside-toplevel
+        from scipy.sparse import coo_matrix
+        matrix = coo_matrix(
+            (np.ones(len(row_ids), dtype=np.int64), (row_ids, col_ids)),
+            shape=shape).tocsr()
+    else:
+        matrix = np.bincount(row_ids * shape[1] + col_ids,
+                             minlength=shape[0] * shape[1]
+                             ).reshape(shape)
+    return matrix, rows, groups
+
+
+def _reduce_count_matrix(chunks: Iterator,
+                         characters: Optional[List[str]], by: str,
+                         sparse: bool, exact: bool
+                         ) -> Tuple[Union[np.ndarray, 'csr_matrix'],
+                                    pd.Index, pd.Index]:
+    """
+    Private function to build count_matrix from a stream of chunks,
+    keeping only the non-zero counts of each chunk.
+
+    :param chunks: iterator of scripts DataFrames.
+    :param characters: see count_matrix.
+    :param by: see count_matrix.
+    :param sparse: see count_matrix.
+    :param exact: see count_matrix.
+    :return: see count_matrix.
+    """
+    rows = pd.Index([], dtype=object)
+    if characters is not None:
+        rows = pd.Index(list(dict.fromkeys(characters)), dtype=object)
+    row_ids, labels, values = [], None, []
+    for chunk in chunks:
+        counts, chunk_rows, groups = count_matrix(chunk, characters, by,
+                                                  sparse=True, exact=exact)
+        if characters is None:
+            rows = rows.append(chunk_rows.difference(rows, sort=False))
+        counts = counts.tocoo()
+        row_ids.append(rows.get_indexer(chunk_rows)[counts.row])
+        chunk_labels = groups[counts.col]
+        labels = chunk_labels if labels is None \
+            else labels.append(chunk_labels)
+        values.append(counts.data)
+
+    if labels is None:
+        groups = pd.Index([])
+        col_ids = np.array([], dtype=np.int64)
+    else:
+        # a group split across chunks is summed back together
+        col_ids, groups = labels.factorize(sort=True)
+    # pylint:disable=import-outside-toplevel
+    from scipy.sparse import coo_matrix
+    counts = coo_matrix(
+        (np.concatenate(values or [np.array([], dtype=np.int64)]),
+         (np.concatenate(row_ids or [np.array([], dtype=np.int64)]),
+          col_ids)),
+        shape=(len(rows), len(groups))).tocsr()
+    counts.sum_duplicates()
+    if not sparse:
+        counts = counts.toarray()
+    return counts, rows, groups
+
+
 def get_line_counts_per_episode(
-        scripts: pd.DataFrame,
+        scripts: Scripts,
         characters: Optional[List[str]] = None) -> OrderedDict:
     """
     Get line counts for main 4 characters in the data for each episode.
 
     :param scripts: Pandas DataFrame containing at least these columns:
-                 'Character', 'Dialogue', 'SEID' representing the script data.
+                 'Character', 'Dialogue', 'SEID' representing the script data,
+                 or an iterator of such DataFrames (e.g. iter_scripts).
     :param characters: set of characters, defaults to
         {'JERRY', 'GEORGE', 'ELAINE', 'KRAMER'}
-    :raise TypeError: if scripts is not a
-        Pandas DataFrame or if characters is not a set or None
+    :raise TypeError: if scripts is not a Pandas DataFrame or an
+        iterator, or if characters is not a set or None
 
     :return: number of lines dialogue for each unique characters
     """
-    if not isinstance(scripts, pd.DataFrame):
+    if not isinstance(scripts, (pd.DataFrame, Iterator)):
         raise TypeError("Input scripts must be a Pandas DataFrame")
 
     if characters is not None and not isinstance(characters, list):
@@ -94,21 +617,9 @@ def get_line_counts_per_episode(
     if characters is None:
         characters = {'JERRY', 'GEORGE', 'ELAINE', 'KRAMER'}
 
-    seid_to_id = dict(zip(
-        sorted(scripts.SEID.unique()),
-        np.arange(len(scripts.SEID.unique()))
-    ))
-    # all characters
-    list_chars = scripts.Character.str.split(" & ").to_list()
     line_counts = OrderedDict.fromkeys(characters, None)
-    for char in line_counts:
-        line_counts[char] = np.zeros(len(seid_to_id))
-    # count each character's appearance
-    for i, char_list in enumerate(list_chars):
-        seid_id = seid_to_id[scripts.SEID.values[i]]
-        for char in char_list:
-            # update counts of tracked characters
-            if char.strip() in line_counts:
-                line_counts[char.strip()][seid_id] += 1
+    counts, _, _ = count_matrix(scripts, list(line_counts), by='SEID')
+    for i, char in enumerate(line_counts):
+        line_counts[char] = counts[i].astype(float)
 
     return line_counts
@@ -0,0 +1,189 @@
+"""
+Compact, array-backed storage for the lines of dialogue used by
+episode querying.
+"""
+from typing import Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Joins decoded lines; NUL never appears in the cleaned dialogue.
+_SEPARATOR = 0
+
+
+class DialogueStore:
+    """
+    Class to store every line of dialogue in one UTF-8 buffer plus an
+    int64 offsets array, along with the SEID code of each line.
+    Holds a handful of NumPy arrays instead of one Python str per line,
+    so it is cheap to keep per process and trivially picklable.
+    """
+
+    def __init__(self, dialogue: Iterable[str],
+                 seids: Optional[Iterable[str]] = None) -> None:
+        """
+        Encode lines of dialogue into the buffer.
+
+        :param dialogue: iterable of strings, one per line.
+        :param seids: optional iterable of the SEID of each line.
+        :raise ValueError: if a line contains a NUL character or
+            seids does not match the number of lines.
+
+        :return: None
+        """
+        encoded = [str(line).encode('utf-8') for line in dialogue]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64,
+                              count=len(encoded))
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        self.buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        if np.any(self.buffer == _SEPARATOR):
+            raise ValueError("Dialogue must not contain NUL characters")
+
+        seids = np.array([] if seids is None else list(seids), dtype=str)
+        if seids.size and len(seids) != len(self):
+            raise ValueError("seids must have one entry per line")
+        self.seid_labels, codes = np.unique(seids, return_inverse=True)
+        self.seid_codes = codes.astype(np.int32)
+        # Rows of each SEID: self._order[bounds[c]:bounds[c + 1]]
+        self._order = np.argsort(self.seid_codes, kind='stable')
+        self._bounds = np.searchsorted(self.seid_codes[self._order],
+                                       np.arange(len(self.seid_labels) + 1))
+
+    @classmethod
+    def from_scripts(cls, scripts: pd.DataFrame) -> 'DialogueStore':
+        """
+        Build a store from the scripts DataFrame.
+
+        :param scripts: DataFrame with 'Dialogue' and 'SEID' columns.
+        :return: DialogueStore aligned with the rows of scripts.
+        """
+        if not isinstance(scripts, pd.DataFrame):
+            raise TypeError("scripts must be a pandas DataFrame")
+        return cls(scripts.Dialogue.values, scripts.SEID.astype(str).values)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        """
+        Get a single line (int index) or an array of lines
+        (slice, list or array of indices).
+        """
+        if isinstance(index, slice):
+            return self.take(np.arange(len(self))[index])
+        if np.ndim(index) == 0:
+            return self.take([int(index)])[0]
+        return self.take(index)
+
+    def take(self, indices) -> np.ndarray:
+        """
+        Get lines of dialogue by row index in one vectorised gather.
+
+        :param indices: list or array of row indices.
+        :raise IndexError: if an index is out of range.
+        :return: object array of strings in the order of indices.
+        """
+        indices = np.asarray(indices, dtype=np.int64).ravel()
+        if indices.size == 0:
+            return np.array([], dtype=object)
+        if indices.min() < -len(self) or indices.max() >= len(self):
+            raise IndexError("DialogueStore index out of range")
+        indices = np.where(indices < 0, indices + len(self), indices)
+
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        # Copy every selected byte, leaving one separator after each line.
+        dest_starts = np.cumsum(lengths + 1) - (lengths + 1)
+        within = np.arange(lengths.sum()) - \
+            np.repeat(np.cumsum(lengths) - lengths, lengths)
+        gathered = np.full(int((lengths + 1).sum()) - 1, _SEPARATOR,
+                           dtype=np.uint8)
+        gathered[np.repeat(dest_starts, lengths) + within] = \
+            self.buffer[np.repeat(starts, lengths) + within]
+        lines = gathered.tobytes().decode('utf-8').split(chr(_SEPARATOR))
+        return np.array(lines, dtype=object)
+
+    def rows_for_seid(self, seid: str) -> np.ndarray:
+        """
+        Get the row indices of every line in an episode.
+
+        :param seid: episode SEID, e.g. 'S01E01'.
+        :return: sorted int array of row indices (empty if unknown).
+        """
+        code = np.searchsorted(self.seid_labels, seid)
+        if code >= len(self.seid_labels) or self.seid_labels[code] != seid:
+            return np.array([], dtype=np.int64)
+        return self._order[self._bounds[code]:self._bounds[code + 1]]
+
+    def rows_for_seids(self, seids: Iterable[str]) -> np.ndarray:
+        """
+        Get the row indices of every line in any of several episodes.
+
+        :param seids: iterable of episode SEIDs; unknown ones are ignored.
+        :return: sorted int array of row indices.
+        """
+        codes = np.flatnonzero(np.isin(self.seid_labels,
+                                       np.array(list(seids), dtype=str)))
+        return np.flatnonzero(np.isin(self.seid_codes, codes))
+
+    def episode_scores(self, scores: np.ndarray, top_n: int = 1,
+                       rows: Optional[np.ndarray] = None
+                       ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Reduce line scores to one score per episode in a single pass over
+        the SEID boundaries: the best line's score, or the mean of the
+        episode's top_n line scores.
+
+        :param scores: 1D score of every line, or of every row in rows.
+        :param top_n: number of best lines averaged per episode.
+        :param rows: sorted row indices the scores belong to, or None.
+        :raise ValueError: if top_n < 1 or scores has the wrong length.
+        :return: SEID labels of the episodes with scored lines, and
+            their scores.
+        """
+        if top_n < 1:
+            raise ValueError("top_n must be at least 1")
+        scores = np.asarray(scores).ravel()
+        if rows is None:
+            codes, order, bounds = self.seid_codes, self._order, self._bounds
+        else:
+            codes = self.seid_codes[rows]
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order],
+                                     np.arange(len(self.seid_labels) + 1))
+        if len(scores) != len(codes):
+            raise ValueError("scores must have one entry per scored row")
+        counts = np.diff(bounds)
+        present = counts > 0
+        if not present.any():
+            return self.seid_labels[:0], scores[:0]
+        starts = bounds[:-1][present]
+        if top_n == 1:
+            return self.seid_labels[present], \
+                np.maximum.reduceat(scores[order], starts)
+
+        # Best lines first within each episode, then mean the first top_n
+        ranked = scores[np.lexsort((-scores, codes))]
+        within = np.arange(len(ranked)) - np.repeat(bounds[:-1], counts)
+        totals = np.add.reduceat(np.where(within < top_n, ranked, 0),
+                                 starts)
+        return self.seid_labels[present], \
+            totals / np.minimum(counts[present], top_n)
+
+    def lines_for_seid(self, seid: str) -> np.ndarray:
+        """
+        Get every line of dialogue in an episode, in script order.
+
+        :param seid: episode SEID, e.g. 'S01E01'.
+        :return: object array of strings (empty if unknown).
+        """
+        return self.take(self.rows_for_seid(seid))
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Total bytes held by the store's arrays.
+        """
+        return int(self.buffer.nbytes + self.offsets.nbytes +
+                   self.seid_codes.nbytes + self.seid_labels.nbytes +
+                   self._order.nbytes + self._bounds.nbytes)
@@ -0,0 +1,78 @@
+"""
+Backends for running the sentence encoder on CPU: the float32 model as
+downloaded, or a copy whose linear layers use dynamic int8 quantisation,
+and a parity check comparing the two.
+"""
+from typing import Iterable
+
+import numpy as np
+
+# 'float32': the model as downloaded. 'int8': weights of every linear
+# layer quantised to int8, activations quantised per batch at run time
+ENCODER_BACKENDS = ('float32', 'int8')
+
+
+def quantize_encoder(model):
+    """
+    Quantise a model's linear layers to int8 in place (PyTorch dynamic
+    quantisation). In MiniLM these hold nearly all of the weights and
+    the run time; embeddings and layer norms stay float32. The result
+    only runs on CPU.
+
+    :param model: SentenceTransformer or other torch module.
+    :return: the same model, quantised.
+    """
+    # Imported here so importing the module does not load torch
+    # pylint:disable=import-outside-toplevel
+    import torch
+    model.to('cpu')
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_encoder(model_name: str, backend: str = 'float32'):
+    """
+    Load a SentenceTransformer for a backend.
+
+    :param model_name: SentenceTransformer model name.
+    :param backend: one of ENCODER_BACKENDS.
+    :raise ValueError: if backend is unknown.
+    :return: SentenceTransformer
+    """
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"backend must be one of "
+                         f"{', '.join(ENCODER_BACKENDS)}")
+    # pylint:disable=import-outside-toplevel
+    from sentence_transformers import SentenceTransformer
+    if backend == 'float32':
+        return SentenceTransformer(model_name)
+    return quantize_encoder(SentenceTransformer(model_name, device='cpu'))
+
+
+def encoder_agreement(reference, candidate, sentences: Iterable[str],
+                      batch_size: int = 256) -> dict:
+    """
+    Compare two encoders sentence by sentence: the cosine similarity
+    between each sentence's embeddings from both.
+
+    :param reference: encoder taken as correct, e.g. the float32 model.
+    :param candidate: encoder checked against it, e.g. the int8 model.
+    :param sentences: sentences to encode, e.g. the dialogue lines.
+    :param batch_size: sentences encoded per forward pass.
+    :raise ValueError: if sentences is empty.
+    :return: number of sentences, mean, minimum and 1st percentile
+        cosine similarity.
+    """
+    sentences = list(sentences)
+    if not sentences:
+        raise ValueError("sentences must not be empty")
+    expected = np.asarray(reference.encode(sentences, batch_size=batch_size),
+                          dtype=np.float32)
+    found = np.asarray(candidate.encode(sentences, batch_size=batch_size),
+                       dtype=np.float32)
+    norms = np.linalg.norm(expected, axis=1) * np.linalg.norm(found, axis=1)
+    cosines = np.einsum('ij,ij->i', expected, found) / np.maximum(norms,
+                                                                  1e-12)
+    return {'sentences': len(cosines), 'mean': float(cosines.mean()),
+            'min': float(cosines.min()),
+            'p1': float(np.percentile(cosines, 1))}
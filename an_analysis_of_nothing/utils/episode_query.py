@@ -4,14 +4,23 @@ TV show dialogue data and searching for specific episodes
 based on keywords.
 """
 
+import numpy as np
 import pandas as pd
 import streamlit as st
-from st_aggrid import AgGrid, GridOptionsBuilder, \
-    GridUpdateMode, DataReturnMode, ColumnsAutoSizeMode
-from sentence_transformers import SentenceTransformer, util
-import torch
 
-from . import data_manager
+from . import data_constants, data_manager
+from .batch_encoder import get_batch_encoder
+from .dialogue_store import DialogueStore
+from .lexical_index import SEARCH_MODES, fuse_scores
+from .query_cache import encode_query
+from .scripts_db import QUOTE_LIMIT, find_quotes
+from .search_index import SEARCH_STORAGES, IVFIndex, load_search_index
+from .vector_search import BinaryEmbeddings, QuantizedEmbeddings, \
+    ReducedEmbeddings
+
+# Corpora searched through their own search method
+SEARCH_INDEXES = (QuantizedEmbeddings, BinaryEmbeddings, ReducedEmbeddings,
+                  IVFIndex)
 
 
 def filter_search_results(search_string, season_choice, rating_choice,
@@ -118,7 +127,8 @@ def filter_search_results(search_string, season_choice, rating_choice,
     return filtered_df, search_results
 
 
-def load_corpus(df_script):
+def load_corpus(df_script, dataset=None, storage='float32',
+                model_name=data_constants.ENCODER_MODEL):
     """
     Load sentence transformer and embedder for episode querying.
     Args:
@@ -127,59 +137,292 @@ def load_corpus(df_script):
             Unused but passed to maintain backwards compatibility.
         df_script (pd.DataFrame): The scripts DataFrame
             (st.session_state.df_dialog).
+        dataset (SharedDataset): Optional process-wide dataset whose
+            dialogue store and embeddings are reused instead of loaded.
+        storage (str): 'float32' to score queries against the full
+            embeddings, 'float16' / 'int8' to score against a compact
+            copy and re-rank the best lines at full precision, 'binary'
+            to shortlist lines by sign-hash Hamming distance before
+            re-ranking, 'pca64' / 'pca128' to shortlist them in a
+            PCA-reduced space, 'ivf' to score only the lines in the
+            closest inverted lists, or 'episodes' to score only the
+            lines of the episodes with the closest centroids.
+        model_name (str): SentenceTransformer model encoding queries.
     Returns:
-        list: Dialogue and summaries for each episode in df_imdb.
-        tensor: Vectorized corpus (embeddings).
-        SentenceTransformer: BertModel for finding closest matches.
+        DialogueStore: Dialogue for each line of df_script.
+        tensor or one of SEARCH_INDEXES: Vectorized corpus
+            (embeddings).
+        BatchEncoder: The process-wide SentenceTransformer front-end
+            that batches queries from concurrent sessions.
     """
     if not isinstance(df_script, (pd.DataFrame)):
         raise TypeError("df_script must be pandas dataframe")
-    embedder = SentenceTransformer('all-MiniLM-L6-v2')
-    corpus = df_script.Dialogue.values
+    if storage != 'float32' and storage not in SEARCH_STORAGES:
+        raise ValueError(
+            f"storage must be 'float32' or one of {SEARCH_STORAGES}")
+    embedder = get_batch_encoder(model_name)
+    if dataset is not None:
+        if storage != 'float32':
+            return dataset.dialogue, dataset.quantized(storage), embedder
+        return dataset.dialogue, dataset.embeddings_tensor, embedder
+    corpus = DialogueStore.from_scripts(df_script)
     corpus_embeddings = data_manager.get_episode_query_tensors(num_shards=10)
+    if storage != 'float32':
+        corpus_embeddings = load_search_index(
+            storage, corpus_embeddings.numpy(), corpus.seid_codes)
     return corpus, corpus_embeddings, embedder
 
 
-def query_episodes(df_imdb, df_script, query):
+def query_episodes(df_imdb, df_script, query, num_episodes=5, top_n=None,
+                   mode=None):
     """
     Searches a pandas DataFrame for the closest matches to the search string.
+    Only lines from episodes in df_imdb are scored, so filtered searches
+    still return num_episodes episodes whenever df_imdb has that many.
     Args:
         df_imdb (pd.DataFrame): The episode metadata DataFrame to search.
         df_script (pd.DataFrmame): The dialogues of each episode.
         query (str): The string to search for.
+        num_episodes (int): The number of episodes to return.
+        top_n (int): None to rank episodes by their first appearance
+            among the best lines; otherwise every episode is scored by
+            the mean of its top_n line scores (1: its best line) and
+            the best scoring episodes are returned.
+        mode (str): 'semantic' to score lines by embedding similarity,
+            'lexical' to score them with the BM25 index
+            (st.session_state.lexical) without encoding the query, or
+            'hybrid' to fuse both per episode (top_n defaults to 1).
+            None for data_constants.SEARCH_MODE.
     Returns:
-        pd.DataFrame: The 5 closest matches to the search string.
+        pd.DataFrame: The num_episodes closest matches to the search string.
     """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
     if not isinstance(df_imdb, (pd.DataFrame)):
         raise TypeError("df_imdb must be pandas dataframe")
     if not isinstance(df_script, (pd.DataFrame)):
         raise TypeError("df_script must be pandas dataframe")
     if not isinstance(query, (str)):
         raise TypeError("query must be a string")
+    mode = mode or data_constants.SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"mode must be one of {SEARCH_MODES}")
 
     # pylint:disable=no-member
     corpus, corpus_embeddings, embedder = st.session_state.query
-    df = pd.DataFrame({'Dialogue': [], 'Index': [], 'Score': []})
-    query_embedding = embedder.encode(query, convert_to_tensor=True)
+    # Push the metadata filters down to the rows that get scored
+    rows = corpus.rows_for_seids(df_imdb.SEID.astype(str).unique())
+    if len(rows) == len(corpus):
+        rows = None
+    if mode == 'lexical':
+        return query_lexical(df_imdb, corpus, st.session_state.lexical,
+                             query, num_episodes, top_n, rows)
+    # Reruns with an unchanged search string reuse the embedding
+    query_embedding = encode_query(embedder, query)
+    if mode == 'hybrid':
+        seids, scores = corpus.episode_scores(
+            score_lines(corpus_embeddings, query_embedding, rows),
+            top_n or 1, rows)
+        _, lexical_scores = corpus.episode_scores(
+            st.session_state.lexical.scores(query, rows), top_n or 1, rows)
+        return get_ranked_episodes(df_imdb, seids,
+                                   fuse_scores(scores, lexical_scores),
+                                   num_episodes)
+    if top_n is not None:
+        seids, scores = corpus.episode_scores(
+            score_lines(corpus_embeddings, query_embedding, rows),
+            top_n, rows)
+        return get_ranked_episodes(df_imdb, seids, scores, num_episodes)
+
+    num_rows = len(corpus) if rows is None else len(rows)
+    k = 500
+    while True:
+        indices = search_lines(corpus_embeddings, query_embedding, k, rows)
+        results = get_hit_episodes(df_imdb, corpus, indices, num_episodes)
+        # Few episodes among the hits: widen the search until filled
+        if results.Title.nunique() >= num_episodes or k >= num_rows:
+            return results
+        k *= 4
+
+
+def query_lexical(df_imdb, corpus, lexical, query, num_episodes=5,
+                  top_n=None, rows=None):
+    """
+    Find episodes by the words of the query alone, with BM25.
+    Args:
+        df_imdb (pd.DataFrame): The episode metadata DataFrame to search.
+        corpus (DialogueStore): The dialogue corpus lexical indexes.
+        lexical (BM25Index): Inverted index over the corpus lines.
+        query (str): The string to search for.
+        num_episodes (int): The number of episodes to return.
+        top_n (int): None to rank episodes by their first appearance
+            among the matching lines, otherwise by the mean of their
+            top_n line scores.
+        rows (np.ndarray): Sorted corpus rows to score, or None to
+            score every line.
+    Returns:
+        pd.DataFrame: Up to num_episodes episodes with lines containing
+            a query word.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    if top_n is None:
+        return get_hit_episodes(df_imdb, corpus,
+                                lexical.search(query, rows=rows)[1],
+                                num_episodes)
+    seids, scores = corpus.episode_scores(lexical.scores(query, rows),
+                                          top_n, rows)
+    matched = scores > 0
+    return get_ranked_episodes(df_imdb, seids[matched], scores[matched],
+                               num_episodes)
+
+
+def search_quotes(search_string, season_choice=None, rating_choice=None,
+                  char_choice=None, limit=QUOTE_LIMIT):
+    """
+    Find the lines of dialogue containing a quote, using the SQLite
+    full-text index (data_constants.SCRIPTS_DB) rather than the
+    embeddings, so nothing is loaded into memory. The sidebar filters
+    are applied in the same query.
+    Args:
+        search_string (str): The quote or phrase to find, words in order.
+        season_choice (list): Seasons to search, or None for all.
+        rating_choice (tuple): Range of episode ratings, or None.
+        char_choice (list): Characters whose lines are searched (any of
+            them), or None for all.
+        limit (int): The most lines to return.
+    Returns:
+        pd.DataFrame: The matching lines, best match first, with their
+            scripts row ('line'), SEID, Title, Season, Character and
+            Dialogue.
+    """
+    if not isinstance(search_string, (str)):
+        raise TypeError("search_string must be a string")
+    if not isinstance(season_choice, (list, type(None))):
+        raise TypeError("season_choice must be a list or None.")
+    if not isinstance(rating_choice, (tuple, list, type(None))):
+        raise TypeError("rating_choice must be a tuple or None.")
+    if not isinstance(char_choice, (list, tuple, type(None))):
+        raise TypeError("char_choice must be a list or None.")
+    # Empty selections do not filter, as in filter_search_results
+    return find_quotes(search_string, season_choice or None,
+                       rating_choice or None, char_choice or None, limit)
+
+
+def score_lines(corpus_embeddings, query_embedding, rows=None):
+    """
+    Get the cosine similarity of the query to every corpus line.
+    Compact corpora return their approximate scores, which are cosine
+    similarities for unit-norm embeddings such as MiniLM's, with the
+    best lines re-scored at full precision. Other indexes score every
+    line of their full embeddings.
+    Args:
+        corpus_embeddings (tensor or one of SEARCH_INDEXES): Vectorized
+            corpus, as loaded by load_corpus.
+        query_embedding (tensor): The encoded query.
+        rows (np.ndarray): Sorted corpus rows to score, or None to
+            score every line.
+    Returns:
+        np.ndarray: The score of each line (or of each of rows).
+    """
+    if isinstance(corpus_embeddings, QuantizedEmbeddings):
+        return corpus_embeddings.scores(
+            np.asarray(query_embedding, dtype=np.float32), rows)
+    # pylint:disable=import-outside-toplevel
+    import torch
+    from sentence_transformers import util
+    if isinstance(corpus_embeddings, SEARCH_INDEXES):
+        corpus_embeddings = torch.from_numpy(
+            np.asarray(corpus_embeddings.full, dtype=np.float32))
+    if rows is not None:
+        corpus_embeddings = corpus_embeddings[torch.from_numpy(rows)]
+    return util.cos_sim(query_embedding, corpus_embeddings)[0].numpy()
+
+
+def search_lines(corpus_embeddings, query_embedding, k, rows=None):
+    """
+    Get the corpus lines most similar to a query embedding.
+    Args:
+        corpus_embeddings (tensor or one of SEARCH_INDEXES): Vectorized
+            corpus, as loaded by load_corpus.
+        query_embedding (tensor): The encoded query.
+        k (int): The number of lines to return.
+        rows (np.ndarray): Sorted corpus rows to score, or None to
+            score every line.
+    Returns:
+        np.ndarray: Corpus rows of up to k lines, best first.
+    """
+    if isinstance(corpus_embeddings, SEARCH_INDEXES):
+        # Compact scores or probed lists, exact re-rank of the candidates
+        return corpus_embeddings.search(
+            np.asarray(query_embedding, dtype=np.float32), k=k, rows=rows)[1]
+    # pylint:disable=import-outside-toplevel
+    import torch
+    from sentence_transformers import util
+    if rows is not None:
+        corpus_embeddings = corpus_embeddings[torch.from_numpy(rows)]
     # Cosine-similarity and torch.topk for highest scores
     cos_scores = util.cos_sim(query_embedding, corpus_embeddings)[0]
-    top_results = torch.topk(cos_scores, k=500)
-    for score, idx in zip(top_results[0], top_results[1]):
-        df = pd.concat([df, pd.Series({'Dialogue': corpus[idx],
-                                       'Index': int(idx),
-                                       'Score': score}).to_frame().T],
-                       ignore_index=True)
-    # Map to df_imdb
-    df['SEID'] = df.Index.apply(lambda x: df_script.iloc[x].SEID)
-    df = df[df.SEID.isin(df_imdb.SEID)]
-    df['Title'] = df.Index.apply(
-        lambda x: df_imdb[df_imdb.SEID
-                          == df_script.iloc[x]['SEID']]['Title'].values[0])
-    df_imdb = df_imdb.loc[df_imdb.Title.isin(
-        df.drop_duplicates(
-            subset=['Title']).iloc[0:5].Title
-    )]
-    return df_imdb
+    top = torch.topk(cos_scores, k=min(k, len(cos_scores)))[1].numpy()
+    return top if rows is None else rows[top]
+
+
+def get_hit_episodes(df_imdb, corpus, indices, num_episodes=5):
+    """
+    Map search hits (lines of dialogue) to the episodes they are from.
+    Uses the SEID code of every corpus line and a SEID to df_imdb row
+    index, so the mapping is a few array gathers.
+    Args:
+        df_imdb (pd.DataFrame): The episode metadata DataFrame to search.
+        corpus (DialogueStore): The dialogue corpus the hits index into.
+        indices (np.ndarray): Corpus row of each hit, best hit first.
+        num_episodes (int): The number of episodes to return.
+    Returns:
+        pd.DataFrame: The rows of df_imdb for the titles of the first
+            num_episodes distinct episodes among the hits, in df_imdb
+            order. Hits from episodes not in df_imdb are skipped.
+    """
+    if not isinstance(df_imdb, (pd.DataFrame)):
+        raise TypeError("df_imdb must be pandas dataframe")
+    if not isinstance(corpus, DialogueStore):
+        raise TypeError("corpus must be a DialogueStore")
+
+    # df_imdb row of each corpus SEID (first match), -1 if filtered out
+    seids = df_imdb.SEID.astype(str).to_numpy()
+    unique_seids, first_rows = np.unique(seids, return_index=True)
+    label_rows = np.full(len(corpus.seid_labels), -1, dtype=np.int64)
+    found = np.isin(corpus.seid_labels, unique_seids)
+    label_rows[found] = first_rows[
+        np.searchsorted(unique_seids, corpus.seid_labels[found])]
+
+    hit_rows = label_rows[corpus.seid_codes[np.asarray(indices)]]
+    hit_rows = hit_rows[hit_rows >= 0]
+    titles = pd.unique(df_imdb.Title.to_numpy()[hit_rows])[:num_episodes]
+    return df_imdb.loc[df_imdb.Title.isin(titles)]
+
+
+def get_ranked_episodes(df_imdb, seids, scores, num_episodes=5):
+    """
+    Get the best scoring episodes from per-episode scores.
+    Args:
+        df_imdb (pd.DataFrame): The episode metadata DataFrame to search.
+        seids (np.ndarray): Distinct SEIDs of the scored episodes.
+        scores (np.ndarray): The score of each SEID, higher is better.
+        num_episodes (int): The number of episodes to return.
+    Returns:
+        pd.DataFrame: The rows of df_imdb for the titles of the
+            num_episodes best scoring episodes, in df_imdb order.
+            Episodes not in df_imdb are skipped.
+    """
+    if not isinstance(df_imdb, (pd.DataFrame)):
+        raise TypeError("df_imdb must be pandas dataframe")
+
+    # Rank of each df_imdb row's SEID, -1 if it was not scored
+    ranked = pd.Index(np.asarray(seids)[np.argsort(-np.asarray(scores),
+                                                   kind='stable')])
+    rank = ranked.get_indexer(df_imdb.SEID.astype(str))
+    hit_rows = np.flatnonzero(rank >= 0)
+    hit_rows = hit_rows[np.argsort(rank[hit_rows], kind='stable')]
+    titles = pd.unique(df_imdb.Title.to_numpy()[hit_rows])[:num_episodes]
+    return df_imdb.loc[df_imdb.Title.isin(titles)]
 
 
 def get_selected_row(search_results):
@@ -195,6 +438,9 @@ def get_selected_row(search_results):
     """
     if not isinstance(search_results, (pd.DataFrame)):
         raise TypeError("search_results must be pandas dataframe")
+    # pylint:disable=import-outside-toplevel
+    from st_aggrid import AgGrid, GridOptionsBuilder, \
+        GridUpdateMode, DataReturnMode, ColumnsAutoSizeMode
 
     search_results = search_results[
         ['SEID', 'Title', 'averageRating', 'Director', 'Writers']
@@ -254,7 +500,8 @@ def get_characters(df_imdb, df_script, char_choice):
         raise TypeError("char_choice must be a list")
 
     # pylint:disable=unsubscriptable-object
-    char_list = df_script.groupby('SEID')['Character'].apply(list)
+    char_list = df_script.groupby('SEID', observed=True)['Character'].apply(
+        list)
     df_imdb = df_imdb.sort_values('SEID')
     df_char = pd.DataFrame(char_list).reset_index()
     df_char = df_char[df_char.SEID.isin(df_imdb.SEID)].sort_values('SEID')
@@ -365,3 +612,21 @@ def extract_argmax(row):
     if all(value == 0 for value in emotions_dict.values()):
         return 'No Emotion'
     return max(emotions_dict, key=emotions_dict.get)
+
+
+def sum_emotions(selected):
+    """
+    Sum the emotions of the selected lines per episode.
+    Args:
+        selected: a Pandas DataFrame of lines with 'SEID' and emotion
+            columns, e.g. from get_script_from_ep.
+    Returns:
+        pd.DataFrame: one row per episode among the lines, with 'SEID'
+        and the summed 'Happy', 'Angry', 'Surprise', 'Sad' and 'Fear'.
+    """
+    if not isinstance(selected, (pd.DataFrame)):
+        raise TypeError("selected must be pandas dataframe")
+    # observed: a categorical SEID (compact schema) would otherwise give
+    # a row of zeros for every other episode
+    return selected[['Happy', 'Angry', 'Surprise', 'Sad', 'Fear', 'SEID']
+                    ].groupby('SEID', observed=True).sum().reset_index()
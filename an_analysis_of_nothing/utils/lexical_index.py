@@ -0,0 +1,280 @@
+"""
+BM25 inverted index over the lines of dialogue, for finding literal
+words such as catchphrases and names without encoding the query, and
+the fusion of its scores with the semantic ones.
+"""
+import re
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+
+from . import data_constants
+from .vector_search import top_k
+
+# Search modes of episode querying: embeddings only, BM25 only (no
+# encoder), or both fused per episode
+SEARCH_MODES = ('semantic', 'lexical', 'hybrid')
+# Words are runs of letters and digits. A trailing 's is dropped, so
+# "Bania's" finds "Bania", then other apostrophes, so "don't" and
+# "dont" are one term
+_WORD = re.compile(r"[^\W_]+")
+_POSSESSIVE = re.compile(r"'s\b")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a line or query into lower-case terms.
+
+    :param text: line of dialogue or search string.
+    :return: list of terms, in order.
+    """
+    if not isinstance(text, str):
+        raise TypeError("text must be a string")
+    text = _POSSESSIVE.sub('', text.lower().replace('\u2019', "'"))
+    return _WORD.findall(text.replace("'", ''))
+
+
+class BM25Index:
+    """
+    Class for a BM25 inverted index: the posting list of every term
+    (the lines containing it and how often), stored as the CSR arrays
+    of a (num_terms, num_lines) term frequency matrix. A query only
+    touches the postings of its own terms, so a lookup costs
+    microseconds for rare words such as names, and lines without any
+    query term score 0.
+    """
+    PATH = data_constants.LEXICAL_INDEX
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, terms: np.ndarray, indptr: np.ndarray,
+                 lines: np.ndarray, counts: np.ndarray,
+                 lengths: np.ndarray, k1: float = data_constants.BM25_K1,
+                 b: float = data_constants.BM25_B) -> None:
+        """
+        Wrap an already built index.
+
+        :param terms: (num_terms,) sorted vocabulary.
+        :param indptr: (num_terms + 1,) start of each posting list.
+        :param lines: line of every posting, ascending within a list.
+        :param counts: times the term occurs in the line of every
+            posting.
+        :param lengths: (num_lines,) number of terms in each line.
+        :param k1: term frequency saturation.
+        :param b: line length normalisation, 0 (none) to 1 (full).
+        :raise ValueError: if the arrays do not match.
+
+        :return: None
+        """
+        if np.shape(indptr) != (len(terms) + 1,) or \
+                indptr[-1] != len(lines) or len(counts) != len(lines):
+            raise ValueError("indptr must bound every posting list")
+        if len(lines) and np.max(lines) >= len(lengths):
+            raise ValueError("postings must point at indexed lines")
+        self.terms = np.asarray(terms, dtype=str)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.lines = np.asarray(lines, dtype=np.int32)
+        self.counts = np.asarray(counts, dtype=np.float32)
+        self.lengths = np.asarray(lengths, dtype=np.int32)
+        self.params = (float(k1), float(b))
+        # Denominator term of every line: k1 * (1 - b + b * len / mean)
+        mean = max(float(self.lengths.mean()) if len(self.lengths) else 0,
+                   1.0)
+        self._norms = (k1 * (1 - b + b * self.lengths / mean)
+                       ).astype(np.float32)
+
+    @classmethod
+    def build(cls, dialogue: Iterable[str],
+              k1: float = data_constants.BM25_K1,
+              b: float = data_constants.BM25_B) -> 'BM25Index':
+        """
+        Tokenize every line and build the posting lists.
+
+        :param dialogue: iterable of strings, one per line, e.g. a
+            DialogueStore's lines.
+        :param k1: term frequency saturation.
+        :param b: line length normalisation.
+        :return: BM25Index over the lines.
+        """
+        # pylint:disable=import-outside-toplevel
+        from scipy.sparse import coo_matrix
+        tokens = [tokenize(str(line)) for line in dialogue]
+        lengths = np.fromiter(map(len, tokens), dtype=np.int32,
+                              count=len(tokens))
+        terms, term_ids = np.unique(
+            np.array([term for line in tokens for term in line], dtype=str),
+            return_inverse=True)
+        line_ids = np.repeat(np.arange(len(tokens)), lengths)
+        # Converting to CSR sums repeated terms into frequencies and
+        # sorts each posting list by line
+        matrix = coo_matrix(
+            (np.ones(len(term_ids), dtype=np.float32), (term_ids, line_ids)),
+            shape=(len(terms), len(tokens))).tocsr()
+        matrix.sort_indices()
+        return cls(terms, matrix.indptr, matrix.indices, matrix.data,
+                   lengths, k1, b)
+
+    @classmethod
+    def load(cls, num_lines: int, path: Optional[str] = None
+             ) -> 'BM25Index':
+        """
+        Load an index written by save.
+
+        :param num_lines: number of lines the index must cover.
+        :param path: path to the .npz file, defaults to PATH.
+        :raise FileNotFoundError: if the index has not been built.
+        :raise ValueError: if it was built over other lines.
+        :return: BM25Index
+        """
+        if path is None:
+            path = cls.PATH
+        with np.load(path) as data:
+            if len(data['lengths']) != num_lines:
+                raise ValueError("index was built over other lines")
+            return cls(data['terms'], data['indptr'], data['lines'],
+                       data['counts'], data['lengths'], *data['params'])
+
+    def save(self, path) -> None:
+        """
+        Store the vocabulary, posting lists and line lengths.
+
+        :param path: path or file object for the .npz file.
+        :return: None
+        """
+        np.savez(path, terms=self.terms, indptr=self.indptr,
+                 lines=self.lines, counts=self.counts, lengths=self.lengths,
+                 params=np.array(self.params))
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the index.
+        """
+        return int(self.terms.nbytes + self.indptr.nbytes +
+                   self.lines.nbytes + self.counts.nbytes +
+                   self.lengths.nbytes + self._norms.nbytes)
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the posting list of a term.
+
+        :param term: term as returned by tokenize.
+        :return: lines containing the term (ascending) and how often it
+            occurs in each; empty if unknown.
+        """
+        code = np.searchsorted(self.terms, term)
+        if code >= len(self.terms) or self.terms[code] != term:
+            return self.lines[:0], self.counts[:0]
+        span = slice(self.indptr[code], self.indptr[code + 1])
+        return self.lines[span], self.counts[span]
+
+    def match(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score the lines containing any query term with BM25, each
+        distinct term counted once.
+
+        :param query: search string.
+        :return: matching lines (ascending) and their scores.
+        """
+        postings = [self.postings(term)
+                    for term in sorted(set(tokenize(query)))]
+        postings = [(lines, counts) for lines, counts in postings
+                    if len(lines)]
+        if not postings:
+            return self.lines[:0], np.zeros(0, dtype=np.float32)
+        frequencies = np.array([len(lines) for lines, _ in postings])
+        idf = np.log1p((len(self) - frequencies + 0.5) /
+                       (frequencies + 0.5)).astype(np.float32)
+        lines = np.concatenate([lines for lines, _ in postings])
+        counts = np.concatenate([counts for _, counts in postings])
+        weights = np.repeat(idf, frequencies) * counts * \
+            (self.params[0] + 1) / (counts + self._norms[lines])
+        if len(postings) == 1:
+            return lines, weights.astype(np.float32)
+        if len(lines) > len(self) // 8:
+            # Common terms: summing over every line beats sorting
+            totals = np.bincount(lines, weights, minlength=len(self))
+            matched = np.flatnonzero(totals)
+            return matched, totals[matched].astype(np.float32)
+        matched, positions = np.unique(lines, return_inverse=True)
+        return matched, np.bincount(positions, weights).astype(np.float32)
+
+    def scores(self, query: str,
+               rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Get the BM25 score of the query for every line.
+
+        :param query: search string.
+        :param rows: sorted rows to score, or None to score every line.
+        :return: the score of each line (or of each of rows).
+        """
+        lines, line_scores = self.match(query)
+        scores = np.zeros(len(self), dtype=np.float32)
+        scores[lines] = line_scores
+        return scores if rows is None else scores[rows]
+
+    def search(self, query: str, k: Optional[int] = None,
+               rows: Optional[np.ndarray] = None
+               ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the best matching lines of a query.
+
+        :param query: search string.
+        :param k: number of lines to return, or None for every line
+            containing a query term.
+        :param rows: sorted rows eligible to be returned, or None.
+        :return: scores and lines, best first.
+        """
+        lines, scores = self.match(query)
+        if rows is not None:
+            eligible = np.isin(lines, rows, assume_unique=True)
+            lines, scores = lines[eligible], scores[eligible]
+        scores, best = top_k(scores, len(lines) if k is None else k)
+        return scores, lines[best]
+
+
+def fuse_scores(semantic: np.ndarray, lexical: np.ndarray,
+                weight: float = data_constants.HYBRID_WEIGHT) -> np.ndarray:
+    """
+    Fuse per-item semantic and lexical scores into one ranking score.
+    Each is scaled to [0, 1] over the items first (semantic scores by
+    their range, BM25 scores by their maximum), since cosine similarity
+    and BM25 have unrelated scales.
+
+    :param semantic: cosine-based score of each item, e.g. episode.
+    :param lexical: BM25-based score of the same items (0: no match).
+    :param weight: share of the lexical score, 0 to 1.
+    :raise ValueError: if the arrays differ in length or weight is
+        outside [0, 1].
+    :return: fused score of each item, higher is better.
+    """
+    semantic = np.asarray(semantic, dtype=np.float32).ravel()
+    lexical = np.asarray(lexical, dtype=np.float32).ravel()
+    if len(semantic) != len(lexical):
+        raise ValueError("semantic and lexical must score the same items")
+    if not 0 <= weight <= 1:
+        raise ValueError("weight must be between 0 and 1")
+    if semantic.size == 0:
+        return semantic
+    spread = float(semantic.max() - semantic.min())
+    semantic = (semantic - semantic.min()) / spread if spread > 0 else \
+        np.ones_like(semantic)
+    top = float(lexical.max())
+    lexical = lexical / top if top > 0 else np.zeros_like(lexical)
+    return (1 - weight) * semantic + weight * lexical
+
+
+def load_lexical_index(dialogue) -> BM25Index:
+    """
+    Get the BM25 index over the dialogue, loading the prebuilt index if
+    it exists and building it otherwise.
+
+    :param dialogue: DialogueStore of every line.
+    :return: BM25Index over its lines.
+    """
+    try:
+        return BM25Index.load(len(dialogue))
+    except (FileNotFoundError, ValueError):
+        # Missing, or stale from an older bundle
+        return BM25Index.build(dialogue[:])
@@ -0,0 +1,160 @@
+"""
+Process-wide, bounded cache of query embeddings, so reruns and sessions
+searching the same text share one encoder forward pass.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+from . import data_constants
+
+
+class QueryCache:
+    """
+    Class for a thread-safe LRU cache with an optional time to live,
+    counting hits and misses. Cached values are shared by every caller
+    and must be treated as read-only.
+    """
+
+    def __init__(self, max_size: int = data_constants.QUERY_CACHE_SIZE,
+                 ttl: Optional[float] = data_constants.QUERY_CACHE_TTL
+                 ) -> None:
+        """
+        Create an empty cache.
+
+        :param max_size: most entries kept; the least recently used is
+            evicted first.
+        :param ttl: seconds an entry stays valid, or None to keep
+            entries until evicted.
+        :raise ValueError: if max_size < 1 or ttl <= 0.
+
+        :return: None
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive or None")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # key -> (expiry time or None, value), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        """
+        Get a cached value, counting a hit or a miss.
+
+        :param key: cache key.
+        :return: the value, or None if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and \
+                    entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value) -> None:
+        """
+        Cache a value, evicting the least recently used entries if full.
+
+        :param key: cache key.
+        :param value: value to cache (not None).
+        :return: None
+        """
+        expiry = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expiry, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object]):
+        """
+        Get a cached value, computing and caching it on a miss.
+        The lock is not held while computing, so a slow computation
+        never blocks hits on other keys.
+
+        :param key: cache key.
+        :param compute: function of no arguments returning the value.
+        :return: the cached or newly computed value.
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """
+        Drop every entry and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    @property
+    def stats(self) -> dict:
+        """
+        Hits, misses, hit rate and number of entries.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'size': len(self._entries)}
+
+
+# Shared by every session in the process
+_QUERY_EMBEDDINGS = QueryCache()
+
+
+def get_query_cache() -> QueryCache:
+    """
+    Get the process-wide query embedding cache.
+
+    :return: QueryCache
+    """
+    return _QUERY_EMBEDDINGS
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalise a search string to its cache key: lower case with runs of
+    whitespace collapsed. MiniLM's tokenizer is uncased and ignores
+    whitespace, so both spellings encode to the same embedding.
+
+    :param query: search string.
+    :return: normalised string.
+    """
+    if not isinstance(query, str):
+        raise TypeError("query must be a string")
+    return ' '.join(query.lower().split())
+
+
+def encode_query(embedder, query: str):
+    """
+    Encode a search string as a tensor, reusing the process-wide cache.
+    Entries are keyed by the embedder too, so a reloaded model never
+    returns another model's embeddings.
+
+    :param embedder: SentenceTransformer (or an object with its encode).
+    :param query: search string.
+    :return: query embedding tensor, shared and read-only.
+    """
+    text = normalize_query(query)
+    return _QUERY_EMBEDDINGS.get_or_compute(
+        (embedder, text),
+        lambda: embedder.encode(text, convert_to_tensor=True))
@@ -4,9 +4,6 @@ Code for recommending new episodes.
 from typing import List, Union
 import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.preprocessing import MinMaxScaler
 from . import data_manager
 
 
@@ -16,7 +13,8 @@ class Recommender:
     """
 
     def __init__(self, meta: pd.DataFrame, scripts: pd.DataFrame,
-                 weights: Union[None, List[float]] = None) -> None:
+                 weights: Union[None, List[float]] = None,
+                 model=None) -> None:
         """
         Initialize recommender with model, data, and feature vectors.
         Note: Takes 1 MIN to initialize
@@ -29,6 +27,9 @@ class Recommender:
         :param weights: list of floats, relative importance of
             [dialogues, keywords, first summary, average rating,
             numVotes, emotions, number of lines].
+        :param model: SentenceTransformer to encode with, e.g. the
+            process-wide resources.get_encoder(); loads its own
+            all-MiniLM-L6-v2 if None.
 
         :return: None
         """
@@ -50,10 +51,15 @@ class Recommender:
             raise ValueError(f"Argument 'scripts' must contain columns: "
                              f"{', '.join(required_columns)}")
 
+        if model is None:
+            # Imported here so importing the module does not load torch
+            # pylint:disable=import-outside-toplevel
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(
+                'sentence-transformers/all-MiniLM-L6-v2')
         self.meta = meta
         self.scripts = scripts
-        self.model = SentenceTransformer(
-            'sentence-transformers/all-MiniLM-L6-v2')
+        self.model = model
         self.default = weights if weights else [1, 1, 0.8, 0.5, 0.2, 0.2, 0.4]
         self.weights = self.default
         self.vector_list = self._generate_vectors()
@@ -91,10 +97,13 @@ class Recommender:
 
         :return: np.array of weighted feature vectors
         """
+        # pylint:disable=import-outside-toplevel
+        from sklearn.preprocessing import MinMaxScaler
         # each dialog_vector is a unit_norm     31s
         # average feature min, max is -0.11, 0.11
         dialog_vectors = self.model.encode(
-            self.scripts.groupby(by='SEID')['Dialogue'].apply('\n'.join))
+            self.scripts.groupby(by='SEID', observed=True)[
+                'Dialogue'].apply('\n'.join))
 
         # each keyword_vector is a unit_norm    9s
         # average feature min, max is -0.12, 0.12
@@ -115,7 +124,7 @@ class Recommender:
             self.meta.numVotes.values.reshape(-1, 1)) - 0.5) / 5
 
         # scale emotions to -0.1, 0.1
-        emotions = self.scripts.groupby(by='SEID')[
+        emotions = self.scripts.groupby(by='SEID', observed=True)[
             ['Happy', 'Angry',
              'Surprise', 'Sad', 'Fear']].apply(np.mean, axis=0).values
         emotions = (MinMaxScaler().fit_transform(emotions) - 0.5) / 5
@@ -127,9 +136,10 @@ class Recommender:
         track_chars.remove("SETTING")
         track_chars.remove("MAN")
         track_chars.remove("WOMAN")
-        char_counts = pd.DataFrame(data_manager.get_line_counts_per_episode(
-            self.scripts, track_chars)).values
-        char_counts = (MinMaxScaler().fit_transform(char_counts) - 0.5) / 5
+        char_counts, _, _ = data_manager.count_matrix(
+            self.scripts, track_chars, by='SEID')
+        char_counts = (MinMaxScaler().fit_transform(
+            char_counts.T.astype(float)) - 0.5) / 5
 
         # scale weights
         all_features = [dialog_vectors, keyword_vectors, summary_vectors,
@@ -158,6 +168,8 @@ class Recommender:
             raise ValueError(
                 "One or more episode titles not found in metadata.csv")
 
+        # pylint:disable=import-outside-toplevel
+        from sklearn.metrics.pairwise import cosine_similarity
         ids, query_vector = self._create_query_vector(title_list)
         scores = -cosine_similarity(query_vector, self.vectors)
         ranked_ids = list(scores.mean(axis=0).argsort())
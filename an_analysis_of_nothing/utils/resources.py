@@ -0,0 +1,170 @@
+"""
+Process-wide cache of the expensive resources every session uses: the
+sentence encoder, the recommender, the query corpus and the BM25 index.
+Each is loaded once per process, keyed by model name and data version.
+"""
+import threading
+import time
+from typing import Callable, Hashable, Optional
+
+from . import data_constants
+from .encoder_backends import load_encoder
+from .lexical_index import BM25Index, load_lexical_index
+from .recommender import Recommender
+
+
+class ResourceCache:
+    """
+    Class to load each resource once and hand the same object to every
+    caller. Loads are thread-safe: concurrent callers of one key wait
+    for a single load, while other keys load in parallel. Resources
+    loaded for a data version replace those of older versions under the
+    same name; sessions holding the old objects keep using them.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create an empty cache.
+
+        :return: None
+        """
+        # (name, version) -> resource
+        self._resources = {}
+        # (name, version) -> lock held while it loads
+        self._loading = {}
+        self._lock = threading.Lock()
+        # name -> {'loads', 'hits', 'load_seconds', 'last_load_seconds'}
+        self._metrics = {}
+
+    def get(self, name: Hashable, loader: Callable[[], object],
+            version: Optional[str] = None):
+        """
+        Get a resource, loading it on first use.
+
+        :param name: what the resource is, e.g. ('encoder', model name).
+        :param loader: function of no arguments returning the resource.
+        :param version: data version it is loaded from, or None if it
+            does not depend on the data.
+        :return: the shared resource.
+        """
+        key = (name, version)
+        with self._lock:
+            metrics = self._metrics.setdefault(
+                name, {'loads': 0, 'hits': 0, 'load_seconds': 0.0,
+                       'last_load_seconds': 0.0})
+            if key in self._resources:
+                metrics['hits'] += 1
+                return self._resources[key]
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            with self._lock:
+                if key in self._resources:
+                    metrics['hits'] += 1
+                    return self._resources[key]
+            start = time.perf_counter()
+            resource = loader()
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                for old in [old for old in self._resources
+                            if old[0] == name and old[1] != version]:
+                    del self._resources[old]
+                self._resources[key] = resource
+                self._loading.pop(key, None)
+                metrics['loads'] += 1
+                metrics['load_seconds'] += elapsed
+                metrics['last_load_seconds'] = elapsed
+        return resource
+
+    def clear(self) -> None:
+        """
+        Forget every resource and metric, so the next get reloads.
+        """
+        with self._lock:
+            self._resources.clear()
+            self._metrics.clear()
+
+    @property
+    def stats(self) -> dict:
+        """
+        Loads, hits, total and last load seconds per resource name.
+        """
+        with self._lock:
+            return {name: dict(metrics)
+                    for name, metrics in self._metrics.items()}
+
+
+_RESOURCES = ResourceCache()
+
+
+def get_resources() -> ResourceCache:
+    """
+    Get the process-wide resource cache.
+
+    :return: ResourceCache
+    """
+    return _RESOURCES
+
+
+def get_encoder(model_name: str = data_constants.ENCODER_MODEL,
+                backend: Optional[str] = None):
+    """
+    Get the process-wide SentenceTransformer for a model and backend.
+
+    :param model_name: SentenceTransformer model name.
+    :param backend: one of encoder_backends.ENCODER_BACKENDS, or None
+        for data_constants.ENCODER_BACKEND.
+    :return: SentenceTransformer
+    """
+    backend = backend or data_constants.ENCODER_BACKEND
+    return _RESOURCES.get(('encoder', model_name, backend),
+                          lambda: load_encoder(model_name, backend))
+
+
+def get_recommender(dataset,
+                    model_name: str = data_constants.ENCODER_MODEL):
+    """
+    Get the process-wide Recommender for a dataset's version, built
+    with the shared encoder of data_constants.ENCODER_BACKEND. It must
+    be treated as read-only.
+
+    :param dataset: SharedDataset to recommend from.
+    :param model_name: SentenceTransformer model name.
+    :return: Recommender
+    """
+    return _RESOURCES.get(
+        ('recommender', model_name, data_constants.ENCODER_BACKEND),
+        lambda: Recommender(dataset.meta, dataset.scripts,
+                            model=get_encoder(model_name)),
+        dataset.version)
+
+
+def get_query_corpus(dataset, storage: str = 'float32',
+                     model_name: str = data_constants.ENCODER_MODEL):
+    """
+    Get the process-wide episode querying corpus for a dataset's
+    version, as returned by episode_query.load_corpus.
+
+    :param dataset: SharedDataset to search.
+    :param storage: embedding storage, see episode_query.load_corpus.
+    :param model_name: SentenceTransformer model name.
+    :return: DialogueStore, embeddings (tensor or index) and the
+        shared BatchEncoder.
+    """
+    # episode_query imports this module through batch_encoder
+    # pylint:disable=import-outside-toplevel,cyclic-import
+    from .episode_query import load_corpus
+    return _RESOURCES.get(
+        ('query', model_name, storage),
+        lambda: load_corpus(dataset.scripts, dataset, storage, model_name),
+        dataset.version)
+
+
+def get_lexical_index(dataset) -> BM25Index:
+    """
+    Get the process-wide BM25 index over a dataset version's dialogue.
+
+    :param dataset: SharedDataset to search.
+    :return: BM25Index
+    """
+    return _RESOURCES.get('lexical', lambda: load_lexical_index(
+        dataset.dialogue), dataset.version)
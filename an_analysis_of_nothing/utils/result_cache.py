@@ -0,0 +1,221 @@
+"""
+Persistent cache of filtered episode searches in a local SQLite file,
+shared by every worker process and kept across restarts.
+"""
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Callable, Optional
+
+from . import data_constants
+from .query_cache import normalize_query
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    created REAL NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_created ON results (created);
+"""
+
+
+class ResultCache:
+    """
+    Class for a key -> pickled value cache in SQLite. Every entry is
+    tagged with the data version it was computed from; entries of other
+    versions are deleted the first time a new version is stored, so a
+    new data bundle never serves old results. Only this app writes the
+    file, so its values are trusted when unpickled.
+    """
+    _created = set()
+    _created_lock = threading.Lock()
+
+    def __init__(self, path: str = data_constants.RESULT_CACHE,
+                 max_entries: int = data_constants.RESULT_CACHE_SIZE
+                 ) -> None:
+        """
+        Open (creating if needed) the cache file.
+
+        :param path: path to the SQLite file.
+        :param max_entries: most entries kept; the oldest are evicted.
+        :raise ValueError: if max_entries < 1.
+
+        :return: None
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Private method to open a connection, creating the schema once
+        per process. Connections are short-lived so any thread or
+        process can use the cache.
+
+        :return: sqlite3 connection in autocommit mode.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10,
+                                     isolation_level=None)
+        if self.path not in self._created:
+            with self._created_lock:
+                # WAL lets readers in other processes run during writes
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript(_SCHEMA)
+                self._created.add(self.path)
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def get(self, key: str):
+        """
+        Get a cached value, counting a hit or a miss.
+
+        :param key: cache key, e.g. from search_key.
+        :return: the unpickled value, or None if missing.
+        """
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                'SELECT value FROM results WHERE key = ?',
+                (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, key: str, version: str, value) -> None:
+        """
+        Store a value, deleting entries of other data versions the
+        first time this process stores one for version, and the oldest
+        entries beyond max_entries.
+
+        :param key: cache key.
+        :param version: data version the value was computed from.
+        :param value: picklable value (not None).
+        :return: None
+        """
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                if version != self._version:
+                    connection.execute(
+                        'DELETE FROM results WHERE version != ?',
+                        (version,))
+                connection.execute(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                    (key, version, time.time(), blob))
+                connection.execute(
+                    'DELETE FROM results WHERE key IN (SELECT key FROM '
+                    'results ORDER BY created DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,))
+                connection.execute('COMMIT')
+            except sqlite3.Error:
+                connection.execute('ROLLBACK')
+                raise
+        self._version = version
+
+    def get_or_compute(self, key: Optional[str], version: Optional[str],
+                       compute: Callable[[], object]):
+        """
+        Get a cached value, computing and storing it on a miss. Values
+        without a key or data version are computed and not stored.
+
+        :param key: cache key, or None to skip the cache.
+        :param version: data version the value is computed from.
+        :param compute: function of no arguments returning the value.
+        :return: the cached or newly computed value.
+        """
+        if key is None or version is None:
+            return compute()
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, version, value)
+        return value
+
+    def clear(self) -> None:
+        """
+        Delete every entry and reset the counters.
+        """
+        with closing(self._connect()) as connection:
+            connection.execute('DELETE FROM results')
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as connection:
+            return connection.execute(
+                'SELECT COUNT(*) FROM results').fetchone()[0]
+
+    @property
+    def stats(self) -> dict:
+        """
+        Hits, misses and hit rate of this process, and the number of
+        entries in the file.
+        """
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {'hits': hits, 'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses
+                else 0.0, 'size': len(self)}
+
+
+_RESULTS = None
+_RESULTS_LOCK = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Get the process-wide result cache over data_constants.RESULT_CACHE,
+    opening it on first use.
+
+    :return: ResultCache
+    """
+    global _RESULTS  # pylint: disable=global-statement
+    if _RESULTS is None:
+        with _RESULTS_LOCK:
+            if _RESULTS is None:
+                _RESULTS = ResultCache()
+    return _RESULTS
+
+
+def search_key(search_string: str, season_choice, rating_choice,
+               char_choice, version: Optional[str]) -> Optional[str]:
+    """
+    Get the cache key of a filter_search_results call. Seasons and
+    characters are sorted since their order does not change the result;
+    None and an empty selection are kept apart since they do.
+
+    :param search_string: the search string, normalised like queries.
+    :param season_choice: list of seasons or None.
+    :param rating_choice: (low, high) ratings or None.
+    :param char_choice: list of characters or None.
+    :param version: data version of the searched frames, see
+        data_manager.get_data_version.
+    :return: JSON key, or None if version is None (no data files to
+        invalidate entries by, so nothing is cached).
+    """
+    if version is None:
+        return None
+    return json.dumps([
+        normalize_query(search_string),
+        None if season_choice is None else sorted(map(int, season_choice)),
+        None if rating_choice is None else list(map(float, rating_choice)),
+        None if char_choice is None else sorted(map(str, char_choice)),
+        data_constants.EMBEDDING_STORAGE, data_constants.ENCODER_BACKEND,
+        data_constants.SEARCH_MODE, version])
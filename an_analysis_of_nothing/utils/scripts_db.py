@@ -0,0 +1,133 @@
+"""
+SQLite copy of the scripts and metadata with an FTS5 full-text index
+over the dialogue, for quote and phrase searches that every worker
+process runs straight from the file.
+"""
+import json
+import os
+import sqlite3
+from contextlib import closing
+from typing import Iterable, Optional, Tuple
+import pandas as pd
+
+from . import data_constants
+
+# Full-text index over the dialogue; the other columns are stored for
+# filtering and display, not tokenised. rowid is the scripts row.
+_SCHEMA = """
+CREATE INDEX scripts_seid ON scripts (SEID);
+CREATE INDEX metadata_seid ON metadata (SEID);
+CREATE VIRTUAL TABLE dialogue_fts USING fts5(
+    Dialogue, SEID UNINDEXED, Character UNINDEXED, Season UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+INSERT INTO dialogue_fts (rowid, Dialogue, SEID, Character, Season)
+    SELECT line, Dialogue, SEID, Character, CAST(Season AS INTEGER)
+    FROM scripts;
+INSERT INTO dialogue_fts (dialogue_fts) VALUES ('optimize');
+"""
+# Lines shown per search unless asked otherwise
+QUOTE_LIMIT = 50
+
+
+def write_scripts_db(meta: pd.DataFrame, scripts: pd.DataFrame,
+                     path: str = data_constants.SCRIPTS_DB) -> str:
+    """
+    Write the scripts and metadata tables and the dialogue index. The
+    database is built under a temporary name and moved into place, so
+    searches running against the old file are unaffected.
+
+    :param meta: metadata DataFrame; list columns are stored as JSON.
+    :param scripts: scripts DataFrame with 'Dialogue', 'SEID',
+        'Character' and 'Season' columns.
+    :param path: path to the SQLite file.
+    :return: path to the written database.
+    """
+    if not isinstance(meta, pd.DataFrame):
+        raise TypeError("meta must be a pandas DataFrame")
+    if not isinstance(scripts, pd.DataFrame):
+        raise TypeError("scripts must be a pandas DataFrame")
+    meta = meta.copy()
+    for col in data_constants.LIST_COLUMNS:
+        if col in meta.columns:
+            meta[col] = meta[col].apply(
+                lambda value: value if isinstance(value, str)
+                else json.dumps(list(value)))
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    with closing(sqlite3.connect(tmp_path)) as connection:
+        meta.to_sql('metadata', connection, index=False)
+        # Categorical columns are written as their labels
+        scripts.reset_index(drop=True).astype(
+            {col: str for col in data_constants.SCRIPTS_CATEGORIES
+             if col in scripts.columns}).to_sql(
+            'scripts', connection, index=True, index_label='line')
+        connection.executescript(_SCHEMA)
+        connection.commit()
+    os.replace(tmp_path, path)
+    return path
+
+
+def phrase_query(text: str) -> str:
+    """
+    Turn a quote into an FTS5 phrase query: its words in order, with
+    FTS5 syntax characters taken literally.
+
+    :param text: quote or search string.
+    :raise ValueError: if text has no words.
+    :return: FTS5 MATCH expression.
+    """
+    if not isinstance(text, str):
+        raise TypeError("text must be a string")
+    if not any(char.isalnum() for char in text):
+        raise ValueError("text must contain a word")
+    return '"' + text.replace('"', '""') + '"'
+
+
+def find_quotes(quote: str, seasons: Optional[Iterable[int]] = None,
+                ratings: Optional[Tuple[float, float]] = None,
+                characters: Optional[Iterable[str]] = None,
+                limit: int = QUOTE_LIMIT,
+                path: str = data_constants.SCRIPTS_DB) -> pd.DataFrame:
+    """
+    Find the lines containing a phrase, best BM25 match first, with the
+    season, rating and character filters applied in the query.
+
+    :param quote: phrase to find, e.g. 'serenity now'.
+    :param seasons: seasons to search, or None for all.
+    :param ratings: (low, high) episode rating range, or None.
+    :param characters: characters whose lines are searched, or None.
+    :param limit: most lines returned.
+    :param path: path to the SQLite file.
+    :raise FileNotFoundError: if the database has not been built.
+    :return: DataFrame with the scripts row ('line'), 'SEID', 'Title',
+        'Season', 'Character' and 'Dialogue' of each matching line.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} has not been built")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    sql = ['SELECT rowid AS line, SEID, (SELECT Title FROM metadata m '
+           'WHERE m.SEID = dialogue_fts.SEID LIMIT 1) AS Title, Season, '
+           'Character, Dialogue FROM dialogue_fts WHERE dialogue_fts MATCH ?']
+    params = [phrase_query(quote)]
+    if seasons is not None:
+        seasons = [int(season) for season in seasons]
+        sql.append(f"AND Season IN ({', '.join('?' * len(seasons))})")
+        params += seasons
+    if characters is not None:
+        characters = [str(character) for character in characters]
+        sql.append(f"AND Character IN ({', '.join('?' * len(characters))})")
+        params += characters
+    if ratings is not None:
+        sql.append('AND SEID IN (SELECT SEID FROM metadata '
+                   'WHERE averageRating BETWEEN ? AND ?)')
+        params += [float(ratings[0]), float(ratings[1])]
+    sql.append('ORDER BY rank LIMIT ?')
+    params.append(int(limit))
+    # Read-only, so a rebuild in progress never sees a writer here
+    with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True,
+                                 timeout=10)) as connection:
+        return pd.read_sql_query(' '.join(sql), connection, params=params)
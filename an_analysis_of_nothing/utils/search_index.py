@@ -0,0 +1,563 @@
+"""
+Indexes over the dialogue embeddings that only score the lines near the
+query: an inverted-file (k-means) index and per-episode centroids.
+Also the dispatch from a storage name to the index or compact copy
+episode querying searches.
+"""
+from typing import Optional, Tuple
+import numpy as np
+
+from . import data_constants
+from .vector_search import PCA_DIMS, STORAGE_DTYPES, QuantizedEmbeddings, \
+    load_binary, load_quantized, load_reduced, quantize_int8, rerank, top_k
+
+# Storage options for episode querying besides the float32 tensor
+SEARCH_STORAGES = STORAGE_DTYPES + ('ivf', 'episodes', 'binary') + \
+    tuple(f"pca{dims}" for dims in PCA_DIMS)
+# Rows converted to float32 per step
+_BLOCK_ROWS = 8192
+
+
+class IVFIndex:
+    """
+    Class for an inverted-file index over an embedding matrix: k-means
+    centroids (the coarse quantiser) and the lines assigned to each
+    centroid, stored contiguously per list as int8 codes. A query scores
+    the centroids, then only the codes in the nprobe closest lists, and
+    re-ranks the best of those against the full matrix, so its cost
+    grows with nprobe rather than with the number of lines.
+    """
+    NPROBE = data_constants.IVF_NPROBE
+    PATH = data_constants.IVF_INDEX
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray,
+                 rows: np.ndarray, lists: QuantizedEmbeddings,
+                 full: np.ndarray) -> None:
+        """
+        Wrap an already built index.
+
+        :param centroids: (num_lists, dim) unit-norm float32 centroids.
+        :param offsets: (num_lists + 1,) start of each list in rows.
+        :param rows: (num_lines,) line rows, grouped by list.
+        :param lists: int8 QuantizedEmbeddings of the lines in the
+            order of rows (without a full matrix).
+        :param full: (num_lines, dim) embeddings the index is over,
+            e.g. the memory-mapped store, used for re-ranking.
+        :raise ValueError: if the shapes do not match.
+
+        :return: None
+        """
+        if not isinstance(centroids, np.ndarray) or centroids.ndim != 2:
+            raise TypeError("centroids must be a 2D numpy array")
+        if not isinstance(lists, QuantizedEmbeddings):
+            raise TypeError("lists must be QuantizedEmbeddings")
+        if np.shape(offsets) != (len(centroids) + 1,) or \
+                offsets[-1] != len(rows) or len(lists) != len(rows):
+            raise ValueError("offsets must bound every inverted list")
+        if np.ndim(full) != 2 or np.shape(full) != (len(rows),
+                                                    centroids.shape[1]):
+            raise ValueError("full must have one row per indexed line")
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.lists = lists
+        self.full = full
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, num_lists: Optional[int] = None,
+              iterations: int = 10, seed: int = 0) -> 'IVFIndex':
+        """
+        Cluster the embeddings with spherical k-means (cosine), trained
+        on a sample of up to 256 lines per list, then assign every line.
+
+        :param embeddings: (num_lines, dim) float32 array or memmap.
+        :param num_lists: number of inverted lists, defaults to
+            sqrt(num_lines).
+        :param iterations: k-means iterations.
+        :param seed: random seed for the sample and initial centroids.
+        :return: IVFIndex over embeddings.
+        """
+        full = embeddings
+        if num_lists is None:
+            num_lists = max(1, int(np.sqrt(len(full))))
+        num_lists = min(num_lists, len(full))
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(len(full), min(len(full),
+                                                   256 * num_lists),
+                                    replace=False))
+        centroids = _kmeans(_normalize(full[sample]), num_lists,
+                            iterations, rng)
+        labels = _assign(full, centroids)
+        offsets = np.zeros(num_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=num_lists),
+                  out=offsets[1:])
+        rows = np.argsort(labels, kind='stable')
+        codes, scale = quantize_int8(full, rows)
+        return cls(centroids, offsets, rows,
+                   QuantizedEmbeddings(codes, scale), full)
+
+    @classmethod
+    def load(cls, full: np.ndarray,
+             path: Optional[str] = None) -> 'IVFIndex':
+        """
+        Load an index written by save.
+
+        :param full: embeddings the index was built over.
+        :param path: path to the .npz file, defaults to PATH.
+        :raise FileNotFoundError: if the index has not been built.
+        :raise ValueError: if it was built over other embeddings.
+        :return: IVFIndex
+        """
+        if path is None:
+            path = cls.PATH
+        with np.load(path) as data:
+            lists = QuantizedEmbeddings(data['codes'], data['scale'])
+            index = cls(data['centroids'], data['offsets'], data['rows'],
+                        lists, full)
+        # Same shape is not enough: the lists must encode these lines
+        lists.check_built_over(full, index.rows)
+        return index
+
+    def save(self, path) -> None:
+        """
+        Store the centroids and inverted lists (not the embeddings).
+
+        :param path: path or file object for the .npz file.
+        :return: None
+        """
+        np.savez(path, centroids=self.centroids, offsets=self.offsets,
+                 rows=self.rows, codes=self.lists.codes,
+                 scale=self.lists.scale)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the index (excluding the full embeddings).
+        """
+        return int(self.centroids.nbytes + self.offsets.nbytes +
+                   self.rows.nbytes + self.lists.nbytes)
+
+    @property
+    def num_probes(self) -> int:
+        """
+        Largest useful nprobe: probing this many scans every line.
+        """
+        return len(self.centroids)
+
+    def probe(self, query: np.ndarray, nprobe: int,
+              rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Get the positions (in list order) of the lines in the nprobe
+        inverted lists closest to the query. With rows given, lists
+        holding none of them are never probed.
+
+        :param query: (dim,) query embedding.
+        :param nprobe: number of lists to scan.
+        :param rows: optional sorted line rows to keep; others are
+            dropped.
+        :return: sorted positions; self.rows maps them to line rows.
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        eligible = None if rows is None else np.isin(self.rows, rows)
+        # Lists in storage order so the codes are read front to back
+        probed = np.sort(self._probed_lists(query, nprobe, eligible))
+        starts = self.offsets[probed]
+        lengths = self.offsets[probed + 1] - starts
+        within = np.arange(lengths.sum()) - \
+            np.repeat(np.cumsum(lengths) - lengths, lengths)
+        positions = np.repeat(starts, lengths) + within
+        if eligible is not None:
+            positions = positions[eligible[positions]]
+        return positions
+
+    def search(self, query: np.ndarray, k: int = 500,
+               nprobe: Optional[int] = None,
+               rows: Optional[np.ndarray] = None
+               ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the k lines most similar to the query among the probed
+        lists: the 2k best by int8 score are re-ranked exactly. If the
+        probed lists hold fewer than k (eligible) lines, twice as many
+        are probed until they do or every list is scanned.
+
+        :param query: (dim,) query embedding.
+        :param k: number of results.
+        :param nprobe: number of lists to scan; the recall/latency knob.
+            Defaults to NPROBE.
+        :param rows: optional sorted row indices to search within.
+        :return: exact cosine scores and line indices of up to k
+            lines, best first.
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        if nprobe is None:
+            nprobe = self.NPROBE
+        while True:
+            positions = self.probe(query, nprobe, rows)
+            if len(positions) >= k or nprobe >= self.num_probes:
+                break
+            nprobe *= 2
+        _, best = top_k(self.lists.approximate_scores(query, positions),
+                        2 * k)
+        return rerank(self.full, self.rows[positions[best]], query, k)
+
+    def _probed_lists(self, query: np.ndarray, nprobe: int,
+                      eligible: Optional[np.ndarray] = None
+                      ) -> np.ndarray:
+        """
+        Private method to get the nprobe lists closest to the query.
+
+        :param query: (dim,) float32 query embedding.
+        :param nprobe: number of lists.
+        :param eligible: optional (num_lines,) boolean mask in list
+            order.
+        :return: list indices, closest first.
+        """
+        scores = self._list_scores(query, eligible)
+        return top_k(scores, min(nprobe, int(np.isfinite(scores).sum())))[1]
+
+    def _list_scores(self, query: np.ndarray,
+                     eligible: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Private method to score the lists by centroid similarity; -inf
+        for lists without eligible lines.
+
+        :param query: (dim,) float32 query embedding.
+        :param eligible: optional (num_lines,) boolean mask in list
+            order.
+        :return: (num_lists,) float32 scores.
+        """
+        scores = self.centroids @ query
+        if eligible is not None:
+            counts = np.zeros(len(eligible) + 1, dtype=np.int64)
+            np.cumsum(eligible, out=counts[1:])
+            scores[counts[self.offsets[1:]] ==
+                   counts[self.offsets[:-1]]] = -np.inf
+        return scores
+
+
+class EpisodeIndex(IVFIndex):
+    """
+    Class for a centroid-first index: every inverted list holds a
+    contiguous run of one episode's lines, and its centroid is the
+    normalised mean of their embeddings. A query ranks the episodes by
+    their best centroid and only scores the lines of the nprobe best
+    episodes, so nprobe counts episodes rather than lists.
+    """
+    NPROBE = data_constants.EPISODE_NPROBE
+    PATH = data_constants.EPISODE_INDEX
+
+    # build and load also need the SEID of every line
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    # pylint: disable=arguments-differ,arguments-renamed
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray,
+                 rows: np.ndarray, lists: QuantizedEmbeddings,
+                 full: np.ndarray, episodes: np.ndarray) -> None:
+        """
+        Wrap an already built index.
+
+        :param centroids: (num_lists, dim) unit-norm float32 centroids.
+        :param offsets: (num_lists + 1,) start of each list in rows.
+        :param rows: (num_lines,) line rows, grouped by list.
+        :param lists: int8 QuantizedEmbeddings of the lines in the
+            order of rows (without a full matrix).
+        :param full: (num_lines, dim) embeddings the index is over.
+        :param episodes: (num_lists,) SEID code of each list, sorted so
+            the lists of an episode are adjacent.
+        :raise ValueError: if the shapes do not match.
+
+        :return: None
+        """
+        super().__init__(centroids, offsets, rows, lists, full)
+        episodes = np.asarray(episodes, dtype=np.int64)
+        if episodes.shape != (len(self.centroids),) or \
+                np.any(np.diff(episodes) < 0):
+            raise ValueError("episodes must be the sorted SEID code of "
+                             "every list")
+        self.episodes = episodes
+        # First list of each episode
+        self._starts = np.flatnonzero(np.diff(episodes, prepend=-1))
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, seids: np.ndarray,
+              segments: int = data_constants.EPISODE_SEGMENTS
+              ) -> 'EpisodeIndex':
+        """
+        Split every episode's lines into up to segments contiguous runs
+        (in script order) and average each run into a centroid, a block
+        of lines at a time.
+
+        :param embeddings: (num_lines, dim) float32 array or memmap.
+        :param seids: (num_lines,) SEID code of each line, e.g.
+            DialogueStore.seid_codes.
+        :param segments: centroids per episode.
+        :raise ValueError: if seids does not have one entry per line or
+            segments < 1.
+        :return: EpisodeIndex over embeddings.
+        """
+        seids = np.asarray(seids, dtype=np.int64).ravel()
+        if len(seids) != len(embeddings):
+            raise ValueError("seids must have one entry per line")
+        if segments < 1:
+            raise ValueError("segments must be at least 1")
+        rows, episodes, labels = _episode_runs(seids, segments)
+
+        sums = np.zeros((len(episodes), embeddings.shape[1]),
+                        dtype=np.float64)
+        for start in range(0, len(rows), _BLOCK_ROWS):
+            present, first = np.unique(labels[start:start + _BLOCK_ROWS],
+                                       return_index=True)
+            sums[present] += np.add.reduceat(
+                np.asarray(embeddings[rows[start:start + _BLOCK_ROWS]],
+                           dtype=np.float64), first)
+        offsets = np.zeros(len(sums) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=len(sums)),
+                  out=offsets[1:])
+        codes, scale = quantize_int8(embeddings, rows)
+        return cls(_normalize(sums), offsets, rows,
+                   QuantizedEmbeddings(codes, scale), embeddings, episodes)
+
+    @classmethod
+    def load(cls, full: np.ndarray, seids: np.ndarray,
+             path: Optional[str] = None) -> 'EpisodeIndex':
+        """
+        Load an index written by save.
+
+        :param full: embeddings the index was built over.
+        :param seids: (num_lines,) SEID code of each line.
+        :param path: path to the .npz file, defaults to PATH.
+        :raise FileNotFoundError: if the index has not been built.
+        :raise ValueError: if it was built over other embeddings or
+            episodes.
+        :return: EpisodeIndex
+        """
+        if path is None:
+            path = cls.PATH
+        with np.load(path) as data:
+            index = cls(data['centroids'], data['offsets'], data['rows'],
+                        QuantizedEmbeddings(data['codes'], data['scale']),
+                        full, data['episodes'])
+        index.lists.check_built_over(full, index.rows)
+        if np.shape(seids) != (len(index),) or not np.array_equal(
+                np.asarray(seids)[index.rows],
+                np.repeat(index.episodes, np.diff(index.offsets))):
+            raise ValueError("index was built over other episodes")
+        return index
+
+    def save(self, path) -> None:
+        """
+        Store the centroids, episodes and lists (not the embeddings).
+
+        :param path: path or file object for the .npz file.
+        :return: None
+        """
+        np.savez(path, centroids=self.centroids, offsets=self.offsets,
+                 rows=self.rows, codes=self.lists.codes,
+                 scale=self.lists.scale, episodes=self.episodes)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the index (excluding the full embeddings).
+        """
+        return super().nbytes + int(self.episodes.nbytes +
+                                    self._starts.nbytes)
+
+    @property
+    def num_probes(self) -> int:
+        """
+        Largest useful nprobe: the number of episodes.
+        """
+        return len(self._starts)
+
+    def top_episodes(self, query: np.ndarray, num_episodes: int,
+                     rows: Optional[np.ndarray] = None
+                     ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rank episodes by their best centroid, without scoring any lines.
+
+        :param query: (dim,) query embedding.
+        :param num_episodes: number of episodes.
+        :param rows: optional sorted line rows; episodes without any
+            are skipped.
+        :return: centroid scores and SEID codes of up to num_episodes
+            episodes, best first.
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        best = self._episode_scores(query, None if rows is None else
+                                    np.isin(self.rows, rows))
+        scores, chosen = top_k(best, min(num_episodes,
+                                         int(np.isfinite(best).sum())))
+        return scores, self.episodes[self._starts[chosen]]
+
+    def _episode_scores(self, query: np.ndarray,
+                        eligible: Optional[np.ndarray] = None
+                        ) -> np.ndarray:
+        """
+        Private method to score each episode by its best centroid.
+
+        :param query: (dim,) float32 query embedding.
+        :param eligible: optional (num_lines,) boolean mask in list
+            order.
+        :return: (num_episodes,) scores, -inf for episodes without
+            eligible lines.
+        """
+        return np.maximum.reduceat(self._list_scores(query, eligible),
+                                   self._starts)
+
+    def _probed_lists(self, query: np.ndarray, nprobe: int,
+                      eligible: Optional[np.ndarray] = None
+                      ) -> np.ndarray:
+        """
+        Private method to get every list of the nprobe episodes with
+        the best centroids.
+        """
+        best = self._episode_scores(query, eligible)
+        _, chosen = top_k(best, min(nprobe, int(np.isfinite(best).sum())))
+        lengths = np.diff(np.append(self._starts, len(self.episodes)))
+        return np.flatnonzero(np.isin(
+            np.repeat(np.arange(len(self._starts)), lengths), chosen))
+
+
+def load_ivf(full: np.ndarray) -> IVFIndex:
+    """
+    Get the inverted-file index over the dialogue embeddings, loading
+    the prebuilt index if it exists and building it otherwise.
+
+    :param full: (num_lines, dim) full-precision embeddings.
+    :return: IVFIndex over full.
+    """
+    full = np.asarray(full)
+    try:
+        return IVFIndex.load(full)
+    except FileNotFoundError:
+        return IVFIndex.build(full)
+    except ValueError:
+        # Stale index from an older bundle
+        return IVFIndex.build(full)
+
+
+def load_episode_index(full: np.ndarray,
+                       seids: np.ndarray) -> EpisodeIndex:
+    """
+    Get the episode centroid index over the dialogue embeddings, loading
+    the prebuilt index if it exists and building it otherwise.
+
+    :param full: (num_lines, dim) full-precision embeddings.
+    :param seids: (num_lines,) SEID code of each line.
+    :return: EpisodeIndex over full.
+    """
+    full = np.asarray(full)
+    try:
+        return EpisodeIndex.load(full, seids)
+    except (FileNotFoundError, ValueError):
+        # Missing, or stale from an older bundle
+        return EpisodeIndex.build(full, seids)
+
+
+def load_search_index(storage: str, full: np.ndarray,
+                      seids: Optional[np.ndarray] = None):
+    """
+    Get the compact copy or index of the dialogue embeddings that
+    episode querying scores queries against.
+
+    :param storage: one of SEARCH_STORAGES.
+    :param full: (num_lines, dim) full-precision embeddings.
+    :param seids: (num_lines,) SEID code of each line; needed for
+        'episodes'.
+    :raise ValueError: if storage is not supported, or is 'episodes'
+        without seids.
+    :return: QuantizedEmbeddings, BinaryEmbeddings, ReducedEmbeddings,
+        IVFIndex or EpisodeIndex.
+    """
+    if storage == 'ivf':
+        return load_ivf(full)
+    if storage == 'episodes':
+        if seids is None:
+            raise ValueError("episodes storage needs the line SEIDs")
+        return load_episode_index(full, seids)
+    if storage == 'binary':
+        return load_binary(full)
+    if storage in SEARCH_STORAGES and storage.startswith('pca'):
+        return load_reduced(int(storage[3:]), full)
+    if storage not in STORAGE_DTYPES:
+        raise ValueError(f"storage must be one of {SEARCH_STORAGES}")
+    return load_quantized(storage, full)
+
+
+def _episode_runs(seids: np.ndarray, segments: int
+                  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Private function to split every episode's lines into up to segments
+    contiguous runs of near-equal length.
+
+    :param seids: (num_lines,) int SEID code of each line.
+    :param segments: maximum runs per episode.
+    :return: line rows grouped by episode (script order within each),
+        the SEID code of every run and the run of each grouped line.
+    """
+    rows = np.argsort(seids, kind='stable')
+    episodes, counts = np.unique(seids, return_counts=True)
+    runs = np.minimum(counts, segments)
+    within = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts,
+                                              counts)
+    labels = np.repeat(np.cumsum(runs) - runs, counts) + \
+        within * np.repeat(runs, counts) // np.repeat(counts, counts)
+    return rows, np.repeat(episodes, runs), labels
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Private function to scale rows to unit length (zero rows stay zero).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(
+        np.linalg.norm(vectors, axis=1, keepdims=True), 1e-8)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Private function to get the closest (cosine) centroid of every row,
+    a block of rows at a time.
+
+    :param vectors: (num_lines, dim) array or memmap.
+    :param centroids: (num_lists, dim) unit-norm centroids.
+    :return: (num_lines,) int64 list of each row.
+    """
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + _BLOCK_ROWS],
+                           dtype=np.float32)
+        labels[start:start + _BLOCK_ROWS] = np.argmax(block @ centroids.T,
+                                                      axis=1)
+    return labels
+
+
+def _kmeans(sample: np.ndarray, num_lists: int, iterations: int,
+            rng: np.random.Generator) -> np.ndarray:
+    """
+    Private function for spherical k-means on unit-norm rows.
+    Empty clusters are restarted from random sample rows.
+
+    :param sample: (num_samples, dim) unit-norm rows.
+    :param num_lists: number of centroids.
+    :param iterations: number of assign / update steps.
+    :param rng: random generator.
+    :return: (num_lists, dim) unit-norm float32 centroids.
+    """
+    centroids = sample[rng.choice(len(sample), num_lists, replace=False)]
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        counts = np.bincount(labels, minlength=num_lists)
+        present = counts > 0
+        starts = (np.cumsum(counts) - counts)[present]
+        # Sum the rows of each cluster in one pass over the sorted rows
+        sums = np.add.reduceat(sample[np.argsort(labels, kind='stable')],
+                               starts)
+        centroids[present] = _normalize(sums)
+        centroids[~present] = sample[rng.choice(len(sample),
+                                                (~present).sum())]
+    return centroids
@@ -0,0 +1,289 @@
+"""
+Process-wide, read-only holder for the data every browser session reads,
+so sessions keep references instead of their own copies.
+"""
+import threading
+import time
+import warnings
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from . import data_constants, data_manager
+from .dialogue_store import DialogueStore
+from .search_index import load_search_index
+
+# Shared memory header: rows, dim, ready flag (int64 each)
+_HEADER = np.dtype([('rows', np.int64), ('dim', np.int64),
+                    ('ready', np.int64)])
+
+
+class SharedDataset:  # pylint: disable=too-many-instance-attributes
+    """
+    Class to own the metadata, scripts, dialogue store and embedding
+    matrix once per process. Every attribute is shared by all sessions
+    and must be treated as read-only.
+    """
+    _instance = None
+    _lock = threading.Lock()
+    _quantize_lock = threading.Lock()
+    # Version whose load failed; not retried until the data changes again
+    _failed_version = None
+
+    def __init__(self, meta: pd.DataFrame, scripts: pd.DataFrame,
+                 embeddings: np.ndarray,
+                 version: Optional[str] = None) -> None:
+        """
+        Wrap already loaded data.
+
+        :param meta: metadata DataFrame.
+        :param scripts: scripts DataFrame.
+        :param embeddings: (num_lines, dim) float32 dialogue embeddings,
+            e.g. the memory-mapped store.
+        :param version: data version from the manifest, if any.
+        :raise ValueError: if embeddings does not have one row per line.
+
+        :return: None
+        """
+        if not isinstance(meta, pd.DataFrame) or \
+                not isinstance(scripts, pd.DataFrame):
+            raise TypeError("meta and scripts must be pandas DataFrames")
+        if not isinstance(embeddings, np.ndarray) or embeddings.ndim != 2:
+            raise TypeError("embeddings must be a 2D numpy array")
+        if len(embeddings) != len(scripts):
+            raise ValueError("embeddings must have one row per script line")
+        self.version = version
+        self.meta = meta
+        self.scripts = scripts
+        self.embeddings = embeddings
+        self.dialogue = DialogueStore.from_scripts(scripts)
+        self._shm = None
+        self._quantized = {}
+        import torch  # pylint:disable=import-outside-toplevel
+        with warnings.catch_warnings():
+            # Shared embeddings are read-only; the tensor is never written.
+            warnings.filterwarnings('ignore', message='.*not writable.*')
+            # pylint:disable=no-member
+            self.embeddings_tensor = torch.from_numpy(embeddings)
+
+    @classmethod
+    def load(cls, share_name: Optional[str] = None, retries: int = 3,
+             compact: Optional[bool] = None) -> 'SharedDataset':
+        """
+        Load the data bundle and the embedding store, tagged
+        with the data version from the manifest. If the data is
+        replaced while loading, load again so the frames and embeddings
+        always come from the same version.
+
+        :param share_name: if given, attach the embeddings from (or
+            publish them to) the named shared memory block so other
+            processes can reuse them without reading the shards.
+            The data version is appended to the name.
+        :param retries: extra attempts if the version changes mid-load.
+        :param compact: load the compact schema (see
+            data_manager.compact_frames), defaults to
+            data_constants.COMPACT_FRAMES.
+        :return: SharedDataset
+        """
+        if compact is None:
+            compact = data_constants.COMPACT_FRAMES
+        for _ in range(retries + 1):
+            version = data_manager.get_data_version()
+            meta, scripts = data_manager.load_data(use_bundle=True,
+                                                   compact=compact)
+            shm, embeddings = _load_embeddings(share_name, version)
+            if data_manager.get_data_version() == version:
+                break
+        dataset = cls(meta, scripts, embeddings, version)
+        dataset._shm = shm
+        return dataset
+
+    @classmethod
+    def get_instance(cls,
+                     share_name: Optional[str] = None) -> 'SharedDataset':
+        """
+        Get the dataset for this process, loading it on first use.
+        Thread-safe: concurrent sessions wait for a single load.
+
+        When the manifest reports a new data version, the first caller
+        to notice loads it and swaps it in; other callers keep getting
+        the old dataset meanwhile, so no session waits on the reload.
+        If the new data fails to load, the old dataset keeps serving
+        and the failure is reported as a warning.
+
+        :param share_name: optional shared memory block name, see load.
+        :return: SharedDataset shared by every caller in the process.
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls.load(share_name)
+            return cls._instance
+
+        version = data_manager.get_data_version()
+        if version in (cls._instance.version, cls._failed_version):
+            return cls._instance
+        # Non-blocking: callers that find a reload running keep the old data
+        # pylint:disable=consider-using-with
+        if cls._lock.acquire(blocking=False):
+            try:
+                if cls._instance.version != version:
+                    cls._instance = cls.load(share_name)
+            except (OSError, ValueError) as err:
+                cls._failed_version = version
+                warnings.warn(f"Keeping data version "
+                              f"{cls._instance.version}, failed to load "
+                              f"{version}: {err}")
+            finally:
+                cls._lock.release()
+        return cls._instance
+
+    @classmethod
+    def clear_instance(cls) -> None:
+        """
+        Forget the process-wide dataset so the next get_instance reloads.
+        Sessions holding the old dataset keep using it until they let go.
+        """
+        with cls._lock:
+            cls._instance = None
+            cls._failed_version = None
+
+    def quantized(self, dtype: str):
+        """
+        Get a compact copy of (or index over) the embeddings, built (or
+        loaded from the prebuilt store) once per dataset.
+
+        :param dtype: one of search_index.SEARCH_STORAGES, e.g. 'int8'.
+        :return: QuantizedEmbeddings, BinaryEmbeddings,
+            ReducedEmbeddings, IVFIndex or EpisodeIndex re-ranking
+            against embeddings.
+        """
+        if dtype not in self._quantized:
+            with self._quantize_lock:
+                if dtype not in self._quantized:
+                    self._quantized[dtype] = load_search_index(
+                        dtype, self.embeddings, self.dialogue.seid_codes)
+        return self._quantized[dtype]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate bytes held by the frames, store and embeddings.
+        """
+        return int(self.meta.memory_usage(deep=True).sum() +
+                   self.scripts.memory_usage(deep=True).sum() +
+                   self.dialogue.nbytes + self.embeddings.nbytes)
+
+
+def get_dataset(share_name: Optional[str] = None) -> SharedDataset:
+    """
+    Get the process-wide SharedDataset, loading it once.
+
+    :param share_name: optional shared memory block name for the
+        embeddings, shared across processes.
+    :return: SharedDataset
+    """
+    return SharedDataset.get_instance(share_name)
+
+
+def refresh_session(session_state) -> SharedDataset:
+    """
+    Point a session at the current process-wide dataset. If the data
+    version changed since the session last looked, the session's frame
+    references are swapped and its derived resources ('recommender',
+    'query', 'lexical') are dropped so the caller rebuilds them. A rerun
+    already in progress keeps the references it holds and finishes on
+    the old version.
+
+    :param session_state: st.session_state or a mapping like it.
+    :return: SharedDataset the session now refers to.
+    """
+    dataset = get_dataset()
+    if 'df_imdb' in session_state and 'df_dialog' in session_state and \
+            session_state.get('data_version') == dataset.version:
+        return dataset
+    session_state['df_imdb'] = dataset.meta
+    session_state['df_dialog'] = dataset.scripts
+    session_state['data_version'] = dataset.version
+    for key in ('recommender', 'query', 'lexical'):
+        if key in session_state:
+            del session_state[key]
+    return dataset
+
+
+def _load_embeddings(share_name: Optional[str], version: Optional[str]):
+    """
+    Private function to load the embedding matrix, through shared
+    memory if share_name is given. Blocks are named per data version
+    so a new version never attaches to old embeddings.
+
+    :param share_name: shared memory block name, or None.
+    :param version: data version the block belongs to.
+    :return: SharedMemory handle (or None) and the embeddings array.
+    """
+    if share_name is None:
+        return None, data_manager.get_episode_query_tensors().numpy()
+    if version is not None:
+        share_name = f"{share_name}_{version}"
+    try:
+        return _attach_embeddings(share_name)
+    except FileNotFoundError:
+        embeddings = data_manager.get_episode_query_tensors().numpy()
+        return _publish_embeddings(share_name, embeddings)
+
+
+def _publish_embeddings(name: str, embeddings: np.ndarray):
+    """
+    Private function to copy embeddings into a new named shared memory
+    block. If another process created it first, attach to that instead.
+
+    :param name: shared memory block name.
+    :param embeddings: (num_lines, dim) float32 array.
+    :return: SharedMemory handle and a read-only array view of it.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    try:
+        shm = shared_memory.SharedMemory(
+            name=name, create=True,
+            size=_HEADER.itemsize + embeddings.nbytes)
+    except FileExistsError:
+        return _attach_embeddings(name)
+    header = np.ndarray((), dtype=_HEADER, buffer=shm.buf)
+    header['rows'], header['dim'] = embeddings.shape
+    shared = np.ndarray(embeddings.shape, dtype=np.float32,
+                        buffer=shm.buf, offset=_HEADER.itemsize)
+    shared[:] = embeddings
+    header['ready'] = 1
+    shared.flags.writeable = False
+    return shm, shared
+
+
+def _attach_embeddings(name: str, timeout: float = 30.0):
+    """
+    Private function to attach to embeddings published by another
+    process, waiting for the publisher to finish copying.
+
+    :param name: shared memory block name.
+    :param timeout: seconds to wait for the block to be ready.
+    :raise FileNotFoundError: if no block with that name exists.
+    :raise TimeoutError: if the block is never marked ready.
+    :return: SharedMemory handle and a read-only array view of it.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    # Only the publisher may unlink the block when it exits.
+    # pylint:disable=protected-access
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    header = np.ndarray((), dtype=_HEADER, buffer=shm.buf)
+    deadline = time.monotonic() + timeout
+    while not header['ready']:
+        if time.monotonic() > deadline:
+            del header
+            shm.close()
+            raise TimeoutError(f"Shared memory block {name} is not ready")
+        time.sleep(0.01)
+    shared = np.ndarray((int(header['rows']), int(header['dim'])),
+                        dtype=np.float32, buffer=shm.buf,
+                        offset=_HEADER.itemsize)
+    shared.flags.writeable = False
+    return shm, shared
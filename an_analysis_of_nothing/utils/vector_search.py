@@ -0,0 +1,819 @@
+"""
+Compact float16 / int8 copies, a binary sign hash and PCA-reduced
+copies of the dialogue embeddings. Queries are scored against the
+compact matrix and the best candidates re-ranked against the
+full-precision embeddings.
+"""
+import os
+from abc import ABC, abstractmethod
+from typing import Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+from . import data_constants
+
+STORAGE_DTYPES = ('float16', 'int8')
+# Dimensions of the PCA-reduced copies, stored as 'pca64' etc.
+PCA_DIMS = (64, 128)
+# Rows converted to float32 per step; small blocks stay in cache
+_BLOCK_ROWS = 1024
+# SWAR popcount masks
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+# Lines re-derived from the embeddings when a prebuilt copy is loaded
+_CHECK_LINES = 64
+
+
+class _CompactEmbeddings(ABC):
+    """
+    Base class for compact copies of an embedding matrix: candidates are
+    shortlisted by approximate_scores and re-ranked against full.
+    Subclasses must implement approximate_scores, __len__ and
+    _derived_from.
+    """
+    # Lines re-ranked per query unless search is told otherwise
+    CANDIDATES = 1000
+    full = None
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """
+        Number of lines.
+        """
+
+    @abstractmethod
+    def approximate_scores(self, query: np.ndarray,
+                           rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Score every line (or every row in rows) against the query,
+        higher is more similar.
+        """
+
+    @abstractmethod
+    def _derived_from(self, vectors: np.ndarray,
+                      lines: np.ndarray) -> bool:
+        """
+        Whether the compact rows of lines are those of vectors.
+        """
+
+    def check_built_over(self, full: np.ndarray,
+                         order: Optional[np.ndarray] = None) -> None:
+        """
+        Check the copy was built over full by re-deriving the compact
+        rows of a sample of evenly spaced lines, so a copy left over
+        from other embeddings of the same shape is not used. Only the
+        sampled rows of full are read.
+
+        :param full: (num_lines, dim) embeddings.
+        :param order: optional row of full for each line of the copy,
+            e.g. inverted lists.
+        :raise ValueError: if the copy was built over other embeddings.
+        :return: None
+        """
+        if np.ndim(full) != 2 or len(full) != len(self):
+            raise ValueError("copy was built over other embeddings")
+        lines = np.unique(np.linspace(0, len(self) - 1, min(
+            len(self), _CHECK_LINES)).astype(np.int64))
+        rows = lines if order is None else np.sort(order[lines])
+        vectors = np.asarray(full[rows], dtype=np.float32)
+        if order is not None:
+            # Back from sorted rows to the sampled lines
+            vectors = vectors[np.searchsorted(rows, order[lines])]
+        if not self._derived_from(vectors, lines):
+            raise ValueError("copy was built over other embeddings")
+
+    def search(self, query: np.ndarray, k: int = 500,
+               candidates: Optional[int] = None,
+               rows: Optional[np.ndarray] = None
+               ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the k lines most similar to the query. The top candidates
+        by approximate score are re-ranked by exact cosine similarity
+        against the full matrix (if there is one).
+
+        :param query: (dim,) query embedding.
+        :param k: number of results.
+        :param candidates: number of lines re-ranked, at least k;
+            defaults to the class's CANDIDATES.
+        :param rows: optional sorted row indices to search within.
+        :return: scores and line indices of up to k lines, best first.
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        num_rows = len(self) if rows is None else len(rows)
+        k = min(k, num_rows)
+        if candidates is None:
+            candidates = self.CANDIDATES
+        candidates = min(max(candidates, k), num_rows)
+        scores, hits = top_k(self.approximate_scores(query, rows),
+                              candidates if self.full is not None else k)
+        if rows is not None:
+            hits = rows[hits]
+        if self.full is None:
+            return scores, hits
+        return rerank(self.full, hits, query, k)
+
+
+class QuantizedEmbeddings(_CompactEmbeddings):
+    """
+    Class to hold a float16 or per-dimension scaled int8 copy of an
+    embedding matrix (2x or 4x smaller than float32) and search it.
+    The full-precision matrix is only read for re-ranked rows, so it
+    can stay memory-mapped without becoming resident.
+    NumPy converts int8 to float32 quickly, so int8 scores about as
+    fast as float32; float16 only saves memory and scores slower.
+    """
+
+    def __init__(self, codes: np.ndarray, scale: Optional[np.ndarray] = None,
+                 full: Optional[np.ndarray] = None) -> None:
+        """
+        Wrap an already quantised matrix.
+
+        :param codes: (num_lines, dim) float16 or int8 matrix.
+        :param scale: (dim,) float32 per-dimension scale, int8 only.
+        :param full: optional (num_lines, dim) full-precision embeddings
+            used for re-ranking, e.g. the memory-mapped store.
+        :raise ValueError: if the dtypes or shapes do not match.
+
+        :return: None
+        """
+        if not isinstance(codes, np.ndarray) or codes.ndim != 2:
+            raise TypeError("codes must be a 2D numpy array")
+        if codes.dtype.name not in STORAGE_DTYPES:
+            raise ValueError(f"codes must be one of {STORAGE_DTYPES}")
+        if (codes.dtype == np.int8) != (scale is not None):
+            raise ValueError("scale is required for, and only for, int8")
+        if scale is not None and np.shape(scale) != (codes.shape[1],):
+            raise ValueError("scale must have one entry per dimension")
+        if full is not None and np.shape(full) != codes.shape:
+            raise ValueError("full must have the same shape as codes")
+        self.codes = codes
+        self.scale = None if scale is None else \
+            np.asarray(scale, dtype=np.float32)
+        self.full = full
+
+    @classmethod
+    def quantize(cls, embeddings: np.ndarray,
+                 dtype: str = 'int8') -> 'QuantizedEmbeddings':
+        """
+        Quantise full-precision embeddings. int8 uses a symmetric
+        per-dimension scale so every dimension spans -127..127.
+
+        :param embeddings: (num_lines, dim) float32 array or tensor.
+        :param dtype: 'float16' or 'int8'.
+        :raise ValueError: if dtype is not supported.
+        :return: QuantizedEmbeddings that re-ranks against embeddings.
+        """
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"dtype must be one of {STORAGE_DTYPES}")
+        full = np.asarray(embeddings)
+        if dtype == 'float16':
+            return cls(full.astype(np.float16), full=full)
+        codes, scale = quantize_int8(full)
+        return cls(codes, scale, full)
+
+    @classmethod
+    def load(cls, dtype: str, full: Optional[np.ndarray] = None,
+             path: Optional[str] = None) -> 'QuantizedEmbeddings':
+        """
+        Memory-map a quantised store written by save.
+
+        :param dtype: 'float16' or 'int8'.
+        :param full: optional full-precision embeddings for re-ranking.
+        :param path: path to the codes, defaults to
+            data_constants.QUANTIZED_STORE for dtype.
+        :raise FileNotFoundError: if the store has not been built.
+        :raise ValueError: if it was built over other embeddings than
+            full.
+        :return: QuantizedEmbeddings
+        """
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"dtype must be one of {STORAGE_DTYPES}")
+        if path is None:
+            path = data_constants.QUANTIZED_STORE.format(dtype=dtype)
+        codes = np.load(path, mmap_mode='r')
+        scale = np.load(_scale_path(path)) if dtype == 'int8' else None
+        quantized = cls(codes, scale, full)
+        if full is not None:
+            quantized.check_built_over(full)
+        return quantized
+
+    def save(self, path: str) -> None:
+        """
+        Store the codes (and int8 scale, next to them) as .npy files.
+
+        :param path: path for the codes .npy file.
+        :return: None
+        """
+        np.save(path, self.codes)
+        if self.scale is not None:
+            np.save(_scale_path(path), self.scale)
+
+    def _derived_from(self, vectors: np.ndarray,
+                      lines: np.ndarray) -> bool:
+        if self.scale is None:
+            expected = vectors.astype(np.float16)
+        else:
+            expected = np.clip(np.rint(vectors / self.scale), -127, 127)
+        return np.array_equal(np.asarray(self.codes[lines]), expected)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the compact matrix (excluding the full matrix).
+        """
+        scale_bytes = 0 if self.scale is None else self.scale.nbytes
+        return int(self.codes.nbytes + scale_bytes)
+
+    def approximate_scores(self, query: np.ndarray,
+                           rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Score lines against the compact matrix, a block at a time.
+
+        :param query: (dim,) query embedding.
+        :param rows: optional sorted row indices to score instead of
+            every line (e.g. the lines of filtered episodes).
+        :return: float32 approximate dot products, one per scored row.
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        if self.scale is not None:
+            # (codes * scale) @ query == codes @ (scale * query)
+            query = query * self.scale
+        num_rows = len(self) if rows is None else len(rows)
+        scores = np.empty(num_rows, dtype=np.float32)
+        for start in range(0, num_rows, _BLOCK_ROWS):
+            if rows is None:
+                block = self.codes[start:start + _BLOCK_ROWS]
+            else:
+                block = self.codes[rows[start:start + _BLOCK_ROWS]]
+            scores[start:start + _BLOCK_ROWS] = \
+                block.astype(np.float32) @ query
+        return scores
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None,
+               candidates: Optional[int] = None) -> np.ndarray:
+        """
+        Score lines by cosine similarity: approximately against the
+        compact matrix, then exactly against full (if there is one)
+        for the best candidates, so the lines that decide a ranking,
+        e.g. each episode's best lines, carry exact scores.
+
+        :param query: (dim,) query embedding.
+        :param rows: optional sorted row indices to score instead of
+            every line.
+        :param candidates: number of lines re-scored exactly; defaults
+            to the class's CANDIDATES.
+        :return: float32 scores, one per scored row. Approximate scores
+            assume unit-norm lines, as MiniLM's are.
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        scores = self.approximate_scores(query, rows) / \
+            max(float(np.linalg.norm(query)), 1e-8)
+        if self.full is None:
+            return scores
+        if candidates is None:
+            candidates = self.CANDIDATES
+        # Sorted rows read the memory-mapped matrix front to back
+        best = np.sort(top_k(scores, candidates)[1])
+        scores[best] = _exact_scores(
+            self.full[best if rows is None else rows[best]], query)
+        return scores
+
+
+class BinaryEmbeddings(_CompactEmbeddings):
+    """
+    Class to hold a sign hash of an embedding matrix: one bit per
+    dimension, set where the line exceeds the corpus mean, packed with
+    np.packbits (32x smaller than float32). The Hamming distance between
+    two hashes tracks the angle between the vectors, so a popcount scan
+    of the hashes shortlists lines that are re-ranked exactly against
+    the full-precision embeddings.
+    """
+    # Hamming distance is coarse, so shortlist more lines
+    CANDIDATES = 4000
+
+    def __init__(self, bits: np.ndarray, center: np.ndarray,
+                 full: Optional[np.ndarray] = None) -> None:
+        """
+        Wrap an already built hash.
+
+        :param bits: (num_lines, num_bytes) uint8 packed sign bits,
+            num_bytes a multiple of 8.
+        :param center: (dim,) float32 corpus mean the signs are taken
+            against.
+        :param full: optional (num_lines, dim) full-precision embeddings
+            used for re-ranking, e.g. the memory-mapped store.
+        :raise ValueError: if the dtypes or shapes do not match.
+
+        :return: None
+        """
+        if not isinstance(bits, np.ndarray) or bits.ndim != 2:
+            raise TypeError("bits must be a 2D numpy array")
+        if bits.dtype != np.uint8 or bits.shape[1] % 8:
+            raise ValueError("bits must be uint8 with whole 64-bit words")
+        if np.ndim(center) != 1 or len(center) > bits.shape[1] * 8:
+            raise ValueError("center must have one entry per dimension")
+        if full is not None and \
+                np.shape(full) != (len(bits), len(center)):
+            raise ValueError("full must have one row per hashed line")
+        self.bits = bits
+        self.center = np.asarray(center, dtype=np.float32)
+        self.full = full
+
+    @classmethod
+    def from_embeddings(cls, embeddings: np.ndarray) -> 'BinaryEmbeddings':
+        """
+        Hash full-precision embeddings, a block of rows at a time.
+
+        :param embeddings: (num_lines, dim) float32 array or memmap.
+        :return: BinaryEmbeddings that re-ranks against embeddings.
+        """
+        full = np.asarray(embeddings)
+        center = np.zeros(full.shape[1], dtype=np.float64)
+        for start in range(0, len(full), _BLOCK_ROWS):
+            center += full[start:start + _BLOCK_ROWS].sum(axis=0,
+                                                          dtype=np.float64)
+        center = (center / max(len(full), 1)).astype(np.float32)
+        bits = np.empty((len(full), _hash_bytes(full.shape[1])),
+                        dtype=np.uint8)
+        for start in range(0, len(full), _BLOCK_ROWS):
+            bits[start:start + _BLOCK_ROWS] = _sign_hash(
+                full[start:start + _BLOCK_ROWS], center)
+        return cls(bits, center, full)
+
+    @classmethod
+    def load(cls, full: Optional[np.ndarray] = None,
+             path: Optional[str] = None) -> 'BinaryEmbeddings':
+        """
+        Memory-map a hash written by save.
+
+        :param full: optional full-precision embeddings for re-ranking.
+        :param path: path to the bits, defaults to
+            data_constants.QUANTIZED_STORE for 'binary'.
+        :raise FileNotFoundError: if the hash has not been built.
+        :raise ValueError: if it was built over other embeddings than
+            full.
+        :return: BinaryEmbeddings
+        """
+        if path is None:
+            path = data_constants.QUANTIZED_STORE.format(dtype='binary')
+        hashed = cls(np.load(path, mmap_mode='r'),
+                     np.load(_center_path(path)), full)
+        if full is not None:
+            hashed.check_built_over(full)
+        return hashed
+
+    def save(self, path: str) -> None:
+        """
+        Store the bits and, next to them, the center as .npy files.
+
+        :param path: path for the bits .npy file.
+        :return: None
+        """
+        np.save(path, self.bits)
+        np.save(_center_path(path), self.center)
+
+    def _derived_from(self, vectors: np.ndarray,
+                      lines: np.ndarray) -> bool:
+        return np.array_equal(np.asarray(self.bits[lines]),
+                              _sign_hash(vectors, self.center))
+
+    def __len__(self) -> int:
+        return len(self.bits)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the hash (excluding the full matrix).
+        """
+        return int(self.bits.nbytes + self.center.nbytes)
+
+    def hamming(self, query: np.ndarray,
+                rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Hamming distances between the query's hash and the lines',
+        by popcount over 64-bit words, a block at a time.
+
+        :param query: (dim,) query embedding.
+        :param rows: optional sorted row indices to compare instead of
+            every line.
+        :return: int64 distances, one per compared row.
+        """
+        words = self.bits.view(np.uint64)
+        query = _sign_hash(np.asarray(query, dtype=np.float32)
+                           .reshape(1, -1), self.center).view(np.uint64)
+        num_rows = len(self) if rows is None else len(rows)
+        distances = np.empty(num_rows, dtype=np.int64)
+        for start in range(0, num_rows, _BLOCK_ROWS * 8):
+            if rows is None:
+                block = words[start:start + _BLOCK_ROWS * 8]
+            else:
+                block = words[rows[start:start + _BLOCK_ROWS * 8]]
+            distances[start:start + _BLOCK_ROWS * 8] = \
+                _hamming_rows(block, query)
+        return distances
+
+    def approximate_scores(self, query: np.ndarray,
+                           rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Estimate cosine similarities from Hamming distances, as the
+        cosine of the angle a distance d implies, cos(pi * d / bits).
+
+        :param query: (dim,) query embedding.
+        :param rows: optional sorted row indices to score.
+        :return: float32 estimates, one per scored row.
+        """
+        return np.cos(np.pi * self.hamming(query, rows) /
+                      len(self.center)).astype(np.float32)
+
+
+class ReducedEmbeddings(_CompactEmbeddings):
+    """
+    Class to hold a PCA projection of an embedding matrix onto its top
+    principal components (e.g. 384 -> 64 dims, 6x smaller). Queries are
+    projected and scored in the reduced space, which costs proportionally
+    less, and the best candidates are re-ranked in the full space.
+    """
+
+    def __init__(self, reduced: np.ndarray, mean: np.ndarray,
+                 components: np.ndarray,
+                 full: Optional[np.ndarray] = None) -> None:
+        """
+        Wrap an already projected matrix.
+
+        :param reduced: (num_lines, dims) float32 projected lines.
+        :param mean: (dim,) float32 mean subtracted before projecting.
+        :param components: (dims, dim) float32 orthonormal components.
+        :param full: optional (num_lines, dim) full-precision embeddings
+            used for re-ranking, e.g. the memory-mapped store.
+        :raise ValueError: if the shapes do not match.
+
+        :return: None
+        """
+        if not isinstance(reduced, np.ndarray) or reduced.ndim != 2:
+            raise TypeError("reduced must be a 2D numpy array")
+        if np.shape(components) != (reduced.shape[1], np.size(mean)):
+            raise ValueError("components must be (dims, dim) with "
+                             "one column per dimension of mean")
+        if full is not None and \
+                np.shape(full) != (len(reduced), np.size(mean)):
+            raise ValueError("full must have one row per projected line")
+        self.reduced = reduced
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.full = full
+
+    @classmethod
+    def fit(cls, embeddings: np.ndarray,
+            dims: int = 128) -> 'ReducedEmbeddings':
+        """
+        Fit the projection from the covariance of the embeddings and
+        project every line, a block of rows at a time.
+
+        :param embeddings: (num_lines, dim) float32 array or memmap.
+        :param dims: number of principal components kept.
+        :raise ValueError: if dims is not between 1 and dim.
+        :return: ReducedEmbeddings that re-ranks against embeddings.
+        """
+        full = np.asarray(embeddings)
+        if not 1 <= dims <= full.shape[1]:
+            raise ValueError("dims must be between 1 and the embedding size")
+        total = np.zeros(full.shape[1], dtype=np.float64)
+        gram = np.zeros((full.shape[1], full.shape[1]), dtype=np.float64)
+        for start in range(0, len(full), _BLOCK_ROWS * 8):
+            block = np.asarray(full[start:start + _BLOCK_ROWS * 8],
+                               dtype=np.float64)
+            total += block.sum(axis=0)
+            gram += block.T @ block
+        mean = total / max(len(full), 1)
+        covariance = gram / max(len(full), 1) - np.outer(mean, mean)
+        # eigh sorts eigenvalues ascending; keep the largest dims
+        _, vectors = np.linalg.eigh(covariance)
+        components = vectors[:, ::-1][:, :dims].T.astype(np.float32)
+        mean = mean.astype(np.float32)
+        reduced = np.empty((len(full), dims), dtype=np.float32)
+        for start in range(0, len(full), _BLOCK_ROWS * 8):
+            reduced[start:start + _BLOCK_ROWS * 8] = \
+                (full[start:start + _BLOCK_ROWS * 8] - mean) @ components.T
+        return cls(reduced, mean, components, full)
+
+    @classmethod
+    def load(cls, dims: int, full: Optional[np.ndarray] = None,
+             path: Optional[str] = None) -> 'ReducedEmbeddings':
+        """
+        Memory-map a projection written by save.
+
+        :param dims: number of principal components.
+        :param full: optional full-precision embeddings for re-ranking.
+        :param path: path to the reduced matrix, defaults to
+            data_constants.QUANTIZED_STORE for f"pca{dims}".
+        :raise FileNotFoundError: if the projection has not been built.
+        :raise ValueError: if it was fitted on other embeddings than
+            full.
+        :return: ReducedEmbeddings
+        """
+        if path is None:
+            path = data_constants.QUANTIZED_STORE.format(dtype=f"pca{dims}")
+        with np.load(_projection_path(path)) as projection:
+            reduced = cls(np.load(path, mmap_mode='r'), projection['mean'],
+                          projection['components'], full)
+        if full is not None:
+            reduced.check_built_over(full)
+        return reduced
+
+    def save(self, path: str) -> None:
+        """
+        Store the reduced matrix and, next to it, the projection.
+
+        :param path: path for the reduced .npy file.
+        :return: None
+        """
+        np.save(path, self.reduced)
+        np.savez(_projection_path(path), mean=self.mean,
+                 components=self.components)
+
+    def _derived_from(self, vectors: np.ndarray,
+                      lines: np.ndarray) -> bool:
+        return np.allclose(np.asarray(self.reduced[lines]),
+                           (vectors - self.mean) @ self.components.T,
+                           atol=1e-4)
+
+    def __len__(self) -> int:
+        return len(self.reduced)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the reduced matrix and projection.
+        """
+        return int(self.reduced.nbytes + self.mean.nbytes +
+                   self.components.nbytes)
+
+    def approximate_scores(self, query: np.ndarray,
+                           rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Score lines in the reduced space, a block at a time. Each line
+        is approximated by mean + its projection, so its dot product
+        with the query is mean . query + reduced . (components query).
+
+        :param query: (dim,) query embedding.
+        :param rows: optional sorted row indices to score.
+        :return: float32 approximate dot products, one per scored row.
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        projected = self.components @ query
+        offset = np.float32(self.mean @ query)
+        num_rows = len(self) if rows is None else len(rows)
+        scores = np.empty(num_rows, dtype=np.float32)
+        for start in range(0, num_rows, _BLOCK_ROWS * 8):
+            if rows is None:
+                block = self.reduced[start:start + _BLOCK_ROWS * 8]
+            else:
+                block = self.reduced[rows[start:start + _BLOCK_ROWS * 8]]
+            scores[start:start + _BLOCK_ROWS * 8] = block @ projected
+        return scores + offset
+
+
+def load_binary(full: np.ndarray) -> BinaryEmbeddings:
+    """
+    Get the sign hash of the dialogue embeddings, memory-mapping the
+    prebuilt hash if it exists and hashing full otherwise.
+
+    :param full: (num_lines, dim) full-precision embeddings.
+    :return: BinaryEmbeddings re-ranking against full.
+    """
+    full = np.asarray(full)
+    try:
+        return BinaryEmbeddings.load(full)
+    except FileNotFoundError:
+        return BinaryEmbeddings.from_embeddings(full)
+    except ValueError:
+        # Stale hash from an older bundle
+        return BinaryEmbeddings.from_embeddings(full)
+
+
+def load_reduced(dims: int, full: np.ndarray) -> ReducedEmbeddings:
+    """
+    Get the PCA-reduced copy of the dialogue embeddings, memory-mapping
+    the prebuilt copy if it exists and fitting it on full otherwise.
+
+    :param dims: number of principal components.
+    :param full: (num_lines, dim) full-precision embeddings.
+    :return: ReducedEmbeddings re-ranking against full.
+    """
+    full = np.asarray(full)
+    try:
+        return ReducedEmbeddings.load(dims, full)
+    except FileNotFoundError:
+        return ReducedEmbeddings.fit(full, dims)
+    except ValueError:
+        # Stale copy from an older bundle
+        return ReducedEmbeddings.fit(full, dims)
+
+
+def load_quantized(dtype: str,
+                   full: np.ndarray) -> QuantizedEmbeddings:
+    """
+    Get a quantised copy of the dialogue embeddings, memory-mapping
+    the prebuilt store if it exists and quantising full otherwise.
+
+    :param dtype: 'float16' or 'int8'.
+    :param full: (num_lines, dim) full-precision embeddings.
+    :return: QuantizedEmbeddings re-ranking against full.
+    """
+    full = np.asarray(full)
+    try:
+        return QuantizedEmbeddings.load(dtype, full)
+    except FileNotFoundError:
+        return QuantizedEmbeddings.quantize(full, dtype)
+    except ValueError:
+        # Stale store from an older bundle
+        return QuantizedEmbeddings.quantize(full, dtype)
+
+
+def recall_report(quantized, queries: np.ndarray,
+                  k_values: Sequence[int] = (10, 100, 500),
+                  candidates: int = 1000) -> pd.DataFrame:
+    """
+    Compare compact search against exact search over the full matrix.
+
+    :param quantized: QuantizedEmbeddings, BinaryEmbeddings or
+        ReducedEmbeddings with a full matrix.
+    :param queries: (num_queries, dim) query embeddings.
+    :param k_values: result sizes to report.
+    :param candidates: number of lines re-ranked per query.
+    :return: DataFrame indexed by k with the mean recall@k of the
+        compact scores alone and after exact re-ranking.
+    """
+    if quantized.full is None:
+        raise ValueError("recall_report needs the full-precision matrix")
+    largest = max(k_values)
+    compact = {k: [] for k in k_values}
+    reranked = {k: [] for k in k_values}
+    for query in np.asarray(queries, dtype=np.float32):
+        truth = top_k(_exact_scores(quantized.full, query), largest)[1]
+        approx = top_k(quantized.approximate_scores(query), largest)[1]
+        found = quantized.search(query, largest, candidates)[1]
+        for k in k_values:
+            expected = set(truth[:k].tolist())
+            compact[k].append(len(expected.intersection(approx[:k])) / k)
+            reranked[k].append(len(expected.intersection(found[:k])) / k)
+
+    report = pd.DataFrame({
+        'recall_compact': [np.mean(compact[k]) for k in k_values],
+        'recall_reranked': [np.mean(reranked[k]) for k in k_values],
+    }, index=pd.Index(list(k_values), name='k'))
+    report['compact_bytes'] = quantized.nbytes
+    report['full_bytes'] = int(quantized.full.nbytes)
+    return report
+
+
+def _exact_scores(full: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Private function for exact cosine similarity of every line.
+
+    :param full: (num_lines, dim) embeddings.
+    :param query: (dim,) query embedding.
+    :return: (num_lines,) float32 scores.
+    """
+    full = np.asarray(full, dtype=np.float32)
+    return full @ query / np.maximum(
+        np.linalg.norm(full, axis=1) * np.linalg.norm(query), 1e-8)
+
+
+def rerank(full: np.ndarray, hits: np.ndarray, query: np.ndarray,
+            k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Re-rank candidate lines by exact cosine similarity.
+
+    :param full: (num_lines, dim) full-precision embeddings.
+    :param hits: candidate line rows.
+    :param query: (dim,) float32 query embedding.
+    :param k: number of results.
+    :return: exact scores and line rows of the best k, best first.
+    """
+    # Sorted rows read the memory-mapped matrix front to back
+    hits = np.sort(hits)
+    scores, order = top_k(_exact_scores(full[hits], query), k)
+    return scores, hits[order]
+
+
+def _hash_bytes(dim: int) -> int:
+    """
+    Private function for the bytes per sign hash, in whole 64-bit words.
+    """
+    return -(-dim // 64) * 8
+
+
+def _sign_hash(vectors: np.ndarray, center: np.ndarray) -> np.ndarray:
+    """
+    Private function to pack the signs of rows about center into bits,
+    zero-padded to whole 64-bit words.
+
+    :param vectors: (num_rows, dim) array.
+    :param center: (dim,) array.
+    :return: (num_rows, num_bytes) uint8 packed bits.
+    """
+    packed = np.packbits(np.asarray(vectors) > center, axis=1)
+    padded = np.zeros((len(packed), _hash_bytes(len(center))),
+                      dtype=np.uint8)
+    padded[:, :packed.shape[1]] = packed
+    return padded
+
+
+def _hamming_rows(words: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Private function for the number of bits set in each row of
+    words ^ query, by SWAR popcount over uint64 words.
+
+    :param words: (num_rows, num_words) uint64 hashes.
+    :param query: (1, num_words) uint64 hash.
+    :return: (num_rows,) int64 Hamming distances.
+    """
+    words = words ^ query
+    shifted = words >> np.uint64(1)
+    shifted &= _M1
+    words -= shifted
+    shifted = words >> np.uint64(2)
+    shifted &= _M2
+    words &= _M2
+    words += shifted
+    words += words >> np.uint64(4)
+    words &= _M4
+    # Each byte now counts <= 8 bits, so up to 31 words add carry-free
+    if words.shape[1] > 31:
+        return ((words * _H01) >> np.uint64(56)).sum(axis=1).astype(np.int64)
+    total = words.sum(axis=1, dtype=np.uint64)
+    return ((total * _H01) >> np.uint64(56)).astype(np.int64)
+
+
+def quantize_int8(full: np.ndarray, order: Optional[np.ndarray] = None
+                   ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantise to int8 with a symmetric per-dimension scale, a block of
+    rows at a time.
+
+    :param full: (num_lines, dim) float32 array or memmap.
+    :param order: optional row order of the codes, e.g. inverted lists.
+    :return: (num_lines, dim) int8 codes and the (dim,) float32 scale.
+    """
+    scale = np.zeros(full.shape[1], dtype=np.float32)
+    for start in range(0, len(full), _BLOCK_ROWS):
+        scale = np.maximum(scale, np.abs(full[start:start + _BLOCK_ROWS])
+                           .max(axis=0))
+    scale /= 127
+    scale[scale == 0] = 1
+    codes = np.empty(full.shape, dtype=np.int8)
+    for start in range(0, len(full), _BLOCK_ROWS):
+        if order is None:
+            block = full[start:start + _BLOCK_ROWS]
+        else:
+            block = full[order[start:start + _BLOCK_ROWS]]
+        codes[start:start + _BLOCK_ROWS] = np.clip(np.rint(block / scale),
+                                                   -127, 127)
+    return codes, scale
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the k highest scores, best first (ties in index order).
+
+    :param scores: 1D array of scores.
+    :param k: number of results.
+    :return: top scores and their indices.
+    """
+    if k < len(scores):
+        indices = np.argpartition(-scores, k - 1)[:k]
+    else:
+        indices = np.arange(len(scores))
+    indices = indices[np.argsort(-scores[indices], kind='stable')]
+    return scores[indices], indices
+
+
+def _scale_path(path: str) -> str:
+    """
+    Private function for the path of the int8 scale next to the codes.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}_scale{ext}"
+
+
+def _projection_path(path: str) -> str:
+    """
+    Private function for the path of the PCA projection next to the
+    reduced matrix.
+    """
+    root, _ = os.path.splitext(path)
+    return f"{root}_projection.npz"
+
+
+def _center_path(path: str) -> str:
+    """
+    Private function for the path of the hash center next to the bits.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}_center{ext}"
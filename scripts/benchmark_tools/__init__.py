@@ -0,0 +1,56 @@
+"""
+Benchmarks for the app's data and search code. Run from ./scripts as
+modules, e.g. python -m benchmark_tools.quantized_recall
+"""
+import os
+import sys
+
+
+def use_app_package():
+    """
+    Make the app's utils package importable and switch to the app
+    directory so its ./static/data paths resolve.
+    :return: path to the app directory.
+    """
+    app_dir = os.path.abspath(os.path.join(
+        os.path.dirname(__file__), '..', '..', 'an_analysis_of_nothing'))
+    if app_dir not in sys.path:
+        sys.path.insert(0, app_dir)
+    os.chdir(app_dir)
+    return app_dir
+
+
+def load_encoder(model_name='all-MiniLM-L6-v2'):
+    """
+    Load the app's sentence encoder. Without network access or a cached
+    copy, build a randomly initialised model of the same shape (6-layer,
+    384-dim BERT with mean pooling), which costs about the same per
+    token to run.
+    :param model_name: SentenceTransformer model name.
+    :return: SentenceTransformer, and whether it is the real model.
+    """
+    # pylint: disable=import-outside-toplevel
+    import tempfile
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    try:
+        return SentenceTransformer(model_name), True
+    except OSError:
+        pass
+    model_dir = tempfile.mkdtemp(prefix='stand_in_encoder_')
+    words = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + \
+        [chr(code) for code in range(33, 127)] + \
+        ['##' + chr(code) for code in range(97, 123)] + \
+        'the a and to of is in you it that no soup for guy falls over ' \
+        'jerry george elaine kramer newman'.split()
+    with open(os.path.join(model_dir, 'vocab.txt'), 'w',
+              encoding='utf-8') as file:
+        file.write('\n'.join(dict.fromkeys(words)) + '\n')
+    BertTokenizerFast(os.path.join(model_dir, 'vocab.txt')) \
+        .save_pretrained(model_dir)
+    BertModel(BertConfig(vocab_size=30522, hidden_size=384,
+                         num_hidden_layers=6, num_attention_heads=12,
+                         intermediate_size=1536)).save_pretrained(model_dir)
+    transformer = models.Transformer(model_dir, max_seq_length=256)
+    return SentenceTransformer(modules=[
+        transformer, models.Pooling(384), models.Normalize()]), False
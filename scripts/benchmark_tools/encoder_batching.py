@@ -0,0 +1,94 @@
+"""
+Compare query encoding throughput and latency under concurrent load:
+every client thread calling the model itself, against all of them
+sharing utils.batch_encoder.BatchEncoder, for several batch sizes.
+Without the model (no network), a randomly initialised model of the
+same shape stands in.
+Usage (from ./scripts):
+    python -m benchmark_tools.encoder_batching [num_clients] \
+        [queries_per_client]
+"""
+import sys
+import threading
+import time
+
+from benchmark_tools import load_encoder, use_app_package
+from benchmark_tools.ivf_recall import percentiles
+
+use_app_package()
+# pylint: disable=wrong-import-position
+from utils.batch_encoder import BatchEncoder  # noqa: E402
+
+QUERIES = ['mean soup guy', 'kramer falls over', 'jerry waits in the lobby',
+           'george gets a toupee', 'elaine dances badly',
+           'the parking garage', 'newman delivers the mail',
+           'a festivus for the rest of us']
+MAX_BATCHES = [1, 8, 32]
+
+
+def run_clients(encode, num_clients, queries_per_client):
+    """
+    Run client threads that each encode queries one after another.
+    :param encode: function encoding one query string.
+    :param num_clients: number of concurrent clients.
+    :param queries_per_client: queries each client sends.
+    :return: wall seconds and the latency of every query in seconds.
+    """
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset):
+        for i in range(queries_per_client):
+            query = QUERIES[(offset + i) % len(QUERIES)] + f" {offset}"
+            start = time.perf_counter()
+            encode(query)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(offset,))
+               for offset in range(num_clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def report(name, wall, latencies):
+    """
+    Print throughput and latency percentiles of a run.
+    """
+    p50, p99 = percentiles(latencies)
+    print(f"{name:22s} {len(latencies) / wall:7.1f} queries/s  "
+          f"p50 {p50:7.1f} ms  p99 {p99:7.1f} ms")
+
+
+def main(num_clients=16, queries_per_client=8):
+    """
+    Print throughput and latency of direct and batched encoding.
+    :param num_clients: number of concurrent clients.
+    :param queries_per_client: queries each client sends.
+    :return: None
+    """
+    model, real = load_encoder()
+    print(f"{'all-MiniLM-L6-v2' if real else 'stand-in model'}, "
+          f"{num_clients} clients x {queries_per_client} queries")
+    model.encode(QUERIES)
+    report('direct', *run_clients(
+        lambda query: model.encode(query, convert_to_tensor=True),
+        num_clients, queries_per_client))
+    for max_batch in MAX_BATCHES:
+        encoder = BatchEncoder(model, max_batch=max_batch)
+        report(f"batched (max {max_batch})", *run_clients(
+            lambda query, encoder=encoder: encoder.encode(query, True),
+            num_clients, queries_per_client))
+        stats = encoder.stats
+        print(f"  mean batch {stats['mean_batch_size']:.1f}, mean queue "
+              f"{stats['mean_queue_seconds'] * 1e3:.1f} ms, encoder "
+              f"{stats['queries_per_second']:.1f} queries/s")
+        encoder.close()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,118 @@
+"""
+Check the int8 encoder backend (utils.encoder_backends) against the
+float32 model on CPU: cosine agreement of their embeddings of the
+dialogue lines, how often an int8 query finds the same top lines of the
+float32 corpus as the float32 query, and the latency of single queries
+and the throughput of batches for both.
+Without the data files, made-up lines stand in for the dialogue; without
+the model (no network), a randomly initialised model of the same shape
+stands in, which says nothing about agreement, only about speed.
+Usage (from ./scripts):
+    python -m benchmark_tools.encoder_quantization [num_lines] \
+        [num_queries]
+"""
+import copy
+import sys
+import time
+import numpy as np
+
+from benchmark_tools import load_encoder, use_app_package
+from benchmark_tools.ivf_recall import percentiles
+
+use_app_package()
+# pylint: disable=wrong-import-position
+from utils import data_manager  # noqa: E402
+from utils.encoder_backends import (encoder_agreement,  # noqa: E402
+                                    quantize_encoder)
+
+TOP_K = 20
+BATCH_SIZES = [32, 256]
+WORDS = 'jerry george elaine kramer newman the soup guy falls over and ' \
+    'no you it is a to of in that for'.split()
+
+
+def dialogue_lines(num_lines, seed=0):
+    """
+    A random sample of the dialogue lines, or made-up lines without
+    the data files.
+    :param num_lines: number of lines.
+    :param seed: random seed.
+    :return: list of strings.
+    """
+    rng = np.random.default_rng(seed)
+    try:
+        _, scripts = data_manager.load_data(use_bundle=True, compact=True)
+        lines = scripts.Dialogue.dropna().astype(str).to_numpy()
+        return lines[rng.choice(len(lines), min(num_lines, len(lines)),
+                                replace=False)].tolist()
+    except FileNotFoundError:
+        return [' '.join(rng.choice(WORDS, rng.integers(3, 20)))
+                for _ in range(num_lines)]
+
+
+def top_line_overlap(float_model, int8_model, lines, queries):
+    """
+    Fraction of the TOP_K lines, scored against float32 line embeddings
+    as the app does, shared by each query's int8 and float32 embedding.
+    :param float_model: float32 encoder.
+    :param int8_model: int8 encoder.
+    :param lines: corpus lines.
+    :param queries: query strings.
+    :return: mean overlap.
+    """
+    corpus = float_model.encode(lines, batch_size=256)
+    expected = corpus @ float_model.encode(queries).T
+    found = corpus @ int8_model.encode(queries).T
+    overlap = [len(np.intersect1d(np.argsort(-expected[:, i])[:TOP_K],
+                                  np.argsort(-found[:, i])[:TOP_K])) / TOP_K
+               for i in range(len(queries))]
+    return float(np.mean(overlap))
+
+
+def single_query_latency(model, queries):
+    """
+    Seconds to encode each query on its own.
+    """
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        model.encode(query, convert_to_tensor=True)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main(num_lines=2000, num_queries=100):
+    """
+    Print agreement, latency and throughput of both backends.
+    :param num_lines: dialogue lines compared and searched.
+    :param num_queries: queries timed and searched.
+    :return: None
+    """
+    float_model, real = load_encoder()
+    int8_model = quantize_encoder(copy.deepcopy(float_model))
+    lines = dialogue_lines(num_lines)
+    queries = dialogue_lines(num_queries, seed=1)
+    print(f"{'all-MiniLM-L6-v2' if real else 'stand-in model'}, "
+          f"{len(lines)} lines, {len(queries)} queries")
+
+    agreement = encoder_agreement(float_model, int8_model, lines)
+    print(f"cosine int8 vs float32  mean {agreement['mean']:.4f}  "
+          f"p1 {agreement['p1']:.4f}  min {agreement['min']:.4f}")
+    print(f"top {TOP_K} lines shared  "
+          f"{top_line_overlap(float_model, int8_model, lines, queries):.3f}")
+
+    for name, model in [('float32', float_model), ('int8', int8_model)]:
+        model.encode(queries[:8])
+        p50, p99 = percentiles(single_query_latency(model, queries))
+        print(f"{name:8s} single query  p50 {p50:6.1f} ms  "
+              f"p99 {p99:6.1f} ms")
+        for batch_size in BATCH_SIZES:
+            start = time.perf_counter()
+            model.encode(lines, batch_size=batch_size)
+            rate = len(lines) / (time.perf_counter() - start)
+            print(f"{name:8s} batch {batch_size:4d}    "
+                  f"{rate:7.1f} lines/s")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
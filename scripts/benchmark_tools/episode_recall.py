@@ -0,0 +1,132 @@
+"""
+Report how often centroid-first search (utils.search_index.EpisodeIndex)
+returns the same 5 episodes as exact search, where an episode scores
+its best line, and the p50 / p99 query latency of both, for several
+numbers of centroids per episode and of episodes probed.
+Without the data files (or with num_episodes given), clustered random
+embeddings grouped into episodes stand in for the corpus.
+Usage (from ./scripts):
+    python -m benchmark_tools.episode_recall [num_queries] [num_episodes]
+"""
+import sys
+import time
+import numpy as np
+
+from benchmark_tools import use_app_package
+from benchmark_tools.ivf_recall import percentiles
+
+use_app_package()
+# pylint: disable=wrong-import-position
+from utils import data_manager  # noqa: E402
+from utils.dialogue_store import DialogueStore  # noqa: E402
+from utils.search_index import EpisodeIndex  # noqa: E402
+
+NUM_SHOWN = 5
+SEGMENTS = [1, 2, 4, 8]
+NPROBES = [5, 10, 20, 40]
+
+
+def synthetic_episodes(num_episodes, lines_per_episode=310, dim=384,
+                       num_topics=300, topics_per_episode=8, seed=0):
+    """
+    Clustered unit-norm line embeddings, each episode drawing its lines
+    from a few topics.
+    :param num_episodes: number of episodes.
+    :param lines_per_episode: lines in each episode.
+    :param dim: embedding size.
+    :param num_topics: number of clusters.
+    :param topics_per_episode: clusters each episode draws from.
+    :param seed: random seed.
+    :return: (num_lines, dim) float32 embeddings and the episode code
+        of each line.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_topics, dim)).astype(np.float32)
+    topics = rng.integers(0, num_topics, (num_episodes, topics_per_episode))
+    seids = np.repeat(np.arange(num_episodes), lines_per_episode)
+    picks = rng.integers(0, topics_per_episode, len(seids))
+    embeddings = centers[topics[seids, picks]] + \
+        rng.normal(size=(len(seids), dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings, seids
+
+
+def exact_episodes(full, seids, query, num_shown=NUM_SHOWN):
+    """
+    Exact best episodes: score every line, keep each episode's best.
+    :param full: (num_lines, dim) unit-norm embeddings.
+    :param seids: (num_lines,) episode code of each line.
+    :param query: (dim,) query embedding.
+    :param num_shown: number of episodes.
+    :return: episode codes, best first.
+    """
+    best = np.full(seids.max() + 1, -np.inf, dtype=np.float32)
+    np.maximum.at(best, seids, full @ query)
+    return np.argsort(-best, kind='stable')[:num_shown]
+
+
+def indexed_episodes(index, seids, query, nprobe, num_shown=NUM_SHOWN):
+    """
+    Best episodes among the lines of the nprobe closest episodes.
+    :param index: EpisodeIndex.
+    :param seids: (num_lines,) episode code of each line.
+    :param query: (dim,) query embedding.
+    :param nprobe: number of episodes whose lines are scored.
+    :param num_shown: number of episodes.
+    :return: episode codes, best first.
+    """
+    _, lines = index.search(query, 500, nprobe)
+    _, first = np.unique(seids[lines], return_index=True)
+    return seids[lines[np.sort(first)]][:num_shown]
+
+
+def main(num_queries=100, num_episodes=None):
+    """
+    Print episode recall@5 and latency per segments / nprobe setting.
+    :param num_queries: number of queries.
+    :param num_episodes: use this many synthetic episodes.
+    :return: None
+    """
+    if num_episodes is None:
+        try:
+            full = data_manager.get_episode_query_tensors().numpy()
+            _, scripts = data_manager.load_data(use_bundle=True,
+                                                compact=True)
+            seids = DialogueStore.from_scripts(scripts).seid_codes
+        except FileNotFoundError:
+            num_episodes = 174
+    if num_episodes is not None:
+        full, seids = synthetic_episodes(num_episodes)
+    full = full / np.linalg.norm(full, axis=1, keepdims=True)
+    rng = np.random.default_rng(1)
+    queries = full[rng.choice(len(full), num_queries, replace=False)]
+    queries = queries + rng.normal(scale=0.5 / np.sqrt(full.shape[1]),
+                                   size=queries.shape).astype(np.float32)
+    print(f"{len(full)} lines, {seids.max() + 1} episodes")
+
+    truth, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        truth.append(set(exact_episodes(full, seids, query).tolist()))
+        latencies.append(time.perf_counter() - start)
+    p50, p99 = percentiles(latencies)
+    print(f"exact                     recall 1.000  p50 {p50:6.2f} ms  "
+          f"p99 {p99:6.2f} ms")
+    for segments in SEGMENTS:
+        index = EpisodeIndex.build(full, seids, segments)
+        for nprobe in NPROBES:
+            recall, latencies = [], []
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = indexed_episodes(index, seids, query, nprobe)
+                latencies.append(time.perf_counter() - start)
+                recall.append(len(expected.intersection(found.tolist())) /
+                              NUM_SHOWN)
+            p50, p99 = percentiles(latencies)
+            print(f"segments {segments} nprobe {nprobe:3d}  recall "
+                  f"{np.mean(recall):.3f}  p50 {p50:6.2f} ms  "
+                  f"p99 {p99:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,137 @@
+"""
+Report recall@500 of inverted-file (IVF) search against exact search,
+and the p50 / p99 query latency of both, at 1x, 10x and 100x the
+corpus size, for several nprobe values.
+Larger corpora repeat the dialogue embeddings with a little noise, so
+every copy is a distinct line close to an original one; 100x the full
+corpus needs about 10 GB of memory. Without the data files (or with
+base_rows given), clustered random embeddings stand in for the corpus.
+Usage (from ./scripts):
+    python -m benchmark_tools.ivf_recall [num_queries] [max_scale] \
+        [base_rows]
+"""
+import sys
+import time
+import numpy as np
+
+from benchmark_tools import use_app_package
+
+use_app_package()
+# pylint: disable=wrong-import-position
+from utils import data_manager  # noqa: E402
+from utils.search_index import IVFIndex  # noqa: E402
+
+K = 500
+NPROBES = [8, 16, 32, 64, 128]
+
+
+def synthetic_embeddings(num_lines, dim=384, num_topics=300, seed=0):
+    """
+    Clustered unit-norm embeddings, like sentence embeddings.
+    :param num_lines: number of lines.
+    :param dim: embedding size.
+    :param num_topics: number of clusters.
+    :param seed: random seed.
+    :return: (num_lines, dim) float32 embeddings.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_topics, dim)).astype(np.float32)
+    embeddings = centers[rng.integers(0, num_topics, num_lines)] + \
+        rng.normal(size=(num_lines, dim)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def scale_corpus(base, scale, noise=0.3, seed=0):
+    """
+    Repeat the corpus scale times, perturbing every copy but the first.
+    :param base: (num_lines, dim) unit-norm embeddings.
+    :param scale: number of copies.
+    :param noise: expected length of the noise added to each line,
+        before the copies are scaled back to unit norm.
+    :param seed: random seed.
+    :return: (scale * num_lines, dim) unit-norm float32 embeddings.
+    """
+    rng = np.random.default_rng(seed)
+    full = np.empty((scale * len(base), base.shape[1]), dtype=np.float32)
+    full[:len(base)] = base
+    for copy in range(1, scale):
+        block = full[copy * len(base):(copy + 1) * len(base)]
+        block[:] = rng.normal(scale=noise / np.sqrt(base.shape[1]),
+                              size=base.shape)
+        block += base
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+    return full
+
+
+def exact_search(full, query, k=K):
+    """
+    Exact top k lines by cosine similarity (unit-norm corpus).
+    :param full: (num_lines, dim) unit-norm embeddings.
+    :param query: (dim,) query embedding.
+    :param k: number of results.
+    :return: indices of the top k lines, best first.
+    """
+    scores = full @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+def percentiles(latencies):
+    """
+    p50 and p99 of latencies in seconds, as milliseconds.
+    """
+    return np.percentile(np.asarray(latencies) * 1e3, [50, 99])
+
+
+def main(num_queries=100, max_scale=100, base_rows=None):
+    """
+    Print build time, recall@500 and latency at each corpus size.
+    :param num_queries: number of queries per corpus size.
+    :param max_scale: largest corpus multiple to run (1, 10 or 100).
+    :param base_rows: use this many synthetic lines as the 1x corpus.
+    :return: None
+    """
+    if base_rows is None:
+        try:
+            base = data_manager.get_episode_query_tensors().numpy()
+        except FileNotFoundError:
+            base_rows = 54000
+    if base_rows is not None:
+        base = synthetic_embeddings(base_rows)
+    base = base / np.linalg.norm(base, axis=1, keepdims=True)
+    rng = np.random.default_rng(1)
+    queries = base[rng.choice(len(base), num_queries, replace=False)]
+    queries = queries + rng.normal(scale=0.3 / np.sqrt(base.shape[1]),
+                                   size=queries.shape).astype(np.float32)
+
+    for scale in [s for s in (1, 10, 100) if s <= max_scale]:
+        full = scale_corpus(base, scale)
+        start = time.perf_counter()
+        index = IVFIndex.build(full)
+        build = time.perf_counter() - start
+        print(f"{scale}x: {len(full)} lines, {len(index.centroids)} lists, "
+              f"built in {build:.1f} s")
+
+        truth, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            truth.append(set(exact_search(full, query).tolist()))
+            latencies.append(time.perf_counter() - start)
+        p50, p99 = percentiles(latencies)
+        print(f"  exact       recall 1.000  p50 {p50:7.2f} ms  "
+              f"p99 {p99:7.2f} ms")
+        for nprobe in NPROBES:
+            recall, latencies = [], []
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = index.search(query, K, nprobe)[1]
+                latencies.append(time.perf_counter() - start)
+                recall.append(len(expected.intersection(found.tolist())) / K)
+            p50, p99 = percentiles(latencies)
+            print(f"  nprobe {nprobe:3d}  recall {np.mean(recall):.3f}  "
+                  f"p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+        del full, index
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:4]])
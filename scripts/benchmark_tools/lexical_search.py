@@ -0,0 +1,96 @@
+"""
+Report the build time and size of the BM25 dialogue index
+(utils.lexical_index.BM25Index) and the p50 / p99 latency of lexical
+search against exact float32 embedding search, for names and
+catchphrases and for words sampled from the dialogue. Embedding search
+is timed without encoding the query, which lexical search skips too.
+Without the data files, made-up lines and random embeddings stand in.
+Usage (from ./scripts):
+    python -m benchmark_tools.lexical_search [num_queries]
+"""
+import sys
+import time
+import numpy as np
+
+from benchmark_tools import use_app_package
+from benchmark_tools.ivf_recall import percentiles
+
+use_app_package()
+# pylint: disable=wrong-import-position
+from utils import data_manager  # noqa: E402
+from utils.lexical_index import BM25Index, tokenize  # noqa: E402
+from utils.vector_search import top_k  # noqa: E402
+
+PHRASES = ['serenity now', 'bania', 'no soup for you', 'yada yada yada',
+           'festivus', 'hello newman', 'puffy shirt', 'the sponge']
+
+
+def load_corpus(num_lines=54000, dim=384, seed=0):
+    """
+    The dialogue lines and their embeddings, or made-up lines (with
+    Zipf-distributed words and the phrases mixed in) and random
+    embeddings without the data files.
+    :return: list of lines and (num_lines, dim) float32 embeddings.
+    """
+    try:
+        _, scripts = data_manager.load_data(use_bundle=True, compact=True)
+        return scripts.Dialogue.astype(str).tolist(), \
+            np.asarray(data_manager.get_episode_query_tensors().numpy())
+    except FileNotFoundError:
+        pass
+    rng = np.random.default_rng(seed)
+    words = np.minimum(rng.zipf(1.3, num_lines * 12), 20000)
+    lengths = rng.integers(2, 20, num_lines)
+    starts = np.cumsum(lengths) - lengths
+    lines = [' '.join(f"w{word}" for word in words[start:start + length])
+             for start, length in zip(starts, lengths)]
+    for row in rng.choice(num_lines, 40, replace=False):
+        lines[row] += ' ' + PHRASES[row % len(PHRASES)]
+    embeddings = rng.normal(size=(num_lines, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return lines, embeddings
+
+
+def timed(search, queries):
+    """
+    Seconds each query takes.
+    """
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main(num_queries=200):
+    """
+    Print index build time and size, and search latencies.
+    :param num_queries: number of words sampled from the dialogue.
+    :return: None
+    """
+    lines, embeddings = load_corpus()
+    start = time.perf_counter()
+    index = BM25Index.build(lines)
+    print(f"{len(lines)} lines, {len(index.terms)} terms: built in "
+          f"{time.perf_counter() - start:.2f} s, "
+          f"{index.nbytes / 2 ** 20:.1f} MiB")
+
+    rng = np.random.default_rng(1)
+    words = [word for line in rng.choice(lines, num_queries)
+             for word in tokenize(line)[:1]]
+    vectors = embeddings[rng.choice(len(embeddings), num_queries)]
+    for name, queries in [('phrases', PHRASES * 10), ('sampled words',
+                                                      words)]:
+        p50, p99 = percentiles(timed(
+            lambda query: index.search(query, 500), queries))
+        print(f"BM25 {name:14s} p50 {p50 * 1e3:8.1f} us  "
+              f"p99 {p99 * 1e3:8.1f} us")
+    p50, p99 = percentiles(timed(
+        lambda vector: top_k(embeddings @ vector, 500), vectors))
+    print(f"exact embedding search  p50 {p50 * 1e3:8.1f} us  "
+          f"p99 {p99 * 1e3:8.1f} us")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,68 @@
+"""
+Report recall@k of float16 / int8 / binary sign-hash / PCA-reduced
+embedding search against exact float32 search, with and without exact
+re-ranking.
+Queries are the embeddings of randomly sampled lines of dialogue plus
+a little noise, so the report runs without downloading the model.
+Usage (from ./scripts):
+    python -m benchmark_tools.quantized_recall [num_queries] [candidates] \
+        [binary_candidates]
+"""
+import sys
+import time
+import numpy as np
+
+from benchmark_tools import use_app_package
+
+use_app_package()
+# pylint: disable=wrong-import-position
+from utils import data_manager, search_index, vector_search  # noqa: E402
+
+
+def sample_queries(embeddings, num_queries=100, noise=0.02, seed=0):
+    """
+    Sample perturbed corpus embeddings to use as queries.
+    :param embeddings: (num_lines, dim) embeddings.
+    :param num_queries: number of queries.
+    :param noise: standard deviation of the Gaussian noise added.
+    :param seed: random seed.
+    :return: (num_queries, dim) float32 queries.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(embeddings), num_queries, replace=False))
+    queries = np.asarray(embeddings[rows], dtype=np.float32)
+    return queries + rng.normal(scale=noise, size=queries.shape) \
+        .astype(np.float32)
+
+
+def main(num_queries=100, candidates=1000, binary_candidates=4000):
+    """
+    Print the recall report and query latency for each storage dtype.
+    :param num_queries: number of queries.
+    :param candidates: number of lines re-ranked per query.
+    :param binary_candidates: number of lines re-ranked per query for
+        the sign hash, whose shortlist is coarser.
+    :return: None
+    """
+    full = data_manager.get_episode_query_tensors().numpy()
+    queries = sample_queries(full, num_queries)
+    for dtype in search_index.SEARCH_STORAGES:
+        if dtype in ('ivf', 'episodes'):
+            # See benchmark_tools.ivf_recall and episode_recall
+            continue
+        quantized = search_index.load_search_index(dtype, full)
+        shortlist = binary_candidates if dtype == 'binary' else candidates
+        report = vector_search.recall_report(quantized, queries,
+                                             candidates=shortlist)
+        start = time.perf_counter()
+        for query in queries:
+            quantized.search(query, 500, shortlist)
+        latency = (time.perf_counter() - start) / len(queries) * 1e3
+        print(f"{dtype}: {quantized.nbytes / 2**20:.1f} MiB "
+              f"(float32 {full.nbytes / 2**20:.1f} MiB), "
+              f"{latency:.1f} ms per query")
+        print(report.to_string(), end='\n\n')
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:4]])
@@ -0,0 +1,97 @@
+"""
+Benchmark mapping the top search hits to episodes in query_episodes:
+the original per-hit pd.concat / apply implementation against the
+vectorised episode_query.get_hit_episodes. Both are checked to return
+the same episodes. Uses synthetic scripts shaped like the real corpus
+(~54k lines over 174 episodes), so no data or model is needed.
+Usage (from ./scripts):
+    python -m benchmark_tools.query_assembly [num_queries] [k]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from benchmark_tools import use_app_package
+
+use_app_package()
+# pylint: disable=wrong-import-position
+from utils import episode_query  # noqa: E402
+from utils.dialogue_store import DialogueStore  # noqa: E402
+
+
+def legacy_hit_episodes(df_imdb, df_script, corpus, top_results):
+    """
+    The original result assembly of query_episodes, kept for comparison.
+    :param df_imdb: episode metadata DataFrame.
+    :param df_script: scripts DataFrame.
+    :param corpus: DialogueStore of df_script.
+    :param top_results: (scores, indices) of the hits.
+    :return: rows of df_imdb for the top 5 episodes.
+    """
+    df = pd.DataFrame({'Dialogue': [], 'Index': [], 'Score': []})
+    dialogues = corpus[top_results[1]]
+    for i, (score, idx) in enumerate(zip(top_results[0], top_results[1])):
+        df = pd.concat([df, pd.Series({'Dialogue': dialogues[i],
+                                       'Index': int(idx),
+                                       'Score': score}).to_frame().T],
+                       ignore_index=True)
+    df['SEID'] = df.Index.apply(lambda x: df_script.iloc[x].SEID)
+    df = df[df.SEID.isin(df_imdb.SEID)]
+    df['Title'] = df.Index.apply(
+        lambda x: df_imdb[df_imdb.SEID
+                          == df_script.iloc[x]['SEID']]['Title'].values[0])
+    return df_imdb.loc[df_imdb.Title.isin(
+        df.drop_duplicates(subset=['Title']).iloc[0:5].Title)]
+
+
+def make_data(num_lines=54000, num_episodes=174, seed=0):
+    """
+    Synthetic metadata and scripts with contiguous episodes.
+    :return: df_imdb, df_script, corpus
+    """
+    rng = np.random.default_rng(seed)
+    seids = np.array([f"S{1 + i // 24:02d}E{1 + i % 24:02d}"
+                      for i in range(num_episodes)])
+    bounds = np.sort(rng.choice(np.arange(1, num_lines), num_episodes - 1,
+                                replace=False))
+    line_seids = np.repeat(seids, np.diff(np.r_[0, bounds, num_lines]))
+    df_script = pd.DataFrame({'SEID': line_seids,
+                              'Dialogue': [f"line {i}" for i in
+                                           range(num_lines)]})
+    df_imdb = pd.DataFrame({'SEID': seids,
+                            'Title': [f"The Episode {i}" for i in
+                                      range(num_episodes)],
+                            'Season': [int(s[1:3]) for s in seids]})
+    return df_imdb, df_script, DialogueStore.from_scripts(df_script)
+
+
+def main(num_queries=20, k=500):
+    """
+    Print the mean time per query of both implementations.
+    :param num_queries: number of random hit lists.
+    :param k: hits per query.
+    :return: None
+    """
+    df_imdb, df_script, corpus = make_data()
+    rng = np.random.default_rng(1)
+    filtered = df_imdb[df_imdb.Season <= 3]
+    timings = {'legacy': 0.0, 'vectorised': 0.0}
+    for _ in range(num_queries):
+        indices = rng.choice(len(df_script), k, replace=False)
+        scores = np.sort(rng.random(k))[::-1]
+        start = time.perf_counter()
+        expected = legacy_hit_episodes(filtered, df_script, corpus,
+                                       (scores, indices))
+        timings['legacy'] += time.perf_counter() - start
+        start = time.perf_counter()
+        result = episode_query.get_hit_episodes(filtered, corpus, indices)
+        timings['vectorised'] += time.perf_counter() - start
+        assert result.equals(expected)
+    for name, total in timings.items():
+        print(f"{name}: {total / num_queries * 1e3:.2f} ms per query")
+    print(f"speed-up: {timings['legacy'] / timings['vectorised']:.0f}x")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,43 @@
+"""
+Script to rebuild the binary data bundle in
+analysis_of_nothing/static/data/ from the cleaned CSV files,
+without re-running the data cleaning and sentiment steps.
+Prerequisite: Activate conda environment with:
+    conda activate nothing
+Usage:
+    python build_data_bundle.py [--sqlite]
+"""
+import argparse
+import pandas as pd
+
+from precompute_tools import data_bundle
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Rebuild the data bundle from the cleaned CSV files.')
+    parser.add_argument('--sqlite', action='store_true',
+                        help='also write scripts.sqlite, the scripts and '
+                             'metadata tables with an FTS5 dialogue index')
+    args = parser.parse_args()
+    data_folder = data_bundle.get_data_dir()
+    meta = pd.read_csv(f"{data_folder}/metadata.csv")
+    scripts = pd.read_csv(f"{data_folder}/scripts.csv")
+    print("Now writing Parquet data bundle...")
+    data_bundle.create_data_bundle(meta, scripts, data_folder)
+    print("Now building the BM25 dialogue index...")
+    data_bundle.save_lexical_index(data_folder)
+    if args.sqlite:
+        print("Now writing the SQLite scripts database...")
+        data_bundle.save_scripts_db(meta, scripts, data_folder)
+    print("Now joining tensor shards into the embedding store...")
+    data_bundle.create_embedding_store_from_shards(data_folder)
+    print("Now writing float16 & int8 copies of the embedding store...")
+    data_bundle.save_quantized_stores(data_folder)
+    data_bundle.save_binary_store(data_folder)
+    data_bundle.save_pca_stores(data_folder)
+    print("Now building the inverted-file and episode search indexes...")
+    data_bundle.save_ivf_index(data_folder)
+    data_bundle.save_episode_index(data_folder)
+    manifest = data_bundle.write_manifest(data_folder)
+    print(f"Data version {manifest['version']}")
+    print(f'Done saving data bundle to {data_folder}')
@@ -2,15 +2,24 @@
 Script to download cleaned data into analysis_of_nothing/data/
 Prerequisite: Activate conda environment with:
     conda activate nothing
+Usage:
+    python get_final_data.py [--sqlite]
 """
+import argparse
 import os
 import numpy as np
 import pandas as pd
 
 from data_tools import load_data
-from precompute_tools import sentiment, query_vectors
+from precompute_tools import sentiment, query_vectors, data_bundle
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Clean the data and precompute the app data files.')
+    parser.add_argument('--sqlite', action='store_true',
+                        help='also write scripts.sqlite, the scripts and '
+                             'metadata tables with an FTS5 dialogue index')
+    args = parser.parse_args()
     cwd = os.getcwd()
     base_path = cwd.split("an_analysis_of_nothing", maxsplit=1)[0]
     data_folder = base_path + \
@@ -27,7 +36,16 @@ if __name__ == "__main__":
     meta.to_csv(meta_name, index=False)
     scripts.to_csv(script_name, index=False)
     print(f'Done saving data to {data_folder}')
+    print("Now writing Parquet data bundle...")
+    data_bundle.create_data_bundle(meta, scripts, data_folder)
+    print("Done saving data bundle.")
+    print("Now building the BM25 dialogue index...")
+    data_bundle.save_lexical_index(data_folder)
+    if args.sqlite:
+        print("Now writing the SQLite scripts database...")
+        data_bundle.save_scripts_db(meta, scripts, data_folder)
     print("Now precomputing search query vectors...")
     query_vectors.create_corpus_embeddings(df_script=scripts)
     print("Done saving precomputed search query vectors.")
-
+    manifest = data_bundle.write_manifest(data_folder)
+    print(f"Done writing manifest, data version {manifest['version']}.")
@@ -0,0 +1,399 @@
+"""
+Contains functions to write the cleaned data as a typed columnar bundle
+that the app can load without parsing CSV text, and the manifest of
+content hashes the app uses to detect new data.
+"""
+import ast
+import datetime
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import sys
+import numpy as np
+import pandas as pd
+
+LIST_COLUMNS = ['keyWords', 'Summaries']
+# Data artifacts covered by the manifest (CSVs are the bundle fallback)
+ARTIFACTS = ['metadata.parquet', 'scripts.parquet',
+             'dialogue_embeddings.npy', 'dialogue_embeddings_float16.npy',
+             'dialogue_embeddings_int8.npy',
+             'dialogue_embeddings_int8_scale.npy',
+             'dialogue_embeddings_binary.npy',
+             'dialogue_embeddings_binary_center.npy',
+             'dialogue_embeddings_pca64.npy',
+             'dialogue_embeddings_pca64_projection.npz',
+             'dialogue_embeddings_pca128.npy',
+             'dialogue_embeddings_pca128_projection.npz', 'dialogue_ivf.npz',
+             'dialogue_episodes.npz', 'dialogue_bm25.npz', 'scripts.sqlite',
+             'metadata.csv', 'scripts.csv']
+# Rows quantised per step
+BLOCK_ROWS = 8192
+
+
+def get_data_dir():
+    """
+    Get the app's static data directory from the current working directory.
+    :return: path to an_analysis_of_nothing/static/data
+    """
+    curr_path = os.getcwd()
+    base_pth = curr_path.split("an_analysis_of_nothing", maxsplit=1)[0]
+    data_dir = base_pth + \
+        'an_analysis_of_nothing/an_analysis_of_nothing/static/data'
+    return data_dir
+
+
+def _as_list(value):
+    """
+    Parse a stringified list (as stored in metadata.csv) into a list.
+    :param value: list or string representation of a list.
+    :return: list
+    """
+    if isinstance(value, str):
+        return ast.literal_eval(value)
+    return list(value)
+
+
+def create_data_bundle(meta, scripts, data_dir=None):
+    """
+    Store metadata and scripts as Parquet files with native list columns
+    for 'keyWords' and 'Summaries'.
+    :param meta: The metadata DataFrame. Must have keyWords & Summaries.
+    :param scripts: The scripts DataFrame.
+    :param data_dir: output directory, defaults to the app's static data.
+    :return: None
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    meta = meta.copy()
+    for col in LIST_COLUMNS:
+        meta[col] = meta[col].apply(_as_list)
+    # Write to temporary names so running apps never read half a file.
+    for frame, name in [(meta, 'metadata'), (scripts, 'scripts')]:
+        path = f"{data_dir}/{name}.parquet"
+        frame.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+
+def save_embedding_store(embeddings, data_dir=None):
+    """
+    Store dialogue embeddings as one contiguous float32 .npy file that
+    the app memory-maps. The file is written to a temporary name and
+    moved into place so processes mapping the old store are unaffected.
+    :param embeddings: (num_lines, dim) array or tensor of embeddings.
+    :param data_dir: output directory, defaults to the app's static data.
+    :return: path to the written store.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    store_path = f"{data_dir}/dialogue_embeddings.npy"
+    tmp_path = store_path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.save(file, np.ascontiguousarray(embeddings, dtype=np.float32))
+    os.replace(tmp_path, store_path)
+    return store_path
+
+
+def save_embedding_store_chunks(chunks, data_dir=None):
+    """
+    Store dialogue embeddings arriving in chunks (e.g. one per streamed
+    scripts chunk) without holding the whole matrix in memory. Rows are
+    appended to a raw temporary file, then the .npy header is written
+    and the rows copied behind it.
+    :param chunks: iterable of (num_lines, dim) arrays or tensors.
+    :param data_dir: output directory, defaults to the app's static data.
+    :return: path to the written store.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    store_path = f"{data_dir}/dialogue_embeddings.npy"
+    raw_path = store_path + '.raw'
+    rows, dim = 0, None
+    with open(raw_path, 'wb') as raw:
+        for chunk in chunks:
+            chunk = np.ascontiguousarray(chunk, dtype=np.float32)
+            if dim is not None and chunk.shape[1] != dim:
+                raise ValueError("Embedding chunks must share a dimension")
+            rows, dim = rows + len(chunk), chunk.shape[1]
+            raw.write(chunk.tobytes())
+    header = {'descr': np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+              'fortran_order': False, 'shape': (rows, dim or 0)}
+    with open(store_path + '.tmp', 'wb') as file, \
+            open(raw_path, 'rb') as raw:
+        np.lib.format.write_array_header_1_0(file, header)
+        shutil.copyfileobj(raw, file)
+    os.remove(raw_path)
+    os.replace(store_path + '.tmp', store_path)
+    return store_path
+
+
+def save_quantized_stores(data_dir=None):
+    """
+    Write float16 and per-dimension scaled int8 copies of the embedding
+    store, quantised a block at a time from the memory-mapped store.
+    Matches utils.vector_search.QuantizedEmbeddings.quantize in the app.
+    :param data_dir: data directory, defaults to the app's static data.
+    :return: paths to the float16 and int8 stores.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    store = np.load(f"{data_dir}/dialogue_embeddings.npy", mmap_mode='r')
+    scale = np.zeros(store.shape[1], dtype=np.float32)
+    for start in range(0, len(store), BLOCK_ROWS):
+        block = np.abs(store[start:start + BLOCK_ROWS]).max(axis=0)
+        scale = np.maximum(scale, block)
+    scale /= 127
+    scale[scale == 0] = 1
+
+    paths = []
+    for dtype in ['float16', 'int8']:
+        path = f"{data_dir}/dialogue_embeddings_{dtype}.npy"
+        out = np.lib.format.open_memmap(path + '.tmp', mode='w+',
+                                        dtype=dtype, shape=store.shape)
+        for start in range(0, len(store), BLOCK_ROWS):
+            block = store[start:start + BLOCK_ROWS]
+            if dtype == 'int8':
+                block = np.clip(np.rint(block / scale), -127, 127)
+            out[start:start + BLOCK_ROWS] = block
+        out.flush()
+        del out
+        if dtype == 'int8':
+            scale_path = f"{data_dir}/dialogue_embeddings_int8_scale.npy"
+            with open(scale_path + '.tmp', 'wb') as file:
+                np.save(file, scale)
+            os.replace(scale_path + '.tmp', scale_path)
+        os.replace(path + '.tmp', path)
+        paths.append(path)
+    return paths
+
+
+def save_binary_store(data_dir=None):
+    """
+    Write the 1-bit sign hash of the embedding store: each line's signs
+    about the corpus mean, packed with np.packbits into whole 64-bit
+    words, plus the mean alongside.
+    Matches utils.vector_search.BinaryEmbeddings.from_embeddings.
+    :param data_dir: data directory, defaults to the app's static data.
+    :return: path to the written hash.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    store = np.load(f"{data_dir}/dialogue_embeddings.npy", mmap_mode='r')
+    center = np.zeros(store.shape[1], dtype=np.float64)
+    for start in range(0, len(store), BLOCK_ROWS):
+        center += store[start:start + BLOCK_ROWS].sum(axis=0,
+                                                      dtype=np.float64)
+    center = (center / max(len(store), 1)).astype(np.float32)
+
+    path = f"{data_dir}/dialogue_embeddings_binary.npy"
+    num_bytes = -(-store.shape[1] // 64) * 8
+    out = np.lib.format.open_memmap(path + '.tmp', mode='w+',
+                                    dtype=np.uint8,
+                                    shape=(len(store), num_bytes))
+    for start in range(0, len(store), BLOCK_ROWS):
+        packed = np.packbits(store[start:start + BLOCK_ROWS] > center,
+                             axis=1)
+        out[start:start + BLOCK_ROWS] = 0
+        out[start:start + BLOCK_ROWS, :packed.shape[1]] = packed
+    out.flush()
+    del out
+    center_path = f"{data_dir}/dialogue_embeddings_binary_center.npy"
+    with open(center_path + '.tmp', 'wb') as file:
+        np.save(file, center)
+    os.replace(center_path + '.tmp', center_path)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def save_ivf_index(data_dir=None, num_lists=None):
+    """
+    Build the inverted-file (k-means) index over the embedding store
+    with the app's own utils.search_index.IVFIndex, so the app loads
+    exactly what it would otherwise build at startup.
+    :param data_dir: data directory, defaults to the app's static data.
+    :param num_lists: number of inverted lists, defaults to
+        sqrt(number of lines).
+    :return: path to the written index.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    search_index = _app_module(data_dir, 'search_index')
+    store = np.load(f"{data_dir}/dialogue_embeddings.npy", mmap_mode='r')
+    path = f"{data_dir}/dialogue_ivf.npz"
+    with open(path + '.tmp', 'wb') as file:
+        search_index.IVFIndex.build(store, num_lists).save(file)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def save_episode_index(data_dir=None, segments=None):
+    """
+    Build the per-episode centroid index over the embedding store with
+    the app's own utils.search_index.EpisodeIndex. Lines are grouped by
+    the SEID codes the app's DialogueStore gives them (sorted SEIDs).
+    :param data_dir: data directory, defaults to the app's static data.
+    :param segments: centroids per episode, defaults to the app's
+        data_constants.EPISODE_SEGMENTS.
+    :return: path to the written index.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    search_index = _app_module(data_dir, 'search_index')
+    if segments is None:
+        segments = _app_module(data_dir, 'data_constants').EPISODE_SEGMENTS
+    if os.path.exists(f"{data_dir}/scripts.parquet"):
+        seids = pd.read_parquet(f"{data_dir}/scripts.parquet",
+                                columns=['SEID']).SEID
+    else:
+        seids = pd.read_csv(f"{data_dir}/scripts.csv", usecols=['SEID']).SEID
+    _, codes = np.unique(seids.astype(str).values, return_inverse=True)
+    store = np.load(f"{data_dir}/dialogue_embeddings.npy", mmap_mode='r')
+    path = f"{data_dir}/dialogue_episodes.npz"
+    with open(path + '.tmp', 'wb') as file:
+        search_index.EpisodeIndex.build(store, codes, segments).save(file)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def save_lexical_index(data_dir=None):
+    """
+    Build the BM25 inverted index over the dialogue with the app's own
+    utils.lexical_index.BM25Index, one entry per scripts row.
+    :param data_dir: data directory, defaults to the app's static data.
+    :return: path to the written index.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    lexical_index = _app_module(data_dir, 'lexical_index')
+    if os.path.exists(f"{data_dir}/scripts.parquet"):
+        dialogue = pd.read_parquet(f"{data_dir}/scripts.parquet",
+                                   columns=['Dialogue']).Dialogue
+    else:
+        dialogue = pd.read_csv(f"{data_dir}/scripts.csv",
+                               usecols=['Dialogue']).Dialogue
+    path = f"{data_dir}/dialogue_bm25.npz"
+    with open(path + '.tmp', 'wb') as file:
+        lexical_index.BM25Index.build(dialogue.values).save(file)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def save_scripts_db(meta, scripts, data_dir=None):
+    """
+    Write the SQLite copy of the metadata and scripts with its FTS5
+    dialogue index, using the app's own utils.scripts_db.
+    :param meta: The metadata DataFrame. Must have keyWords & Summaries.
+    :param scripts: The scripts DataFrame.
+    :param data_dir: output directory, defaults to the app's static data.
+    :return: path to the written database.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    scripts_db = _app_module(data_dir, 'scripts_db')
+    meta = meta.copy()
+    for col in LIST_COLUMNS:
+        meta[col] = meta[col].apply(_as_list)
+    return scripts_db.write_scripts_db(meta, scripts,
+                                       f"{data_dir}/scripts.sqlite")
+
+
+def save_pca_stores(data_dir=None, dims=(64, 128)):
+    """
+    Fit a PCA projection of the embedding store with the app's own
+    utils.vector_search.ReducedEmbeddings and write each reduced matrix
+    plus its projection (mean and components).
+    :param data_dir: data directory, defaults to the app's static data.
+    :param dims: numbers of principal components to keep.
+    :return: paths to the reduced matrices.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    vector_search = _app_module(data_dir, 'vector_search')
+    store = np.load(f"{data_dir}/dialogue_embeddings.npy", mmap_mode='r')
+    paths = []
+    for num_dims in dims:
+        reduced = vector_search.ReducedEmbeddings.fit(store, num_dims)
+        path = f"{data_dir}/dialogue_embeddings_pca{num_dims}.npy"
+        root = path[:-len('.npy')]
+        reduced.save(f"{root}.tmp.npy")
+        os.replace(f"{root}.tmp_projection.npz",
+                   f"{root}_projection.npz")
+        os.replace(f"{root}.tmp.npy", path)
+        paths.append(path)
+    return paths
+
+
+def _app_module(data_dir, name):
+    """
+    Import one of the app's utils modules, so indexes are built by the
+    same code that loads them.
+    :param data_dir: the app's static data directory.
+    :param name: module name in the app's utils package.
+    :return: the utils module.
+    """
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(data_dir)))
+    if app_dir not in sys.path:
+        sys.path.insert(0, app_dir)
+    return importlib.import_module(f"utils.{name}")
+
+
+def create_embedding_store_from_shards(data_dir=None, num_shards=10):
+    """
+    Join the sharded dialogue_tensors/tensor_*.npy files into the
+    contiguous embedding store.
+    :param data_dir: data directory, defaults to the app's static data.
+    :param num_shards: number of tensor shards.
+    :return: path to the written store.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    shards = [np.load(f"{data_dir}/dialogue_tensors/tensor_{i}.npy")
+              for i in range(num_shards)]
+    return save_embedding_store(np.concatenate(shards), data_dir)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """
+    Compute the SHA-256 of a file without reading it into memory at once.
+    :param path: file to hash.
+    :param chunk_size: bytes read per step.
+    :return: hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(data_dir=None):
+    """
+    Hash every data artifact present and write manifest.json with the
+    per-file hashes and a combined version. Run this after all the
+    artifacts have been written: running apps reload when the version
+    changes, and rewriting identical data keeps the same version.
+    :param data_dir: data directory, defaults to the app's static data.
+    :return: the manifest dict.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    artifacts = {}
+    for name in ARTIFACTS:
+        path = f"{data_dir}/{name}"
+        if os.path.exists(path):
+            artifacts[name] = {'sha256': file_sha256(path),
+                               'bytes': os.path.getsize(path)}
+    combined = hashlib.sha256()
+    for name in sorted(artifacts):
+        combined.update(f"{name}:{artifacts[name]['sha256']}\n".encode())
+    manifest = {
+        'version': combined.hexdigest()[:16],
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'artifacts': artifacts,
+    }
+    manifest_path = f"{data_dir}/manifest.json"
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
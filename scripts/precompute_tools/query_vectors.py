@@ -2,32 +2,51 @@
 Contains functions to precompute vectors for cosine similarity
 for episode search.
 """
-import os
 import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 import torch
 
+from .data_bundle import get_data_dir, save_embedding_store, \
+    save_embedding_store_chunks, save_binary_store, save_episode_index, \
+    save_ivf_index, save_pca_stores, save_quantized_stores
+
 
 def create_corpus_embeddings(df_script):
     """
     Use sentence transformer to generate dialogue embeddings
-    for episode querying and store sharded files as numpy arrays.
+    for episode querying and store sharded files as numpy arrays
+    along with the contiguous embedding store.
     NOTE: Takes 8 minutes to run.
     :param df_script: The scripts DataFrame.
-            Must have Dialogue column.
+            Must have Dialogue column. May also be an iterator of
+            scripts DataFrames (e.g. data_manager.iter_scripts), which
+            are encoded one chunk at a time straight into the
+            embedding store; no tensor shards are written then.
     :return: None
     """
     embedder = SentenceTransformer('all-MiniLM-L6-v2')
+    if not isinstance(df_script, pd.DataFrame):
+        save_embedding_store_chunks(
+            embedder.encode(chunk.Dialogue.values) for chunk in df_script)
+        save_quantized_stores()
+        save_binary_store()
+        save_pca_stores()
+        save_ivf_index()
+        save_episode_index()
+        return
     corpus = df_script.Dialogue.values
     corpus_embeddings = embedder.encode(corpus, convert_to_tensor=True)
     tensors = torch.split(corpus_embeddings, split_size_or_sections=5459)
 
-    curr_path = os.getcwd()
-    base_pth = curr_path.split("an_analysis_of_nothing", maxsplit=1)[0]
-    data_dir = base_pth + \
-        'an_analysis_of_nothing/an_analysis_of_nothing/static/data'
+    data_dir = get_data_dir()
     for i, tensor in enumerate(tensors):
         np.save(f"{data_dir}/dialogue_tensors/tensor_{i}.npy",
                 tensor.numpy())
+    save_embedding_store(corpus_embeddings.numpy(), data_dir)
+    save_quantized_stores(data_dir)
+    save_binary_store(data_dir)
+    save_pca_stores(data_dir)
+    save_ivf_index(data_dir)
+    save_episode_index(data_dir)
     return
@@ -13,12 +13,17 @@ def get_emotions(scripts):
     :param: scripts: Pandas DataFrame containing at least these columns:
                  'Character', 'Dialogue', 'SEID' representing the script data.
                  RAISE VALUE ERROR ELSE
+                 May also be an iterator of such DataFrames.
     :return: data frame with additional columns for each of the emotions:
             'Happy', 'Angry', 'Surprise', 'Sad', 'Fear'
+            (an iterator of them, one per chunk, if given an iterator)
     """
+    if not isinstance(scripts, pd.DataFrame):
+        return (get_emotions(chunk.copy()) for chunk in scripts)
     tqdm.pandas()
     scripts['Emotion'] = scripts.Dialogue.progress_apply(te.get_emotion)
-    emotions = pd.json_normalize(scripts['Emotion'])
+    emotions = pd.json_normalize(scripts['Emotion'].tolist())
+    emotions.index = scripts.index
     for col in emotions.columns:
         scripts[col] = emotions[col]
     scripts['numWords'] = scripts.Dialogue.apply(lambda x: len(x.split()))